@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+截图来源
+图像识别通过 FrameSource 获取画面（RGB 数组），真实桌面使用 ScreenFrameSource（优先 mss，
+支持只截取部分区域；未安装时使用 pyautogui），离线测试和性能测试使用 ImageSequenceSource
+按顺序回放录制的截图，不需要桌面环境
+"""
+
+import os
+import threading
+from loguru import logger
+from typing import Optional, Iterable, List, Tuple
+
+try:
+    import cv2
+    import numpy as np
+    OPENCV_AVAILABLE = True
+except ImportError:
+    OPENCV_AVAILABLE = False
+
+try:
+    import mss
+    MSS_AVAILABLE = True
+except ImportError:
+    MSS_AVAILABLE = False
+
+try:
+    import pyautogui
+    PYAUTOGUI_AVAILABLE = True
+except ImportError:
+    PYAUTOGUI_AVAILABLE = False
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+# 区域格式：(left, top, width, height)，与 pyautogui.screenshot(region=...) 一致
+Region = Tuple[int, int, int, int]
+
+
+class FrameSource:
+    """截图来源基类"""
+
+    name = "base"
+
+    def grab(self, region: Optional[Region] = None):
+        """返回 RGB 画面（uint8 数组），region 指定时只返回该区域"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ScreenFrameSource(FrameSource):
+    """真实桌面截图
+
+    mss 直接读取屏幕缓冲区，比 pyautogui 快得多且可以只截取指定区域；
+    mss 实例不能跨线程使用，每个线程各自创建
+    """
+
+    def __init__(self, monitor: int = 1, prefer_mss: bool = True):
+        self.monitor = monitor
+        self.use_mss = prefer_mss and MSS_AVAILABLE
+        self.name = "mss" if self.use_mss else "pyautogui"
+        self._local = threading.local()
+        if not self.use_mss and not PYAUTOGUI_AVAILABLE:
+            logger.warning("mss 和 PyAutoGUI 均未安装，无法截取屏幕")
+
+    def _mss(self):
+        instance = getattr(self._local, 'mss', None)
+        if instance is None:
+            instance = self._local.mss = mss.mss()
+        return instance
+
+    def grab(self, region: Optional[Region] = None):
+        if self.use_mss:
+            sct = self._mss()
+            if region is None:
+                area = sct.monitors[self.monitor]
+            else:
+                left, top, width, height = region
+                area = {'left': left, 'top': top, 'width': width, 'height': height}
+            # mss 返回 BGRA，去掉 alpha 并转为 RGB
+            return cv2.cvtColor(np.asarray(sct.grab(area)), cv2.COLOR_BGRA2RGB)
+        return np.asarray(pyautogui.screenshot(region=region))
+
+    def close(self):
+        instance = getattr(self._local, 'mss', None)
+        if instance is not None:
+            instance.close()
+            self._local.mss = None
+
+
+class ImageSequenceSource(FrameSource):
+    """按顺序回放截图文件，每次 grab 返回下一张；播放完后停在最后一张（loop 为 True 时从头循环）"""
+
+    name = "replay"
+
+    def __init__(self, paths: Iterable[str], loop: bool = False):
+        self.paths: List[str] = list(paths)
+        if not self.paths:
+            raise ValueError("截图序列为空")
+        self.loop = loop
+        self.index = 0
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_directory(cls, directory: str, loop: bool = False) -> "ImageSequenceSource":
+        """按文件名顺序回放目录中的图片"""
+        paths = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                       if name.lower().endswith(IMAGE_EXTENSIONS))
+        return cls(paths, loop)
+
+    def load(self, path: str):
+        """读取图片为 RGB（支持中文路径），同一文件只解码一次"""
+        image = self._cache.get(path)
+        if image is None:
+            bgr = cv2.imdecode(np.fromfile(path, np.uint8), cv2.IMREAD_COLOR)
+            if bgr is None:
+                raise ValueError(f"无法解码截图: {path}")
+            image = self._cache[path] = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+        return image
+
+    def grab(self, region: Optional[Region] = None):
+        with self._lock:
+            path = self.paths[self.index]
+            if self.index < len(self.paths) - 1:
+                self.index += 1
+            elif self.loop:
+                self.index = 0
+        image = self.load(path)
+        if region is not None:
+            left, top, width, height = region
+            image = image[top:top + height, left:left + width]
+        return image
+
+    def rewind(self):
+        with self._lock:
+            self.index = 0
+
+
+if __name__ == "__main__":
+    # 测试代码
+    import sys
+    if len(sys.argv) > 1:
+        source = ImageSequenceSource.from_directory(sys.argv[1])
+    else:
+        source = ScreenFrameSource()
+    with source:
+        frame = source.grab()
+        print(f"{source.name}: {frame.shape}")
+        print(f"区域: {source.grab((0, 0, 200, 100)).shape}")
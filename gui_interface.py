@@ -12,6 +12,8 @@ from loguru import logger
 from rtmp_capture import RTMPCapture
 from obs_controller import OBSControllerSync
 from obs_launcher import OBSLauncher
+from wait_conditions import wait_until, port_open
+from workflow import build_go_live_workflow, build_go_offline_workflow, SUCCESS
 from loguru import logger
 
 class RTMPCaptureGUI:
@@ -27,6 +29,14 @@ class RTMPCaptureGUI:
         self.is_updating = False
         self.obs_detection_thread = None
         
+        # OBS状态由WebSocket事件推送，连接期间检测线程不再轮询
+        self.obs_state_event = threading.Event()
+        self.obs_controller.add_state_listener(self.on_obs_state_changed)
+        
+        # 推流码显示状态，注册表版本未变化时跳过刷新
+        self.shown_stream_names = set()
+        self.shown_streams_version = None
+        
         # 自动应用相关变量
         self.last_applied_server = None
         self.last_applied_stream_key = None
@@ -154,6 +164,9 @@ class RTMPCaptureGUI:
         self.start_stream_button = ttk.Button(obs_button_frame, text="开始推流", command=self.start_obs_stream, state=tk.DISABLED)
         self.start_stream_button.pack(side=tk.LEFT, padx=(0, 5))
         
+        self.apply_and_start_button = ttk.Button(obs_button_frame, text="应用并推流", command=self.apply_and_start_stream, state=tk.DISABLED)
+        self.apply_and_start_button.pack(side=tk.LEFT, padx=(0, 5))
+        
         self.stop_stream_button = ttk.Button(obs_button_frame, text="直播结束", command=self.stop_obs_stream, state=tk.DISABLED)
         self.stop_stream_button.pack(side=tk.LEFT)
         
@@ -212,8 +225,9 @@ class RTMPCaptureGUI:
         self.stream_text = scrolledtext.ScrolledText(stream_frame, height=15, font=('Consolas', 10), wrap=tk.WORD)
         self.stream_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         
-        # 初始化界面
-        self.refresh_interfaces()
+        # 初始化界面（网卡列表需要加载 scapy，改为点击"刷新接口"时再获取）
+        self.interface_combo['values'] = ["全部接口"]
+        self.interface_combo.set("全部接口")
         self.load_obs_path()
         self.load_live_companion_path()
         
@@ -266,49 +280,25 @@ class RTMPCaptureGUI:
             messagebox.showerror("错误", f"启动抓包失败: {e}")
     
     def auto_start_streaming(self):
-        """自动启动直播功能"""
+        """自动启动直播功能（开播流程：OBS和直播伴侣并行启动）"""
         def start_streaming_thread():
             try:
-                # 等待2秒让抓包稳定启动
-                time.sleep(2)
-                
                 logger.info("开始自动启动直播流程...")
+                workflow = build_go_live_workflow(
+                    self.obs_launcher, self.capture,
+                    websocket_ready=lambda: wait_until(port_open(), timeout=10, name="OBS WebSocket可连接"))
+                result = workflow.run()
                 
-                # 第一步：自动打开OBS
-                logger.info("第一步：自动打开OBS...")
-                obs_success = self.obs_launcher.auto_open_obs()
-                
-                if obs_success:
-                    logger.info("OBS自动打开成功")
-                    # 等待OBS完全启动
-                    time.sleep(3)
-                else:
-                    logger.warning("OBS自动打开失败，继续执行后续步骤")
-                
-                # 第二步：启动直播伴侣等其他功能
-                logger.info("第二步：启动直播伴侣等功能...")
-                
-                # 调用图像识别自动开播功能
-                success = self.obs_launcher.start_live_streaming_with_image_detection()
-                
-                if success:
-                    self.root.after(0, lambda: self.status_label.config(
-                        text="抓包中 - 直播已自动启动", foreground="green"))
+                if result['start_live'].ok:
                     logger.info("自动启动直播成功")
-                    
-                    # 直播启动成功后，等待7秒然后自动退出直播伴侣进程
-                    logger.info("直播启动成功，7秒后将自动退出直播伴侣进程...")
-                    time.sleep(7)
-                    
-                    # 退出直播伴侣进程
-                    terminate_success = self.obs_launcher.terminate_live_companion()
-                    if terminate_success:
+                    if result['close_companion'].status == SUCCESS:
                         self.root.after(0, lambda: self.status_label.config(
                             text="抓包中 - 直播已启动，直播伴侣已退出", foreground="green"))
                         logger.info("直播伴侣进程已自动退出")
                     else:
+                        self.root.after(0, lambda: self.status_label.config(
+                            text="抓包中 - 直播已自动启动", foreground="green"))
                         logger.warning("直播伴侣进程退出失败或未找到进程")
-                        
                 else:
                     self.root.after(0, lambda: self.status_label.config(
                         text="抓包中 - 自动启动直播失败", foreground="orange"))
@@ -347,7 +337,8 @@ class RTMPCaptureGUI:
                 
                 # 更新服务器信息和推流码信息
                 self.root.after(0, lambda: self.update_server_info(data['rtmp_urls']))
-                self.root.after(0, lambda: self.update_stream_info(data['rtmp_streams']))
+                if data['streams_version'] != self.shown_streams_version:
+                    self.root.after(0, lambda: self.update_stream_info(data['rtmp_streams'], data['streams_version']))
                 
                 # 检查是否需要自动应用设置
                 self.root.after(0, lambda: self.check_auto_apply(data))
@@ -373,23 +364,16 @@ class RTMPCaptureGUI:
                 self.server_text.insert(tk.END, url + '\n')
                 self.server_text.see(tk.END)
     
-    def update_stream_info(self, streams):
-        """更新推流码信息"""
-        # 获取当前文本框内容
-        current_content = self.stream_text.get(1.0, tk.END).strip()
-        current_streams = set(current_content.split('\n')) if current_content else set()
-        
-        # 找出新的流信息
-        new_streams = set()
+    def update_stream_info(self, streams, version=None):
+        """更新推流码信息（注册表已按推流码去重，只追加尚未显示的推流码）"""
         for stream in streams:
-            stream_name = stream.get('stream_name', '')
-            if stream_name and stream_name.startswith('stream-'):
-                new_streams.add(stream_name)
-        
-        # 添加新的推流码信息
-        for stream_name in new_streams - current_streams:
-            self.stream_text.insert(tk.END, stream_name + '\n')
-            self.stream_text.see(tk.END)
+            stream_name = stream.stream_name
+            if stream_name and stream_name.startswith('stream-') and stream_name not in self.shown_stream_names:
+                self.shown_stream_names.add(stream_name)
+                self.stream_text.insert(tk.END, stream_name + '\n')
+                self.stream_text.see(tk.END)
+        if version is not None:
+            self.shown_streams_version = version
     
     def check_auto_apply(self, data):
         """检查是否需要自动应用RTMP设置到OBS"""
@@ -413,13 +397,9 @@ class RTMPCaptureGUI:
                     latest_server = url
                     break
             
-            # 获取最新的推流码
-            latest_stream_key = None
-            for stream in data['rtmp_streams']:
-                stream_name = stream.get('stream_name', '')
-                if stream_name and stream_name.startswith('stream-'):
-                    latest_stream_key = stream_name
-                    break
+            # 获取最新的推流码（注册表中最近一次出现的releaseStream）
+            latest_stream = data['latest_stream']
+            latest_stream_key = latest_stream.stream_name if latest_stream else None
             
             # 检查是否有新的设置需要应用
             if (latest_server and latest_stream_key and 
@@ -431,33 +411,29 @@ class RTMPCaptureGUI:
                 # 标记正在进行自动应用
                 self.auto_apply_in_progress = True
                 
-                # 在后台线程中应用设置
-                def auto_apply_thread():
+                # 异步应用设置，完成后在主线程处理结果
+                def on_applied(result, error):
                     try:
-                        result = self.obs_controller.set_stream_settings(latest_server, latest_stream_key)
-                        if result:
+                        if error:
+                            logger.error(f"自动应用推流设置时发生错误: {error}")
+                            self.status_label.config(text=f"自动应用失败: {str(error)}", foreground="red")
+                        elif result:
                             # 更新已应用的设置
                             self.last_applied_server = latest_server
                             self.last_applied_stream_key = latest_stream_key
                             
                             # 显示成功消息
-                            self.root.after(0, lambda: self.status_label.config(
-                                text=f"已自动应用推流设置", foreground="green"))
-                            
+                            self.status_label.config(text=f"已自动应用推流设置", foreground="green")
                             logger.info(f"自动应用推流设置成功 - 服务器: {latest_server}, 推流码: {latest_stream_key}")
                         else:
                             logger.error("自动应用推流设置失败")
-                            self.root.after(0, lambda: self.status_label.config(
-                                text="自动应用推流设置失败", foreground="red"))
-                    except Exception as e:
-                        logger.error(f"自动应用推流设置时发生错误: {e}")
-                        self.root.after(0, lambda: self.status_label.config(
-                            text=f"自动应用失败: {str(e)}", foreground="red"))
+                            self.status_label.config(text="自动应用推流设置失败", foreground="red")
                     finally:
                         # 重置标记
                         self.auto_apply_in_progress = False
                 
-                threading.Thread(target=auto_apply_thread, daemon=True).start()
+                self.obs_controller.set_stream_settings_async(
+                    latest_server, latest_stream_key, callback=self.obs_callback(on_applied))
                 
         except Exception as e:
             logger.error(f"检查自动应用时发生错误: {e}")
@@ -468,6 +444,8 @@ class RTMPCaptureGUI:
         # 清空两个文本框
         self.server_text.delete(1.0, tk.END)
         self.stream_text.delete(1.0, tk.END)
+        self.shown_stream_names.clear()
+        self.shown_streams_version = None
         
         # 清空捕获数据
         self.capture.captured_packets.clear()
@@ -503,8 +481,8 @@ class RTMPCaptureGUI:
                         # 如果OBS刚刚启动且之前没有尝试过自动连接
                         if not last_obs_status and not self.auto_connect_attempted:
                             logger.info("检测到OBS启动，尝试自动连接WebSocket...")
-                            # 等待OBS完全启动
-                            time.sleep(3)
+                            # 等待OBS完全启动（WebSocket服务器开始监听）
+                            wait_until(port_open(), timeout=10, name="OBS WebSocket可连接")
                             # 在后台线程中尝试自动连接
                             threading.Thread(target=self.auto_connect_websocket, daemon=True).start()
                             self.auto_connect_attempted = True
@@ -517,7 +495,14 @@ class RTMPCaptureGUI:
                     self.root.after(0, self.update_websocket_status, is_connected)
                     
                     last_obs_status = current_obs_status
-                    time.sleep(2)  # 每2秒检测一次
+                    if is_connected:
+                        # 已连接时OBS状态由事件推送，等待断开或OBS退出再恢复轮询
+                        self.obs_state_event.clear()
+                        while self.obs_controller.is_connected() and not self.obs_controller.get_state()['exiting']:
+                            self.obs_state_event.wait(30)
+                            self.obs_state_event.clear()
+                    else:
+                        time.sleep(2)  # 未连接时每2秒检测一次
                 except Exception as e:
                     logger.error(f"OBS检测线程错误: {e}")
                     time.sleep(5)
@@ -526,6 +511,24 @@ class RTMPCaptureGUI:
             self.obs_detection_thread = threading.Thread(target=detect_obs, daemon=True)
             self.obs_detection_thread.start()
     
+    def on_obs_state_changed(self, state, changed):
+        """OBS状态变化回调（在事件循环线程中调用）"""
+        self.obs_state_event.set()
+        self.root.after(0, self.update_obs_state_display, state)
+    
+    def update_obs_state_display(self, state):
+        """根据事件推送的状态更新连接和推流状态显示"""
+        if state['reconnecting']:
+            self.websocket_status_label.config(text="重连中...", foreground="orange")
+        elif not state['connected']:
+            self.update_websocket_status(False)
+        elif state['exiting']:
+            self.websocket_status_label.config(text="已连接 (OBS正在退出)", foreground="orange")
+        elif state['stream_active']:
+            self.websocket_status_label.config(text="已连接 (推流中)", foreground="green")
+        else:
+            self.websocket_status_label.config(text="已连接", foreground="green")
+    
     def update_obs_status(self, is_running, obs_info):
         """更新OBS状态显示"""
         if is_running and obs_info:
@@ -537,14 +540,17 @@ class RTMPCaptureGUI:
             self.connect_obs_button.config(state=tk.DISABLED)
             self.apply_settings_button.config(state=tk.DISABLED)
             self.start_stream_button.config(state=tk.DISABLED)
+            self.apply_and_start_button.config(state=tk.DISABLED)
             self.stop_stream_button.config(state=tk.DISABLED)
     
     def update_websocket_status(self, is_connected):
         """更新WebSocket连接状态"""
         if is_connected:
-            self.websocket_status_label.config(text="已连接", foreground="green")
+            stream_active = self.obs_controller.get_state()['stream_active']
+            self.websocket_status_label.config(text="已连接 (推流中)" if stream_active else "已连接", foreground="green")
             self.apply_settings_button.config(state=tk.NORMAL)
             self.start_stream_button.config(state=tk.NORMAL)
+            self.apply_and_start_button.config(state=tk.NORMAL)
             self.stop_stream_button.config(state=tk.NORMAL)
         else:
             # 检查OBS是否运行来提供更详细的状态信息
@@ -555,6 +561,7 @@ class RTMPCaptureGUI:
                 self.websocket_status_label.config(text="未连接 (OBS未运行)", foreground="red")
             self.apply_settings_button.config(state=tk.DISABLED)
             self.start_stream_button.config(state=tk.DISABLED)
+            self.apply_and_start_button.config(state=tk.DISABLED)
             self.stop_stream_button.config(state=tk.DISABLED)
     
     def connect_obs(self):
@@ -599,8 +606,7 @@ class RTMPCaptureGUI:
                     auto_success = self.obs_controller.auto_configure_obs_websocket()
                     if auto_success:
                         self.root.after(0, lambda: messagebox.showinfo("提示", "已尝试自动配置WebSocket\n正在重启OBS，请稍候..."))
-                        import time
-                        time.sleep(5)  # 等待OBS重启
+                        wait_until(port_open(), timeout=20, interval=0.2, name="OBS重启")
                         
                         # 尝试多次连接，因为OBS启动需要时间
                         connected = False
@@ -638,8 +644,7 @@ class RTMPCaptureGUI:
                 auto_success = self.obs_controller.auto_configure_obs_websocket()
                 if auto_success:
                     # 等待OBS重启完成
-                    import time
-                    time.sleep(5)  # 等待OBS重启
+                    wait_until(port_open(), timeout=20, interval=0.2, name="OBS重启")
                     
                     # 尝试多次连接，因为OBS启动需要时间
                     for attempt in range(10):  # 最多尝试10次
@@ -657,100 +662,116 @@ class RTMPCaptureGUI:
             logger.error(f"自动连接WebSocket时发生错误: {str(e)}")
             return False
     
-    def apply_stream_settings(self):
-        """应用推流设置到OBS"""
-        # 获取当前捕获的服务器和推流码
+    def get_selected_stream_settings(self):
+        """获取当前捕获的第一个服务器地址和推流码，缺少时提示并返回None"""
         server_content = self.server_text.get(1.0, tk.END).strip()
         stream_content = self.stream_text.get(1.0, tk.END).strip()
         
         if not server_content:
             messagebox.showwarning("警告", "未检测到RTMP服务器地址")
-            return
+            return None
         
         if not stream_content:
             messagebox.showwarning("警告", "未检测到推流码")
-            return
+            return None
         
         # 取第一个服务器地址和推流码
         server = server_content.split('\n')[0].strip()
         stream_key = stream_content.split('\n')[0].strip()
+        return server, stream_key
+    
+    def obs_callback(self, handler):
+        """包装OBS异步操作的回调，转交到Tk主线程以 (结果, 异常) 调用 handler"""
+        return lambda result, error: self.root.after(0, handler, result, error)
+    
+    def apply_stream_settings(self):
+        """应用推流设置到OBS"""
+        settings = self.get_selected_stream_settings()
+        if not settings:
+            return
+        server, stream_key = settings
         
-        def apply_settings_thread():
-            try:
-                result = self.obs_controller.set_stream_settings(server, stream_key)
-                if result:
-                    self.root.after(0, lambda: messagebox.showinfo("成功", f"已应用推流设置\n服务器: {server}\n推流码: {stream_key}"))
-                    logger.info(f"已应用推流设置 - 服务器: {server}, 推流码: {stream_key}")
-                else:
-                    self.root.after(0, lambda: messagebox.showerror("错误", "应用推流设置失败"))
-                    logger.error("应用推流设置失败")
-            except Exception as e:
-                error_msg = f"应用推流设置时发生错误: {str(e)}"
-                self.root.after(0, lambda: messagebox.showerror("错误", error_msg))
+        def on_applied(result, error):
+            if error:
+                error_msg = f"应用推流设置时发生错误: {str(error)}"
+                messagebox.showerror("错误", error_msg)
                 logger.error(error_msg)
+            elif result:
+                messagebox.showinfo("成功", f"已应用推流设置\n服务器: {server}\n推流码: {stream_key}")
+                logger.info(f"已应用推流设置 - 服务器: {server}, 推流码: {stream_key}")
+            else:
+                messagebox.showerror("错误", "应用推流设置失败")
+                logger.error("应用推流设置失败")
         
-        threading.Thread(target=apply_settings_thread, daemon=True).start()
+        self.obs_controller.set_stream_settings_async(server, stream_key, callback=self.obs_callback(on_applied))
+    
+    def apply_and_start_stream(self):
+        """应用推流设置并开始推流（一次批量请求完成）"""
+        settings = self.get_selected_stream_settings()
+        if not settings:
+            return
+        server, stream_key = settings
+        
+        def on_started(result, error):
+            if error:
+                error_msg = f"应用推流设置并开始推流时发生错误: {str(error)}"
+                messagebox.showerror("错误", error_msg)
+                logger.error(error_msg)
+            elif result and result['success']:
+                messagebox.showinfo("成功", f"已应用推流设置并开始推流\n服务器: {server}\n推流码: {stream_key}")
+                logger.info(f"已应用推流设置并开始推流 - 服务器: {server}, 推流码: {stream_key}")
+            else:
+                messagebox.showerror("错误", "应用推流设置并开始推流失败")
+                logger.error("应用推流设置并开始推流失败")
+        
+        self.obs_controller.apply_and_start_async(server, stream_key, callback=self.obs_callback(on_started))
     
     def start_obs_stream(self):
         """开始OBS推流"""
-        def start_stream_thread():
-            try:
-                result = self.obs_controller.start_streaming()
-                if result:
-                    self.root.after(0, lambda: messagebox.showinfo("成功", "已开始推流"))
-                    logger.info("已开始OBS推流")
-                else:
-                    self.root.after(0, lambda: messagebox.showerror("错误", "开始推流失败"))
-                    logger.error("开始OBS推流失败")
-            except Exception as e:
-                error_msg = f"开始推流时发生错误: {str(e)}"
-                self.root.after(0, lambda: messagebox.showerror("错误", error_msg))
+        def on_started(result, error):
+            if error:
+                error_msg = f"开始推流时发生错误: {str(error)}"
+                messagebox.showerror("错误", error_msg)
                 logger.error(error_msg)
+            elif result:
+                messagebox.showinfo("成功", "已开始推流")
+                logger.info("已开始OBS推流")
+            else:
+                messagebox.showerror("错误", "开始推流失败")
+                logger.error("开始OBS推流失败")
         
-        threading.Thread(target=start_stream_thread, daemon=True).start()
+        self.obs_controller.start_streaming_async(callback=self.obs_callback(on_started))
     
     def stop_obs_stream(self):
         """停止OBS推流"""
-        def stop_stream_thread():
+        def reopen_companion_thread():
+            # 停止推流成功后，立即重新打开直播伴侣并点击取消直播按钮
             try:
-                result = self.obs_controller.stop_streaming()
-                if result:
-                    self.root.after(0, lambda: messagebox.showinfo("成功", "已停止推流"))
-                    logger.info("已停止OBS推流")
-                    
-                    # 停止推流成功后，立即自动打开直播伴侣
-                    try:
-                        logger.info("开始自动打开直播伴侣...")
-                        companion_success = self.obs_launcher.auto_open_live_companion()
-                        if companion_success:
-                            logger.info("停止推流后成功自动打开直播伴侣")
-                            
-                            # 等待直播伴侣完全启动后，自动点击取消直播按钮
-                            import time
-                            time.sleep(3)  # 等待3秒确保直播伴侣完全启动
-                            
-                            try:
-                                logger.info("开始自动点击取消直播按钮...")
-                                cancel_success = self.obs_launcher.click_cancel_streaming_button()
-                                if cancel_success:
-                                    logger.info("成功自动点击取消直播按钮")
-                                else:
-                                    logger.warning("自动点击取消直播按钮失败")
-                            except Exception as cancel_error:
-                                logger.error(f"自动点击取消直播按钮时发生错误: {str(cancel_error)}")
-                        else:
-                            logger.warning("停止推流后自动打开直播伴侣失败")
-                    except Exception as companion_error:
-                        logger.error(f"停止推流后自动打开直播伴侣时发生错误: {str(companion_error)}")
+                result = build_go_offline_workflow(self.obs_launcher).run()
+                if not result['open_companion'].ok:
+                    logger.warning("停止推流后自动打开直播伴侣失败")
+                elif result['cancel_live'].ok:
+                    logger.info("成功自动点击取消直播按钮")
                 else:
-                    self.root.after(0, lambda: messagebox.showerror("错误", "停止推流失败"))
-                    logger.error("停止OBS推流失败")
-            except Exception as e:
-                error_msg = f"停止推流时发生错误: {str(e)}"
-                self.root.after(0, lambda: messagebox.showerror("错误", error_msg))
+                    logger.warning("自动点击取消直播按钮失败")
+            except Exception as companion_error:
+                logger.error(f"停止推流后自动打开直播伴侣时发生错误: {str(companion_error)}")
+        
+        def on_stopped(result, error):
+            if error:
+                error_msg = f"停止推流时发生错误: {str(error)}"
+                messagebox.showerror("错误", error_msg)
                 logger.error(error_msg)
+            elif result:
+                logger.info("已停止OBS推流")
+                # 桌面自动化操作仍需阻塞等待，放到后台线程
+                threading.Thread(target=reopen_companion_thread, daemon=True).start()
+                messagebox.showinfo("成功", "已停止推流")
+            else:
+                messagebox.showerror("错误", "停止推流失败")
+                logger.error("停止OBS推流失败")
         
-        threading.Thread(target=stop_stream_thread, daemon=True).start()
+        self.obs_controller.stop_streaming_async(callback=self.obs_callback(on_stopped))
     
     def show_websocket_help(self):
         """显示WebSocket配置帮助"""
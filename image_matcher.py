@@ -0,0 +1,570 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模板图片匹配
+模板图片只解码一次并缓存预处理结果（灰度图和各缩放层级），文件修改后按 mtime 自动重新加载；
+匹配在灰度图上由粗到精进行：先在缩小的截图上搜索多个缩放比例（适应系统显示缩放），
+再只在候选位置用原分辨率确认。匹配器记住每个模板在每种屏幕分辨率下上次出现的位置，
+先在该位置附近的小区域内搜索，未命中时才搜索整个屏幕。
+重复检测同一画面时按分块指纹跳过没有变化的部分
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+from typing import Optional, Dict, Any, Iterable
+
+try:
+    import cv2
+    import numpy as np
+    OPENCV_AVAILABLE = True
+except ImportError:
+    OPENCV_AVAILABLE = False
+
+# 模板在屏幕上可能的缩放比例，对应 Windows 显示缩放 100% / 125% / 150%
+DPI_SCALES = (1.0, 1.25, 1.5)
+
+# 粗匹配时截图和模板的缩小比例
+COARSE_SCALE = 0.5
+
+# 粗匹配时模板短边的最小像素数，模板过小时缩小后特征丢失，改用更大的比例或原分辨率
+MIN_COARSE_SIDE = 12
+
+# 模板加载时预先生成的缩放层级（各显示缩放比例在原分辨率和粗匹配比例下的尺寸）
+PYRAMID_SCALES = tuple(sorted({scale * factor for scale in DPI_SCALES for factor in (1.0, COARSE_SCALE)}))
+
+
+class Template:
+    """解码后的模板图片及其预处理结果"""
+
+    __slots__ = ('path', 'name', 'mtime', 'gray', 'pyramid', 'width', 'height')
+
+    def __init__(self, path: str, name: str, mtime: float, bgr, scales: Iterable[float] = PYRAMID_SCALES):
+        self.path = path
+        self.name = name
+        self.mtime = mtime
+        self.gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+        self.height, self.width = bgr.shape[:2]
+        self.pyramid = {1.0: self.gray}  # 缩放比例 -> 灰度图
+        for scale in scales:
+            self.scaled_gray(scale)
+
+    def scaled_gray(self, scale: float):
+        """按比例缩放的灰度模板，生成后缓存"""
+        cached = self.pyramid.get(scale)
+        if cached is not None:
+            return cached
+        width = max(1, int(round(self.width * scale)))
+        height = max(1, int(round(self.height * scale)))
+        interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+        scaled = self.pyramid[scale] = cv2.resize(self.gray, (width, height), interpolation=interpolation)
+        return scaled
+
+
+class TemplateRegistry:
+    """模板缓存：首次使用时解码，之后只检查文件 mtime，文件变化时重新解码"""
+
+    def __init__(self, scales: Iterable[float] = PYRAMID_SCALES):
+        self.scales = tuple(scales)
+        self._templates: Dict[str, Template] = {}
+        self._lock = threading.Lock()
+        self.stats = {'loads': 0, 'hits': 0, 'reloads': 0, 'load_time': 0.0}
+
+    def get(self, path: str, name: Optional[str] = None) -> Optional[Template]:
+        """获取模板，文件不存在或无法解码时返回None"""
+        name = name or os.path.basename(path)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError as e:
+            logger.error(f"找不到{name}: {path} ({e})")
+            return None
+
+        with self._lock:
+            template = self._templates.get(path)
+            if template is not None and template.mtime == mtime:
+                self.stats['hits'] += 1
+                return template
+
+        reloading = template is not None
+        template = self._load(path, name, mtime)
+        if template is None:
+            return None
+        with self._lock:
+            self._templates[path] = template
+            self.stats['loads'] += 1
+            if reloading:
+                self.stats['reloads'] += 1
+        if reloading:
+            logger.info(f"{name}已修改，重新加载: {path}")
+        return template
+
+    def _load(self, path: str, name: str, mtime: float) -> Optional[Template]:
+        """读取并解码模板图片（用 imdecode 支持中文路径）"""
+        start_time = time.perf_counter()
+        try:
+            with open(path, 'rb') as f:
+                image_data = f.read()
+            bgr = cv2.imdecode(np.frombuffer(image_data, np.uint8), cv2.IMREAD_COLOR)
+            if bgr is None:
+                logger.error(f"无法解码{name}: {path}")
+                return None
+            template = Template(path, name, mtime, bgr, self.scales)
+        except Exception as e:
+            logger.error(f"读取{name}失败: {path}, 错误: {e}")
+            return None
+        finally:
+            self.stats['load_time'] += time.perf_counter() - start_time
+        logger.debug(f"已加载{name}: {template.width}x{template.height}")
+        return template
+
+    def preload(self, templates: Dict[str, str]):
+        """预加载模板 {路径: 名称}，不存在的文件跳过"""
+        for path, name in templates.items():
+            if os.path.exists(path):
+                self.get(path, name)
+
+    def invalidate(self, path: Optional[str] = None):
+        """丢弃缓存的模板，path 为 None 时清空全部"""
+        with self._lock:
+            if path is None:
+                self._templates.clear()
+            else:
+                self._templates.pop(path, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats['cached'] = len(self._templates)
+        return stats
+
+
+class FramePyramid:
+    """一帧截图及其灰度图和缩小版本，按需生成并缓存，同一帧匹配多个模板时只转换一次"""
+
+    def __init__(self, rgb):
+        self.rgb = rgb
+        self.height, self.width = rgb.shape[:2]
+        self._gray = rgb if rgb.ndim == 2 else None
+        self._scaled = {}
+
+    @property
+    def gray(self):
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.rgb, cv2.COLOR_RGB2GRAY)
+        return self._gray
+
+    def scaled(self, factor: float):
+        """按比例缩小的灰度图"""
+        if factor >= 1.0:
+            return self.gray
+        image = self._scaled.get(factor)
+        if image is None:
+            size = (max(1, int(round(self.width * factor))), max(1, int(round(self.height * factor))))
+            image = self._scaled[factor] = cv2.resize(self.gray, size, interpolation=cv2.INTER_AREA)
+        return image
+
+
+class Match:
+    """一次匹配结果，坐标为屏幕坐标"""
+
+    __slots__ = ('name', 'left', 'top', 'width', 'height', 'score', 'scale', 'from_roi')
+
+    def __init__(self, name: str, left: int, top: int, width: int, height: int, score: float,
+                 scale: float = 1.0, from_roi: bool = False):
+        self.name = name
+        self.left = left
+        self.top = top
+        self.width = width
+        self.height = height
+        self.score = score
+        self.scale = scale         # 命中的模板缩放比例（对应系统显示缩放）
+        self.from_roi = from_roi   # 是否在上次位置附近命中
+
+    @property
+    def center(self):
+        return (self.left + self.width // 2, self.top + self.height // 2)
+
+    def __repr__(self):
+        return (f"Match({self.name} @ {self.center}, {self.score:.3f}, x{self.scale:g}"
+                f"{', roi' if self.from_roi else ''})")
+
+
+class TemplateMatcher:
+    """由粗到精的多尺度灰度模板匹配器，带位置记忆
+
+    全屏搜索：先把截图和各缩放比例的模板缩小到 coarse_scale，在小图上找出得分最高的
+    refine_candidates 个候选位置（阈值放宽 coarse_margin），再只在这些位置附近用原分辨率精确匹配。
+    位置记忆：按 (模板路径, 屏幕宽, 屏幕高) 记住上次命中的位置和缩放比例，下次先在其周围
+    roi_margin 像素的区域内匹配，未命中再全屏搜索。统计区域命中率和节省的时间
+    """
+
+    def __init__(self, scales: Iterable[float] = DPI_SCALES, coarse_scale: float = COARSE_SCALE,
+                 refine_candidates: int = 3, coarse_margin: float = 0.2, roi_margin: int = 48,
+                 remember: bool = True, log_every: int = 20, max_workers: int = 4):
+        self.scales = tuple(scales)
+        self.coarse_scale = coarse_scale
+        self.refine_candidates = refine_candidates
+        self.coarse_margin = coarse_margin
+        self.roi_margin = roi_margin
+        self.remember = remember
+        self.log_every = log_every   # 每多少次匹配输出一次统计
+        self.max_workers = max_workers
+        self._executor = None        # match_many 使用的线程池，首次使用时创建
+        self.roi_memory: Dict[tuple, tuple] = {}   # (路径, 宽, 高) -> (left, top, scale)
+        self._lock = threading.Lock()
+        self.stats = {
+            'matches': 0,
+            'roi_hits': 0,       # 在记忆位置附近命中
+            'roi_misses': 0,     # 有记忆位置但附近未命中，回退全屏
+            'full_searches': 0,
+            'full_time': 0.0,    # 全屏搜索总耗时
+            'roi_time': 0.0,     # 区域匹配总耗时
+        }
+
+    def match(self, frame, template: Template, threshold: float = 0.8) -> Optional[Match]:
+        """在帧（RGB 数组或 FramePyramid）中匹配模板，达到阈值时返回 Match"""
+        if not isinstance(frame, FramePyramid):
+            frame = FramePyramid(frame)
+        key = (template.path, frame.width, frame.height)
+        remembered = self.roi_memory.get(key) if self.remember else None
+
+        found = None
+        if remembered is not None:
+            start_time = time.perf_counter()
+            left, top, scale = remembered
+            found = self._match_near(frame.gray, template, scale, left, top, self.roi_margin,
+                                     threshold, from_roi=True)
+            elapsed = time.perf_counter() - start_time
+            with self._lock:
+                self.stats['roi_time'] += elapsed
+                self.stats['roi_hits' if found else 'roi_misses'] += 1
+
+        if found is None:
+            start_time = time.perf_counter()
+            found = self._search(frame, template, threshold)
+            with self._lock:
+                self.stats['full_time'] += time.perf_counter() - start_time
+                self.stats['full_searches'] += 1
+
+        with self._lock:
+            self.stats['matches'] += 1
+            matches = self.stats['matches']
+        if found is not None and self.remember:
+            self.roi_memory[key] = (found.left, found.top, found.scale)
+        if self.log_every and matches % self.log_every == 0:
+            self.log_stats()
+        return found
+
+    def match_many(self, frame, templates: Iterable[Template], threshold: float = 0.8) -> Dict[str, Optional[Match]]:
+        """在同一帧中匹配多个模板，返回 {模板名称: Match 或 None}
+
+        灰度图和缩小图先生成一次供所有模板共用，各模板的匹配在线程池中并行执行
+        （OpenCV 匹配时释放 GIL）
+        """
+        if not isinstance(frame, FramePyramid):
+            frame = FramePyramid(frame)
+        templates = [template for template in templates if template is not None]
+        if not templates:
+            return {}
+        # 预先生成共用的图像，避免多个线程同时生成
+        _ = frame.gray
+        for factor in {self._coarse_factor(template) for template in templates}:
+            frame.scaled(factor)
+
+        if len(templates) == 1 or self.max_workers <= 1:
+            return {template.name: self.match(frame, template, threshold) for template in templates}
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="matcher")
+        futures = {template.name: self._executor.submit(self.match, frame, template, threshold)
+                   for template in templates}
+        return {name: future.result() for name, future in futures.items()}
+
+    def _coarse_factor(self, template: Template) -> float:
+        """粗匹配的缩小比例，保证最小缩放下的模板短边不少于 MIN_COARSE_SIDE"""
+        factor = self.coarse_scale
+        shortest = min(template.width, template.height) * min(self.scales)
+        while factor < 1.0 and shortest * factor < MIN_COARSE_SIDE:
+            factor *= 2
+        return min(factor, 1.0)
+
+    def _search(self, frame: FramePyramid, template: Template, threshold: float) -> Optional[Match]:
+        """全屏搜索：粗匹配找候选位置，原分辨率精确匹配"""
+        factor = self._coarse_factor(template)
+        if factor >= 1.0:
+            # 模板太小无法缩小，直接在原分辨率上逐个缩放比例匹配
+            best = None
+            for scale in self.scales:
+                found = self._match_region(frame.gray, template, scale, 0, 0, threshold)
+                if found is not None and (best is None or found.score > best.score):
+                    best = found
+            return best
+
+        small = frame.scaled(factor)
+        candidates = []
+        for scale in self.scales:
+            coarse_template = template.scaled_gray(scale * factor)
+            if coarse_template.shape[0] > small.shape[0] or coarse_template.shape[1] > small.shape[1]:
+                continue
+            result = cv2.matchTemplate(small, coarse_template, cv2.TM_CCOEFF_NORMED)
+            for score, (x, y) in _peaks(result, self.refine_candidates, coarse_template.shape):
+                if score >= threshold - self.coarse_margin:
+                    candidates.append((score, scale, x, y))
+
+        if not candidates:
+            logger.debug(f"未检测到{template.name}（粗匹配无候选）")
+            return None
+        candidates.sort(reverse=True)
+
+        # 粗匹配位置的误差不超过缩小倍数，精确匹配时在候选位置周围留出余量
+        margin = int(round(1 / factor)) + 2
+        best = None
+        for score, scale, x, y in candidates[:self.refine_candidates]:
+            found = self._match_near(frame.gray, template, scale, int(x / factor), int(y / factor),
+                                     margin, threshold)
+            if found is not None and (best is None or found.score > best.score):
+                best = found
+        return best
+
+    def _match_near(self, gray, template: Template, scale: float, left: int, top: int, margin: int,
+                    threshold: float, from_roi: bool = False) -> Optional[Match]:
+        """在 (left, top) 周围 margin 像素的区域内匹配指定缩放比例的模板"""
+        scaled = template.scaled_gray(scale)
+        height, width = scaled.shape[:2]
+        x0, y0 = max(0, left - margin), max(0, top - margin)
+        x1 = min(gray.shape[1], left + width + margin)
+        y1 = min(gray.shape[0], top + height + margin)
+        return self._match_region(gray[y0:y1, x0:x1], template, scale, x0, y0, threshold, from_roi)
+
+    @staticmethod
+    def _match_region(image, template: Template, scale: float, offset_x: int, offset_y: int,
+                      threshold: float, from_roi: bool = False) -> Optional[Match]:
+        scaled = template.scaled_gray(scale)
+        height, width = scaled.shape[:2]
+        if image.shape[0] < height or image.shape[1] < width:
+            return None
+        result = cv2.matchTemplate(image, scaled, cv2.TM_CCOEFF_NORMED)
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        if max_val < threshold:
+            logger.debug(f"未检测到{template.name}，匹配度: {max_val:.3f} < {threshold}")
+            return None
+        return Match(template.name, offset_x + max_loc[0], offset_y + max_loc[1],
+                     width, height, max_val, scale, from_roi)
+
+    def search_region(self, frame: FramePyramid, template: Template, box, threshold: float = 0.8) -> Optional[Match]:
+        """只在 box=(left, top, right, bottom) 范围内搜索模板（不使用也不更新位置记忆）"""
+        left, top, right, bottom = box
+        region = FramePyramid(frame.gray[top:bottom, left:right])
+        start_time = time.perf_counter()
+        found = self._search(region, template, threshold)
+        with self._lock:
+            self.stats['full_time'] += time.perf_counter() - start_time
+            self.stats['full_searches'] += 1
+        if found is not None:
+            found.left += left
+            found.top += top
+        return found
+
+    def forget(self, template: Optional[Template] = None):
+        """清除位置记忆（界面布局变化时），template 为 None 时清除全部"""
+        if template is None:
+            self.roi_memory.clear()
+            return
+        for key in [key for key in self.roi_memory if key[0] == template.path]:
+            del self.roi_memory[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """区域命中率、平均耗时和估算节省的时间"""
+        with self._lock:
+            stats = dict(self.stats)
+        avg_full = stats['full_time'] / stats['full_searches'] if stats['full_searches'] else 0.0
+        roi_attempts = stats['roi_hits'] + stats['roi_misses']
+        stats['roi_hit_rate'] = stats['roi_hits'] / roi_attempts if roi_attempts else 0.0
+        stats['avg_full_ms'] = avg_full * 1000
+        stats['avg_roi_ms'] = stats['roi_time'] / roi_attempts * 1000 if roi_attempts else 0.0
+        # 区域命中省去了一次全屏搜索，但所有区域匹配（包括未命中的）都是额外开销
+        stats['time_saved'] = stats['roi_hits'] * avg_full - stats['roi_time']
+        return stats
+
+    def log_stats(self):
+        stats = self.get_stats()
+        logger.info(f"模板匹配统计: {stats['matches']} 次，区域命中 {stats['roi_hits']}/"
+                    f"{stats['roi_hits'] + stats['roi_misses']} ({stats['roi_hit_rate']:.0%})，"
+                    f"全屏平均 {stats['avg_full_ms']:.1f}ms，区域平均 {stats['avg_roi_ms']:.1f}ms，"
+                    f"节省约 {stats['time_saved'] * 1000:.0f}ms")
+
+
+def _peaks(result, count: int, template_shape):
+    """匹配结果图中得分最高的 count 个位置，相邻峰值（模板大小范围内）只取一个"""
+    if count <= 1:
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        return [(max_val, max_loc)]
+    result = result.copy()
+    half_height, half_width = template_shape[0] // 2 + 1, template_shape[1] // 2 + 1
+    peaks = []
+    for _ in range(count):
+        _, max_val, _, (x, y) = cv2.minMaxLoc(result)
+        peaks.append((max_val, (x, y)))
+        result[max(0, y - half_height):y + half_height, max(0, x - half_width):x + half_width] = -1.0
+    return peaks
+
+
+class FrameGate:
+    """帧变化门控：重复检测时跳过没有变化的画面
+
+    每帧按 tile_size 像素分块，对隔 sample_step 像素采样的值求和作为每块的指纹，
+    与上一帧比较得到变化的块：
+    - 没有任何变化：直接返回上一次的结果，不做匹配
+    - 上次命中且命中区域没有变化：沿用命中结果
+    - 其他情况：只在变化块的外接矩形（向外扩展模板大小）内重新搜索
+    每 refresh_every 帧做一次完整匹配，避免指纹碰撞导致结果长期不更新。
+    一个 FrameGate 对应一个检测循环，循环结束后丢弃
+    """
+
+    def __init__(self, matcher: TemplateMatcher, tile_size: int = 64, sample_step: int = 4,
+                 tolerance: float = 1.0, refresh_every: int = 20, full_ratio: float = 0.5):
+        self.matcher = matcher
+        self.tile_size = tile_size
+        self.sample_step = sample_step
+        self.tolerance = tolerance        # 块内平均变化超过多少灰度级视为变化
+        self.refresh_every = refresh_every
+        self.full_ratio = full_ratio      # 变化区域超过画面的这个比例时直接全屏匹配
+        self._fingerprint = None
+        self._shape = None
+        self._results: Dict[str, Optional[Match]] = {}
+        self._since_refresh = 0
+        self.stats = {'frames': 0, 'unchanged': 0, 'reused': 0, 'region_searches': 0, 'full_matches': 0}
+
+    def fingerprint(self, frame: FramePyramid):
+        """每块采样值之和（int64 二维数组）"""
+        step, tile = self.sample_step, self.tile_size // self.sample_step
+        image = frame.rgb[::step, ::step]
+        sampled = image.astype(np.int32).sum(axis=2) if image.ndim == 3 else image.astype(np.int32)
+        rows, cols = -(-sampled.shape[0] // tile), -(-sampled.shape[1] // tile)
+        padded = np.zeros((rows * tile, cols * tile), np.int64)
+        padded[:sampled.shape[0], :sampled.shape[1]] = sampled
+        return padded.reshape(rows, tile, cols, tile).sum(axis=(1, 3))
+
+    def _changed_tiles(self, fingerprint, frame: FramePyramid):
+        """与上一帧相比变化的块（布尔数组），首帧或尺寸变化时返回None"""
+        if self._fingerprint is None or self._shape != (frame.height, frame.width):
+            return None
+        channels = 1 if frame.rgb.ndim == 2 else frame.rgb.shape[2]
+        samples = (self.tile_size // self.sample_step) ** 2 * channels
+        return np.abs(fingerprint - self._fingerprint) > self.tolerance * samples
+
+    def match_many(self, frame, templates: Iterable[Template], threshold: float = 0.8) -> Dict[str, Optional[Match]]:
+        """与 TemplateMatcher.match_many 相同，画面没有变化的部分不重复匹配"""
+        if not isinstance(frame, FramePyramid):
+            frame = FramePyramid(frame)
+        templates = [template for template in templates if template is not None]
+        fingerprint = self.fingerprint(frame)
+        changed = self._changed_tiles(fingerprint, frame)
+        self._fingerprint, self._shape = fingerprint, (frame.height, frame.width)
+        self.stats['frames'] += 1
+        self._since_refresh += 1
+        if self._since_refresh >= self.refresh_every:
+            changed = None
+
+        if changed is not None and not changed.any() and all(t.name in self._results for t in templates):
+            self.stats['unchanged'] += 1
+            return {template.name: self._results[template.name] for template in templates}
+
+        box = None
+        if changed is not None and changed.any():
+            box = self._changed_box(changed, frame)
+        full, regional = [], []
+        results = {}
+        for template in templates:
+            previous = self._results.get(template.name, False)
+            if changed is None or previous is False:
+                full.append(template)
+            elif previous is not None and not self._overlaps(changed, previous):
+                results[template.name] = previous
+                self.stats['reused'] += 1
+            elif box is None:
+                # 没有变化，沿用上次的未命中结果
+                results[template.name] = previous
+                self.stats['reused'] += 1
+            else:
+                regional.append(template)
+
+        if regional and self._box_ratio(box, frame) > self.full_ratio:
+            full.extend(regional)
+            regional = []
+        if full:
+            results.update(self.matcher.match_many(frame, full, threshold))
+            self.stats['full_matches'] += len(full)
+        for template in regional:
+            results[template.name] = self.matcher.search_region(frame, template, self._expand(box, template, frame),
+                                                                threshold)
+            self.stats['region_searches'] += 1
+
+        if changed is None:
+            self._since_refresh = 0
+        self._results.update(results)
+        return results
+
+    def match(self, frame, template: Template, threshold: float = 0.8) -> Optional[Match]:
+        return self.match_many(frame, [template], threshold).get(template.name)
+
+    def _changed_box(self, changed, frame: FramePyramid):
+        """变化块的外接矩形（屏幕坐标）"""
+        rows, cols = np.nonzero(changed)
+        tile = self.tile_size
+        return (int(cols.min()) * tile, int(rows.min()) * tile,
+                min(frame.width, (int(cols.max()) + 1) * tile), min(frame.height, (int(rows.max()) + 1) * tile))
+
+    def _expand(self, box, template: Template, frame: FramePyramid):
+        """向外扩展模板（最大缩放比例下）的大小，覆盖与变化区域相交的所有位置"""
+        scale = max(self.matcher.scales)
+        margin_x, margin_y = int(template.width * scale) + 1, int(template.height * scale) + 1
+        left, top, right, bottom = box
+        # 起点对齐到 8 像素，缩小后的采样相位与全屏搜索一致
+        return (max(0, (left - margin_x) // 8 * 8), max(0, (top - margin_y) // 8 * 8),
+                min(frame.width, right + margin_x), min(frame.height, bottom + margin_y))
+
+    def _overlaps(self, changed, match: Match) -> bool:
+        """命中区域内是否有变化的块"""
+        tile = self.tile_size
+        return bool(changed[match.top // tile:(match.top + match.height - 1) // tile + 1,
+                            match.left // tile:(match.left + match.width - 1) // tile + 1].any())
+
+    @staticmethod
+    def _box_ratio(box, frame: FramePyramid) -> float:
+        return (box[2] - box[0]) * (box[3] - box[1]) / (frame.width * frame.height)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats['unchanged_rate'] = stats['unchanged'] / stats['frames'] if stats['frames'] else 0.0
+        return stats
+
+
+if __name__ == "__main__":
+    # 测试代码
+    registry = TemplateRegistry()
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "开始直播.png")
+    for _ in range(3):
+        template = registry.get(path, "开始直播按钮")
+        if template is not None:
+            print(f"{template.name}: {template.width}x{template.height}, 层级 {list(template.pyramid)}")
+    print(f"统计: {registry.get_stats()}")
+
+    if template is not None:
+        # 把模板贴到随机背景上，重复匹配观察区域命中
+        frame = np.random.default_rng(0).integers(0, 255, (1080, 1920, 3), dtype=np.uint8)
+        frame[700:700 + template.height, 1500:1500 + template.width] = template.gray[:, :, None]
+        matcher = TemplateMatcher(log_every=0)
+        for _ in range(5):
+            print(matcher.match(frame, template))
+        print(matcher.match_many(frame, [template]))
+        matcher.log_stats()
+
+        # 画面不变时跳过匹配，局部变化时只在变化区域内重新搜索
+        gate = FrameGate(TemplateMatcher(log_every=0))
+        print(gate.match(frame, template))
+        print(gate.match(frame, template))
+        frame[100:300, 100:300] = 255
+        print(gate.match(frame, template))
+        print(f"门控统计: {gate.get_stats()}")
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模拟桌面/进程驱动
+提供与 OBSLauncher 相同的启动、点击和进程方法，用计时器模拟进程启动延迟、界面按钮出现
+和推流码捕获，用于在没有 Windows 桌面的环境下执行和测试自动化流程
+"""
+
+import time
+import threading
+from loguru import logger
+from wait_conditions import wait_until
+
+
+class FakeCapture:
+    """模拟 RTMPCapture 中自动化流程用到的属性"""
+
+    def __init__(self):
+        self.is_capturing = True
+        self.capture_thread = threading.current_thread()
+        self.rtmp_streams = []
+
+
+class FakeDesktopDriver:
+    """模拟桌面
+
+    obs_start_delay / companion_start_delay: 发出启动操作后进程出现的延迟（秒）
+    ui_delay: 直播伴侣进程启动后界面按钮出现的延迟
+    stream_key_delay: 点击开始直播后捕获到推流码的延迟
+    fail_clicks: 前几次点击按钮失败（用于测试重试）
+    typing_time: 每段键盘操作的耗时，键盘操作在 input_lock 内执行，不会交错；
+    启动程序时一直持有 input_lock，直到进程出现（模拟新窗口获得焦点）
+    """
+
+    def __init__(self, obs_start_delay=0.5, companion_start_delay=0.5, ui_delay=0.2,
+                 stream_key_delay=0.3, fail_clicks=0, typing_time=0.05):
+        self.obs_start_delay = obs_start_delay
+        self.companion_start_delay = companion_start_delay
+        self.ui_delay = ui_delay
+        self.stream_key_delay = stream_key_delay
+        self.fail_clicks = fail_clicks
+        self.typing_time = typing_time
+        self.launch_timeout = 15
+        self.window_timeout = 10
+        self.input_lock = threading.RLock()
+        self.capture = FakeCapture()
+        self.processes = {}   # 进程名 -> 启动时间（time.monotonic）
+        self.input_log = []   # 键盘/鼠标操作记录 (时间, 操作)
+        self.live = False
+
+    def _type(self, action):
+        """模拟一段键盘操作"""
+        with self.input_lock:
+            self.input_log.append((time.monotonic(), f"{action}:开始"))
+            time.sleep(self.typing_time)
+            self.input_log.append((time.monotonic(), f"{action}:结束"))
+
+    def _spawn(self, name, delay):
+        self.processes.setdefault(name, time.monotonic() + delay)
+
+    def _running(self, name):
+        started = self.processes.get(name)
+        return started is not None and time.monotonic() >= started
+
+    def is_obs_running(self):
+        return self._running('obs64.exe')
+
+    def is_live_companion_running(self):
+        return self._running('直播伴侣.exe')
+
+    def auto_open_obs(self):
+        if self.is_obs_running():
+            return True
+        # 与 OBSLauncher 一致：进程启动（窗口获得焦点）之前不释放输入锁
+        with self.input_lock:
+            self._type("启动OBS")
+            self._spawn('obs64.exe', self.obs_start_delay)
+            started = wait_until(self.is_obs_running, timeout=self.launch_timeout, name="OBS进程启动")
+            self.input_log.append((time.monotonic(), "OBS窗口获得焦点" if started else "OBS启动超时"))
+        return bool(started)
+
+    def auto_open_live_companion(self):
+        if self.is_live_companion_running():
+            return True
+        with self.input_lock:
+            self._type("启动直播伴侣")
+            self._spawn('直播伴侣.exe', self.companion_start_delay)
+            started = wait_until(self.is_live_companion_running, timeout=self.launch_timeout, name="直播伴侣进程启动")
+            self.input_log.append((time.monotonic(), "直播伴侣窗口获得焦点" if started else "直播伴侣启动超时"))
+        return bool(started)
+
+    def _button_visible(self):
+        started = self.processes.get('直播伴侣.exe')
+        return started is not None and time.monotonic() >= started + self.ui_delay
+
+    def _click_button(self, name):
+        if not wait_until(self._button_visible, timeout=self.window_timeout, name=f"{name}出现"):
+            return False
+        self._type(f"点击{name}")
+        if self.fail_clicks > 0:
+            self.fail_clicks -= 1
+            logger.info(f"模拟点击{name}失败")
+            return False
+        return True
+
+    def start_live_streaming_with_image_detection(self):
+        if not self.is_live_companion_running() and not self.auto_open_live_companion():
+            return False
+        if not self._click_button("开始直播按钮"):
+            return False
+        self.live = True
+        threading.Timer(self.stream_key_delay,
+                        lambda: self.capture.rtmp_streams.append("stream-key")).start()
+        return True
+
+    def click_cancel_streaming_button(self):
+        if not self.is_live_companion_running():
+            return False
+        if not self._click_button("取消直播按钮"):
+            return False
+        self.live = False
+        return True
+
+    def terminate_live_companion(self):
+        return self.processes.pop('直播伴侣.exe', None) is not None
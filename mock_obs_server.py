@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模拟OBS WebSocket服务器（obs-websocket v5 协议）
+实现 Hello/Identify/Identified（含密码认证）、请求/响应、批量请求和事件推送，
+可配置延迟和故障，用于在没有OBS的环境下测试和压测 OBSController
+"""
+
+import json
+import time
+import base64
+import random
+import asyncio
+import hashlib
+import argparse
+import websockets
+from loguru import logger
+from obs_codec import JSONCodec, CODECS, available_codecs, codec_for_subprotocol
+
+# 推流输出状态
+OUTPUT_STARTING = "OBS_WEBSOCKET_OUTPUT_STARTING"
+OUTPUT_STARTED = "OBS_WEBSOCKET_OUTPUT_STARTED"
+OUTPUT_STOPPING = "OBS_WEBSOCKET_OUTPUT_STOPPING"
+OUTPUT_STOPPED = "OBS_WEBSOCKET_OUTPUT_STOPPED"
+
+# 事件类别（与 Identify 中的 eventSubscriptions 位对应）
+EVENT_GENERAL = 1 << 0
+EVENT_CONFIG = 1 << 1
+EVENT_OUTPUTS = 1 << 6
+
+# RequestStatus 代码
+STATUS_SUCCESS = 100
+STATUS_UNKNOWN_REQUEST = 204
+STATUS_OUTPUT_RUNNING = 500
+STATUS_OUTPUT_NOT_RUNNING = 501
+STATUS_PROCESSING_FAILED = 702
+
+# WebSocket 关闭代码
+CLOSE_AUTH_FAILED = 4009
+CLOSE_UNSUPPORTED_RPC = 4010
+
+
+class MockOBSServer:
+    """模拟OBS WebSocket服务器
+
+    latency / jitter: 每个请求的处理延迟（秒），jitter 为额外的随机延迟上限
+    fault_rate: 请求返回失败状态的概率
+    drop_rate: 请求不返回任何响应的概率（用于测试超时）
+    disconnect_after: 每个连接处理多少个请求后主动断开（用于测试重连），None 表示不断开
+    encodings: 支持的消息编码，按客户端提供的子协议协商，客户端未提供时使用 JSON
+    """
+
+    def __init__(self, host="127.0.0.1", port=4455, password=None, latency=0.0, jitter=0.0,
+                 fault_rate=0.0, drop_rate=0.0, disconnect_after=None, encodings=None):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.latency = latency
+        self.jitter = jitter
+        self.fault_rate = fault_rate
+        self.drop_rate = drop_rate
+        self.disconnect_after = disconnect_after
+        self.encodings = [name for name in (encodings or ("msgpack", "json")) if name in available_codecs()]
+
+        self.server = None
+        self.clients = {}  # websocket -> eventSubscriptions
+        self.codecs = {}   # websocket -> 协商的编码
+        self.request_count = 0
+        self.stats = {'requests': 0, 'batches': 0, 'faults': 0, 'dropped': 0, 'connections': 0}
+
+        # 模拟的OBS状态
+        self.stream_active = False
+        self.stream_started_ns = None
+        self.stream_service = {
+            "streamServiceType": "rtmp_custom",
+            "streamServiceSettings": {"server": "", "key": ""},
+        }
+        self.profile_name = "未命名"
+        self.handlers = {
+            "GetVersion": self._get_version,
+            "GetStats": self._get_stats,
+            "GetStreamStatus": self._get_stream_status,
+            "StartStream": self._start_stream,
+            "StopStream": self._stop_stream,
+            "ToggleStream": self._toggle_stream,
+            "GetStreamServiceSettings": self._get_stream_service_settings,
+            "SetStreamServiceSettings": self._set_stream_service_settings,
+            "GetProfileList": self._get_profile_list,
+            "SetCurrentProfile": self._set_current_profile,
+            "Sleep": self._sleep,
+        }
+
+    @property
+    def uri(self):
+        return f"ws://{self.host}:{self.port}"
+
+    async def start(self):
+        """开始监听"""
+        subprotocols = [CODECS[name].subprotocol for name in self.encodings]
+        self.server = await websockets.serve(self._handle_client, self.host, self.port,
+                                             subprotocols=subprotocols)
+        # 端口为0时使用系统分配的端口
+        self.port = self.server.sockets[0].getsockname()[1]
+        logger.info(f"模拟OBS WebSocket服务器已启动: {self.uri}")
+        return self
+
+    async def stop(self):
+        """停止服务器并断开所有客户端"""
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+            logger.info("模拟OBS WebSocket服务器已停止")
+
+    async def drop_clients(self):
+        """断开所有客户端连接（模拟OBS重启），服务器继续监听"""
+        for websocket in list(self.clients):
+            await websocket.close()
+
+    # ---------------- 连接与握手 ----------------
+
+    async def _handle_client(self, websocket):
+        self.stats['connections'] += 1
+        codec = codec_for_subprotocol(websocket.subprotocol)
+        self.codecs[websocket] = codec
+        try:
+            subscriptions = await self._handshake(websocket, codec)
+            if subscriptions is None:
+                return
+            self.clients[websocket] = subscriptions
+            handled = 0
+            async for message in websocket:
+                data = codec.decode(message)
+                op = data.get('op')
+                payload = data.get('d') or {}
+                if op == 6:
+                    asyncio.get_running_loop().create_task(self._respond(websocket, payload))
+                elif op == 8:
+                    asyncio.get_running_loop().create_task(self._respond_batch(websocket, payload))
+                elif op == 3:  # Reidentify
+                    self.clients[websocket] = payload.get('eventSubscriptions', self.clients[websocket])
+                    await websocket.send(codec.encode({"op": 2, "d": {"negotiatedRpcVersion": 1}}))
+                    continue
+
+                handled += 1
+                if self.disconnect_after and handled >= self.disconnect_after:
+                    # 等已发出的请求响应完成后再断开
+                    await asyncio.sleep(self.latency + self.jitter + 0.01)
+                    await websocket.close()
+                    break
+        except websockets.ConnectionClosed:
+            pass
+        except Exception as e:
+            logger.error(f"模拟服务器处理连接失败: {e}")
+        finally:
+            self.clients.pop(websocket, None)
+            self.codecs.pop(websocket, None)
+
+    async def _handshake(self, websocket, codec):
+        """发送Hello、校验Identify，成功返回事件订阅位掩码"""
+        hello = {"obsWebSocketVersion": "5.0.0-mock", "rpcVersion": 1}
+        if self.password:
+            challenge = base64.b64encode(random.randbytes(32)).decode()
+            salt = base64.b64encode(random.randbytes(32)).decode()
+            hello["authentication"] = {"challenge": challenge, "salt": salt}
+        await websocket.send(codec.encode({"op": 0, "d": hello}))
+
+        identify = codec.decode(await websocket.recv())
+        payload = identify.get('d') or {}
+        if identify.get('op') != 1:
+            await websocket.close(CLOSE_AUTH_FAILED, "Expected Identify")
+            return None
+        if payload.get('rpcVersion') != 1:
+            await websocket.close(CLOSE_UNSUPPORTED_RPC, "Unsupported rpcVersion")
+            return None
+        if self.password:
+            secret = base64.b64encode(hashlib.sha256((self.password + salt).encode()).digest()).decode()
+            expected = base64.b64encode(hashlib.sha256((secret + challenge).encode()).digest()).decode()
+            if payload.get('authentication') != expected:
+                await websocket.close(CLOSE_AUTH_FAILED, "Authentication failed")
+                return None
+
+        await websocket.send(codec.encode({"op": 2, "d": {"negotiatedRpcVersion": 1}}))
+        return payload.get('eventSubscriptions', (1 << 11) - 1)
+
+    # ---------------- 请求处理 ----------------
+
+    async def _delay(self):
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            await asyncio.sleep(delay)
+
+    async def _execute(self, request_type, request_data):
+        """执行单个请求，返回 (requestStatus, responseData)"""
+        self.stats['requests'] += 1
+        if self.fault_rate and random.random() < self.fault_rate:
+            self.stats['faults'] += 1
+            return {"result": False, "code": STATUS_PROCESSING_FAILED, "comment": "模拟故障"}, None
+
+        handler = self.handlers.get(request_type)
+        if handler is None:
+            return {"result": False, "code": STATUS_UNKNOWN_REQUEST,
+                    "comment": f"Unknown request type: {request_type}"}, None
+        try:
+            result = handler(request_data or {})
+            if asyncio.iscoroutine(result):
+                result = await result
+            code, response_data = result
+        except Exception as e:
+            return {"result": False, "code": STATUS_PROCESSING_FAILED, "comment": str(e)}, None
+        status = {"result": code == STATUS_SUCCESS, "code": code}
+        return status, response_data
+
+    async def _respond(self, websocket, payload):
+        if self.drop_rate and random.random() < self.drop_rate:
+            self.stats['dropped'] += 1
+            return
+        await self._delay()
+        status, response_data = await self._execute(payload.get('requestType'), payload.get('requestData'))
+        response = {"requestType": payload.get('requestType'), "requestId": payload.get('requestId'),
+                    "requestStatus": status}
+        if response_data is not None:
+            response["responseData"] = response_data
+        await self._send(websocket, {"op": 7, "d": response})
+
+    async def _respond_batch(self, websocket, payload):
+        self.stats['batches'] += 1
+        if self.drop_rate and random.random() < self.drop_rate:
+            self.stats['dropped'] += 1
+            return
+        await self._delay()
+
+        requests = payload.get('requests', [])
+        halt_on_failure = payload.get('haltOnFailure', False)
+        results = []
+
+        async def run(item):
+            status, response_data = await self._execute(item.get('requestType'), item.get('requestData'))
+            result = {"requestType": item.get('requestType'), "requestStatus": status}
+            if 'requestId' in item:
+                result["requestId"] = item['requestId']
+            if response_data is not None:
+                result["responseData"] = response_data
+            return result
+
+        if payload.get('executionType', 0) == 2:  # Parallel
+            results = list(await asyncio.gather(*(run(item) for item in requests)))
+        else:
+            for item in requests:
+                result = await run(item)
+                results.append(result)
+                if halt_on_failure and not result['requestStatus']['result']:
+                    break
+
+        await self._send(websocket, {"op": 9, "d": {"requestId": payload.get('requestId'), "results": results}})
+
+    async def _send(self, websocket, message):
+        try:
+            await websocket.send(self.codecs.get(websocket, JSONCodec).encode(message))
+        except websockets.ConnectionClosed:
+            pass
+
+    # ---------------- 事件 ----------------
+
+    def emit_event(self, event_type, event_data=None, intent=EVENT_GENERAL):
+        """向订阅了该事件类别的客户端推送事件"""
+        message = {"op": 5, "d": {"eventType": event_type, "eventIntent": intent, "eventData": event_data or {}}}
+        encoded = {}  # 每种编码只编码一次
+        for websocket, subscriptions in list(self.clients.items()):
+            if subscriptions & intent:
+                codec = self.codecs.get(websocket, JSONCodec)
+                if codec.name not in encoded:
+                    encoded[codec.name] = codec.encode(message)
+                asyncio.get_running_loop().create_task(websocket.send(encoded[codec.name]))
+
+    def _set_stream_state(self, active, state):
+        self.emit_event("StreamStateChanged", {"outputActive": active, "outputState": state}, EVENT_OUTPUTS)
+
+    # ---------------- 请求实现 ----------------
+
+    def _get_version(self, data):
+        return STATUS_SUCCESS, {"obsVersion": "30.0.0-mock", "obsWebSocketVersion": "5.0.0-mock",
+                                "rpcVersion": 1, "availableRequests": sorted(self.handlers)}
+
+    def _stream_duration_ms(self):
+        if not self.stream_active:
+            return 0
+        return (time.monotonic_ns() - self.stream_started_ns) // 1_000_000
+
+    def _get_stream_status(self, data):
+        duration = self._stream_duration_ms()
+        total_frames = duration * 60 // 1000
+        return STATUS_SUCCESS, {
+            "outputActive": self.stream_active,
+            "outputReconnecting": False,
+            "outputTimecode": time.strftime('%H:%M:%S', time.gmtime(duration / 1000)) + ".000",
+            "outputDuration": duration,
+            "outputCongestion": round(random.uniform(0, 0.05), 4) if self.stream_active else 0,
+            # 模拟 6000kbps 的码率
+            "outputBytes": duration * 750,
+            "outputSkippedFrames": total_frames // 500,
+            "outputTotalFrames": total_frames,
+        }
+
+    def _get_stats(self, data):
+        return STATUS_SUCCESS, {
+            "cpuUsage": round(random.uniform(5, 25), 3),
+            "memoryUsage": 512.0,
+            "availableDiskSpace": 100000.0,
+            "activeFps": 60.0,
+            "averageFrameRenderTime": round(random.uniform(1, 4), 3),
+            "renderSkippedFrames": 0,
+            "renderTotalFrames": self._stream_duration_ms() * 60 // 1000,
+            "outputSkippedFrames": 0,
+            "outputTotalFrames": self._stream_duration_ms() * 60 // 1000,
+            "webSocketSessionIncomingMessages": self.stats['requests'],
+            "webSocketSessionOutgoingMessages": self.stats['requests'],
+        }
+
+    def _start_stream(self, data):
+        if self.stream_active:
+            return STATUS_OUTPUT_RUNNING, None
+        self.stream_active = True
+        self.stream_started_ns = time.monotonic_ns()
+        self._set_stream_state(False, OUTPUT_STARTING)
+        self._set_stream_state(True, OUTPUT_STARTED)
+        return STATUS_SUCCESS, None
+
+    def _stop_stream(self, data):
+        if not self.stream_active:
+            return STATUS_OUTPUT_NOT_RUNNING, None
+        self.stream_active = False
+        self._set_stream_state(True, OUTPUT_STOPPING)
+        self._set_stream_state(False, OUTPUT_STOPPED)
+        return STATUS_SUCCESS, None
+
+    def _toggle_stream(self, data):
+        if self.stream_active:
+            self._stop_stream(data)
+        else:
+            self._start_stream(data)
+        return STATUS_SUCCESS, {"outputActive": self.stream_active}
+
+    def _get_stream_service_settings(self, data):
+        return STATUS_SUCCESS, json.loads(json.dumps(self.stream_service))
+
+    def _set_stream_service_settings(self, data):
+        self.stream_service = {
+            "streamServiceType": data.get("streamServiceType", "rtmp_custom"),
+            "streamServiceSettings": dict(data.get("streamServiceSettings") or {}),
+        }
+        return STATUS_SUCCESS, None
+
+    def _get_profile_list(self, data):
+        return STATUS_SUCCESS, {"currentProfileName": self.profile_name, "profiles": [self.profile_name]}
+
+    def _set_current_profile(self, data):
+        self.profile_name = data.get("profileName", self.profile_name)
+        self.emit_event("CurrentProfileChanged", {"profileName": self.profile_name}, EVENT_CONFIG)
+        return STATUS_SUCCESS, None
+
+    async def _sleep(self, data):
+        await asyncio.sleep(data.get("sleepMillis", 0) / 1000)
+        return STATUS_SUCCESS, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模拟OBS WebSocket服务器")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=4455)
+    parser.add_argument('--password', default=None)
+    parser.add_argument('--latency', type=float, default=0.0, help="请求处理延迟（秒）")
+    parser.add_argument('--jitter', type=float, default=0.0, help="额外随机延迟上限（秒）")
+    parser.add_argument('--fault-rate', type=float, default=0.0, help="请求失败概率")
+    parser.add_argument('--drop-rate', type=float, default=0.0, help="请求无响应概率")
+    parser.add_argument('--disconnect-after', type=int, default=None, help="每个连接处理N个请求后断开")
+    parser.add_argument('--encodings', nargs='+', default=None, help="支持的消息编码（json / msgpack）")
+    args = parser.parse_args()
+
+    async def serve():
+        server = MockOBSServer(args.host, args.port, args.password, args.latency, args.jitter,
+                               args.fault_rate, args.drop_rate, args.disconnect_after, args.encodings)
+        await server.start()
+        await asyncio.Future()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
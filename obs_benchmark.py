@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OBS控制链路性能测试
+在本机启动模拟OBS WebSocket服务器，分别通过 OBSController（异步）和 OBSControllerSync（同步包装）
+测量请求吞吐量（req/s）和往返时间分位数（p50/p99），结果保存到历史文件并与上一次对比
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import threading
+from datetime import datetime
+
+from loguru import logger as loguru_logger
+from mock_obs_server import MockOBSServer
+from obs_codec import CODECS, available_codecs
+from obs_controller import OBSController, OBSControllerSync
+from speed_test import PROJECT_DIR, load_history, save_history, compare_with_previous
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_FILE = os.path.join(PROJECT_DIR, "logs", "obs_benchmark.json")
+
+
+def percentile(values, pct):
+    """计算分位数（最近秩法）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(name, latencies, elapsed, count):
+    """汇总一项测试结果，时间单位为秒；per_request 为平均每个请求占用的时间（吞吐量的倒数）"""
+    result = {
+        'per_request': elapsed / count,
+        'p50': percentile(latencies, 50),
+        'p99': percentile(latencies, 99),
+    }
+    logger.info(f"  {name:<28} {count / elapsed:10.0f} req/s   "
+                f"p50 {result['p50'] * 1000:7.3f} ms   p99 {result['p99'] * 1000:7.3f} ms")
+    return result
+
+
+class MockServerThread:
+    """在独立线程的事件循环中运行模拟服务器，避免与被测客户端共用事件循环"""
+
+    def __init__(self, **options):
+        self.server = MockOBSServer(port=0, **options)
+        self.loop = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self.server.start())
+        self._ready.set()
+        self.loop.run_forever()
+
+    def start(self):
+        self._thread.start()
+        self._ready.wait()
+        return self.server
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.server.stop(), self.loop).result(timeout=5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+# ---------------- 编码测试 ----------------
+
+def sample_messages():
+    """典型消息：请求、推流状态响应、统计响应、事件和20项批量响应"""
+    stream_status = {"outputActive": True, "outputReconnecting": False, "outputTimecode": "01:02:03.456",
+                     "outputDuration": 3723456, "outputCongestion": 0.0123, "outputBytes": 2792592000,
+                     "outputSkippedFrames": 12, "outputTotalFrames": 223407}
+    stats = {"cpuUsage": 12.345678, "memoryUsage": 523.4375, "availableDiskSpace": 102400.5, "activeFps": 60.0,
+             "averageFrameRenderTime": 2.345678, "renderSkippedFrames": 3, "renderTotalFrames": 223410,
+             "outputSkippedFrames": 12, "outputTotalFrames": 223407,
+             "webSocketSessionIncomingMessages": 4096, "webSocketSessionOutgoingMessages": 4100}
+    status_ok = {"result": True, "code": 100}
+    return {
+        'request': {"op": 6, "d": {"requestType": "GetStreamStatus", "requestId": "rtmp_capture_123456",
+                                   "requestData": {}}},
+        'stream_status': {"op": 7, "d": {"requestType": "GetStreamStatus", "requestId": "rtmp_capture_123456",
+                                         "requestStatus": status_ok, "responseData": stream_status}},
+        'stats': {"op": 7, "d": {"requestType": "GetStats", "requestId": "rtmp_capture_123457",
+                                 "requestStatus": status_ok, "responseData": stats}},
+        'event': {"op": 5, "d": {"eventType": "StreamStateChanged", "eventIntent": 64,
+                                 "eventData": {"outputActive": True, "outputState": "OBS_WEBSOCKET_OUTPUT_STARTED"}}},
+        'batch_20': {"op": 9, "d": {"requestId": "rtmp_capture_123458", "results": [
+            {"requestType": "GetStreamStatus", "requestStatus": status_ok, "responseData": stream_status}] * 20}},
+    }
+
+
+def bench_codecs(iterations):
+    """对比各编码的编码/解码耗时和报文大小"""
+    results = {}
+    for name in available_codecs():
+        codec = CODECS[name]
+        costs = {}
+        for label, message in sample_messages().items():
+            encoded = codec.encode(message)
+            start_time = time.perf_counter()
+            for _ in range(iterations):
+                codec.encode(message)
+            encode_time = (time.perf_counter() - start_time) / iterations
+            start_time = time.perf_counter()
+            for _ in range(iterations):
+                codec.decode(encoded)
+            decode_time = (time.perf_counter() - start_time) / iterations
+            size = len(encoded.encode('utf-8') if isinstance(encoded, str) else encoded)
+            costs[label] = {'encode': encode_time, 'decode': decode_time, 'size': size}
+            logger.info(f"  {name:<8} {label:<14} 编码 {encode_time * 1e6:7.2f} us   "
+                        f"解码 {decode_time * 1e6:7.2f} us   {size:6d} 字节")
+        results[name] = costs
+    if len(results) < len(CODECS):
+        logger.warning("  未安装 msgpack，只测试了 JSON 编码（pip install msgpack）")
+    return results
+
+
+# ---------------- 异步客户端测试 ----------------
+
+async def bench_async_sequential(controller, count):
+    """逐个发送请求，测量单次往返时间"""
+    latencies = []
+    start_time = time.perf_counter()
+    for _ in range(count):
+        t0 = time.perf_counter()
+        await controller.send_command("GetStreamStatus")
+        latencies.append(time.perf_counter() - t0)
+    return summarize("异步 逐个请求", latencies, time.perf_counter() - start_time, count)
+
+
+async def bench_async_concurrent(controller, count, concurrency):
+    """同时保持 concurrency 个请求在途，测量多路复用吞吐量"""
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            t0 = time.perf_counter()
+            await controller.send_command("GetStreamStatus")
+            latencies.append(time.perf_counter() - t0)
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(count)))
+    return summarize(f"异步 并发{concurrency}", latencies, time.perf_counter() - start_time, count)
+
+
+async def bench_async_batch(controller, count, batch_size):
+    """每个 RequestBatch 携带 batch_size 个请求，延迟为整批往返时间"""
+    latencies = []
+    batches = max(1, count // batch_size)
+    requests = [("GetStreamStatus", None)] * batch_size
+    start_time = time.perf_counter()
+    for _ in range(batches):
+        t0 = time.perf_counter()
+        await controller.send_batch(requests)
+        latencies.append(time.perf_counter() - t0)
+    return summarize(f"异步 批量{batch_size}", latencies, time.perf_counter() - start_time, batches * batch_size)
+
+
+async def run_async_benchmarks(port, args):
+    controller = OBSController(detect_process=False)
+    controller.encodings = (args.encoding,)
+    if not await controller.connect_websocket("127.0.0.1", port):
+        raise RuntimeError("无法连接模拟OBS服务器")
+    try:
+        # 预热
+        for _ in range(50):
+            await controller.send_command("GetStreamStatus")
+        return {
+            'async_sequential': await bench_async_sequential(controller, args.count),
+            'async_concurrent': await bench_async_concurrent(controller, args.count, args.concurrency),
+            'async_batch': await bench_async_batch(controller, args.count, args.batch_size),
+        }
+    finally:
+        closing = controller.disconnect()
+        if closing is not None:
+            await asyncio.wrap_future(closing)
+
+
+# ---------------- 同步包装测试 ----------------
+
+def bench_sync_blocking(obs, count):
+    """GUI旧用法：每次调用阻塞等待结果"""
+    latencies = []
+    start_time = time.perf_counter()
+    for _ in range(count):
+        t0 = time.perf_counter()
+        obs.get_stream_status()
+        latencies.append(time.perf_counter() - t0)
+    return summarize("同步 阻塞调用", latencies, time.perf_counter() - start_time, count)
+
+
+def bench_sync_futures(obs, count, concurrency):
+    """非阻塞调用：一次提交多个请求，通过 Future 回收结果"""
+    latencies = []
+    start_time = time.perf_counter()
+    for offset in range(0, count, concurrency):
+        submitted = []
+        for _ in range(min(concurrency, count - offset)):
+            t0 = time.perf_counter()
+            future = obs.get_stream_status_async()
+            future.add_done_callback(lambda done, t0=t0: latencies.append(time.perf_counter() - t0))
+            submitted.append(future)
+        for future in submitted:
+            future.result(timeout=10)
+    return summarize(f"同步 Future并发{concurrency}", latencies, time.perf_counter() - start_time, count)
+
+
+def run_sync_benchmarks(port, args):
+    obs = OBSControllerSync(detect_process=False)
+    obs.controller.encodings = (args.encoding,)
+    if not obs.connect_to_obs("127.0.0.1", port):
+        raise RuntimeError("无法连接模拟OBS服务器")
+    try:
+        for _ in range(50):
+            obs.get_stream_status()
+        return {
+            'sync_blocking': bench_sync_blocking(obs, args.count),
+            'sync_futures': bench_sync_futures(obs, args.count, args.concurrency),
+        }
+    finally:
+        obs.disconnect()
+
+
+def run_benchmark(args):
+    if args.encoding not in available_codecs():
+        raise RuntimeError(f"编码不可用: {args.encoding}")
+    results = {}
+    logger.info("=" * 50)
+    logger.info("消息编码")
+    results['codecs'] = bench_codecs(args.codec_iterations)
+
+    server_thread = MockServerThread(latency=args.latency)
+    server = server_thread.start()
+    logger.info("=" * 50)
+    logger.info(f"模拟OBS服务器: {server.uri}，编码 {args.encoding}，"
+                f"处理延迟 {args.latency * 1000:.1f} ms，每项 {args.count} 个请求")
+    # 不同编码的控制链路结果分开保存，避免与上一次使用其他编码的结果对比
+    control = results[f'control_{args.encoding}'] = {}
+    try:
+        logger.info("=" * 50)
+        logger.info("OBSController（异步）")
+        control.update(asyncio.run(run_async_benchmarks(server.port, args)))
+
+        logger.info("=" * 50)
+        logger.info("OBSControllerSync（同步包装）")
+        control.update(run_sync_benchmarks(server.port, args))
+    finally:
+        server_thread.stop()
+
+    history = load_history(args.history)
+    if history:
+        previous = history[-1]
+        regressions = compare_with_previous(results, previous, args.threshold, min_delta=0.0001)
+        logger.info("=" * 50)
+        if regressions:
+            logger.warning(f"与 {previous['time']} 的结果相比发现 {len(regressions)} 项性能回退:")
+            for name, old, new in regressions:
+                if name.endswith('.size'):
+                    logger.warning(f"  {name}: {old:.0f} 字节 -> {new:.0f} 字节")
+                else:
+                    logger.warning(f"  {name}: {old * 1000:.3f} ms -> {new * 1000:.3f} ms")
+        else:
+            logger.info(f"与 {previous['time']} 的结果相比没有性能回退")
+
+    if not args.no_save:
+        history.append({'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'results': results})
+        save_history(args.history, history)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OBS控制链路性能测试")
+    parser.add_argument('--count', type=int, default=2000, help="每项测试的请求数")
+    parser.add_argument('--concurrency', type=int, default=32, help="并发测试的在途请求数")
+    parser.add_argument('--batch-size', type=int, default=20, help="批量测试每批请求数")
+    parser.add_argument('--latency', type=float, default=0.0, help="模拟服务器处理延迟（秒）")
+    parser.add_argument('--encoding', default='json', choices=sorted(CODECS), help="控制链路测试使用的消息编码")
+    parser.add_argument('--codec-iterations', type=int, default=20000, help="编码测试每种消息的重复次数")
+    parser.add_argument('--history', default=DEFAULT_HISTORY_FILE, help="历史结果文件")
+    parser.add_argument('--threshold', type=float, default=0.2, help="判定为回退的相对增幅")
+    parser.add_argument('--no-save', action='store_true', help="不保存本次结果")
+    args = parser.parse_args()
+
+    # 每个请求的成功日志会主导测量结果，测试期间只保留警告以上的日志
+    loguru_logger.remove()
+    loguru_logger.add(sys.stderr, level="WARNING")
+    logging.getLogger('websockets').setLevel(logging.WARNING)
+    run_benchmark(args)
+
+
+if __name__ == "__main__":
+    main()
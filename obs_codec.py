@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OBS WebSocket消息编码
+obs-websocket v5 通过 WebSocket 子协议协商消息编码：obs-websocket.json（文本帧）
+和 obs-websocket.msgpack（二进制帧）。msgpack 为可选依赖，未安装时只使用 JSON
+"""
+
+import json
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+
+class JSONCodec:
+    """JSON编码（obs-websocket 默认编码）"""
+
+    name = "json"
+    subprotocol = "obs-websocket.json"
+
+    @staticmethod
+    def encode(message) -> str:
+        # 紧凑分隔符，减少报文大小
+        return json.dumps(message, separators=(',', ':'), ensure_ascii=False)
+
+    @staticmethod
+    def decode(data):
+        return json.loads(data)
+
+
+class MsgpackCodec:
+    """MessagePack编码，报文更小、编解码更快，适合高频事件和遥测"""
+
+    name = "msgpack"
+    subprotocol = "obs-websocket.msgpack"
+
+    @staticmethod
+    def encode(message) -> bytes:
+        return msgpack.packb(message, use_bin_type=True)
+
+    @staticmethod
+    def decode(data):
+        if isinstance(data, str):
+            # 对端没有按协商的编码发送时兼容文本帧
+            return json.loads(data)
+        return msgpack.unpackb(data, raw=False)
+
+
+CODECS = {codec.name: codec for codec in (JSONCodec, MsgpackCodec)}
+CODECS_BY_SUBPROTOCOL = {codec.subprotocol: codec for codec in CODECS.values()}
+
+
+def available_codecs():
+    """当前环境可用的编码名称"""
+    return [name for name in CODECS if name != MsgpackCodec.name or MSGPACK_AVAILABLE]
+
+
+def get_codec(name):
+    """按名称获取编码，不可用时返回None"""
+    if name not in available_codecs():
+        return None
+    return CODECS[name]
+
+
+def offered_subprotocols(preferred=("msgpack", "json")):
+    """按优先顺序生成连接时提供的子协议列表，跳过当前环境不可用的编码"""
+    available = available_codecs()
+    return [CODECS[name].subprotocol for name in preferred if name in available]
+
+
+def codec_for_subprotocol(subprotocol):
+    """根据协商结果选择编码；服务器没有选择子协议时 obs-websocket 使用 JSON"""
+    return CODECS_BY_SUBPROTOCOL.get(subprotocol, JSONCodec)
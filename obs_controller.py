@@ -5,46 +5,109 @@ OBS WebSocket控制器
 用于检测OBS进程并通过WebSocket连接控制OBS
 """
 
-import psutil
 import json
 import asyncio
+import itertools
+import random
 import websockets
 import threading
 import os
-from pathlib import Path
+import time
 from loguru import logger
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable
+from obs_telemetry import TelemetrySampler
+from obs_codec import JSONCodec, offered_subprotocols, codec_for_subprotocol
+from process_watch import ProcessWatcher, OBS_PROCESS_NAMES, find_processes, terminate_processes
+from wait_conditions import wait_until, port_open
 
 class OBSController:
-    def __init__(self):
+    # RequestBatch 执行方式
+    BATCH_SERIAL_REALTIME = 0
+    BATCH_SERIAL_FRAME = 1
+    BATCH_PARALLEL = 2
+    
+    # Identify 中的 eventSubscriptions 位掩码
+    EVENT_SUB_GENERAL = 1 << 0   # ExitStarted 等
+    EVENT_SUB_CONFIG = 1 << 1    # 配置文件/场景集合切换
+    EVENT_SUB_OUTPUTS = 1 << 6   # StreamStateChanged / RecordStateChanged 等
+    DEFAULT_EVENT_SUBSCRIPTIONS = EVENT_SUB_GENERAL | EVENT_SUB_CONFIG | EVENT_SUB_OUTPUTS
+    
+    def __init__(self, detect_process=True):
         self.obs_process = None
         self.obs_path = None
+        self.process_watcher = ProcessWatcher(OBS_PROCESS_NAMES, "OBS", require_exe=True)
         self.websocket_uri = "ws://localhost:4455"
         self.websocket = None
         self.is_connected = False
         self.connection_thread = None
+        self.request_timeout = 5
+        
+        # 消息编码：按顺序提供子协议，由OBS选择；未安装 msgpack 时只提供 JSON
+        self.encodings = ("msgpack", "json")
+        self.codec = JSONCodec
+        
+        # 连接保活与自动重连：websockets 按间隔发送 ping，超时未收到 pong 即视为断开
+        self.auto_reconnect = True
+        self.ping_interval = 10
+        self.ping_timeout = 10
+        self.reconnect_delay = 1      # 首次重连等待（秒），之后指数增长
+        self.reconnect_max_delay = 30
+        self._connect_params = None
+        self._supervisor_task = None
+        self._connected_event = None  # 连接可用时置位，重连期间的请求在此排队（每次新建连接时在当前事件循环中创建）
+        self.reconnect_queue_timeout = 120  # 重连期间请求最长排队时间（秒），需覆盖 OBS 重启和重连退避
+        self._closing = False
+        self.telemetry = None  # 遥测采样器，调用 start_telemetry 后创建
+        
+        # OBS当前推流参数的缓存，连接时读取，切换配置文件时刷新；参数未变化时跳过写入。
+        # 在OBS界面中修改推流参数不会产生事件，缓存超过 stream_settings_ttl 秒后先用 GetStreamServiceSettings
+        # 读取一次再比较（只读请求，不会触发配置文件保存），只有参数确实变化时才写入
+        self.stream_settings = None
+        self.stream_settings_time = 0.0
+        self.stream_settings_ttl = 5.0
+        
+        # 请求/响应按 requestId 关联，由单个读取任务分发
+        self._loop = None
+        self._reader_task = None
+        self._pending = {}  # requestId -> Future
+        self._request_ids = itertools.count(1)
+        self._event_handlers = {}  # eventType（None 表示全部事件）-> 回调列表
         
-        # 初始化时检测OBS进程
-        self.detect_obs_process()
+        # 由事件维护的OBS状态，读取无需请求OBS
+        self.event_subscriptions = self.DEFAULT_EVENT_SUBSCRIPTIONS
+        self.state = {
+            'connected': False,
+            'stream_active': False,
+            'output_state': None,
+            'record_active': False,
+            'exiting': False,
+            'reconnecting': False,
+            'updated_at': None,
+        }
+        self._state_listeners = []
+        self.add_event_handler("StreamStateChanged", self._on_stream_state_changed)
+        self.add_event_handler("RecordStateChanged", self._on_record_state_changed)
+        self.add_event_handler("ExitStarted", self._on_exit_started)
+        self.add_event_handler("CurrentProfileChanged", self._on_profile_changed)
+        
+        # 初始化时检测OBS进程（控制远程OBS时无需检测本机进程）
+        if detect_process:
+            self.detect_obs_process()
         
     def detect_obs_process(self) -> Optional[Dict[str, Any]]:
-        """检测OBS进程"""
+        """检测OBS进程，已检测到的进程只做存活检查，退出后才重新扫描全部进程"""
         try:
-            for proc in psutil.process_iter(['pid', 'name', 'exe']):
-                try:
-                    if proc.info['name'] and 'obs' in proc.info['name'].lower():
-                        if proc.info['exe']:
-                            self.obs_process = proc
-                            self.obs_path = proc.info['exe']
-                            logger.info(f"检测到OBS进程: {self.obs_path}")
-                            return {
-                                'pid': proc.info['pid'],
-                                'name': proc.info['name'],
-                                'path': self.obs_path
-                            }
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    continue
-            return None
+            info = self.process_watcher.find()
+            if info is None:
+                self.obs_process = None
+                return None
+            self.obs_process = self.process_watcher.process
+            self.obs_path = info['path']
+            return {
+                'pid': info['pid'],
+                'name': info['name'],
+                'path': info['path']
+            }
         except Exception as e:
             logger.error(f"检测OBS进程失败: {e}")
             return None
@@ -54,28 +117,123 @@ class OBSController:
         return self.detect_obs_process() is not None
     
     async def connect_websocket(self, host="localhost", port=4455, password=None):
-        """连接到OBS WebSocket"""
+        """连接到OBS WebSocket，连接成功后在 auto_reconnect 开启时由后台任务维持连接"""
+        if self._supervisor_task and not self._supervisor_task.done():
+            # 已有后台任务在维持连接，等待它恢复即可，避免建立第二条连接
+            logger.info("OBS WebSocket正在自动重连，等待连接恢复...")
+            return await self._wait_connected()
+        
+        self._closing = False
+        self._connect_params = (host, port, password)
+        # 事件绑定到创建它的事件循环，断开后重新启动的循环不能复用上一次的事件
+        self._loop = asyncio.get_running_loop()
+        self._connected_event = asyncio.Event()
+        try:
+            await self._open_connection(host, port, password)
+        except Exception as e:
+            logger.error(f"连接OBS WebSocket失败: {e}")
+            self.is_connected = False
+            return False
+        
+        if self.auto_reconnect:
+            self._supervisor_task = self._loop.create_task(self._supervise_connection())
+        return True
+    
+    async def _open_connection(self, host, port, password):
+        """建立连接、完成 Identify 并启动读取任务，失败时抛出异常"""
         self.websocket_uri = f"ws://{host}:{port}"
+        websocket = await websockets.connect(self.websocket_uri,
+                                             subprotocols=offered_subprotocols(self.encodings),
+                                             ping_interval=self.ping_interval,
+                                             ping_timeout=self.ping_timeout)
         try:
-            self.websocket = await websockets.connect(self.websocket_uri)
-            logger.info(f"已连接到OBS WebSocket: {self.websocket_uri}")
+            self.websocket = websocket
+            self.codec = codec_for_subprotocol(websocket.subprotocol)
+            logger.info(f"已连接到OBS WebSocket: {self.websocket_uri}（编码: {self.codec.name}）")
             
             # 发送Identify消息进行身份验证
             await self.identify(password)
-            
-            self.is_connected = True
+        except Exception:
+            await websocket.close()
+            raise
+        
+        # 启动读取任务，之后所有消息都由它分发
+        self._loop = asyncio.get_running_loop()
+        self._reader_task = self._loop.create_task(self._read_loop(websocket))
+        
+        self.is_connected = True
+        self._connected_event.set()
+        await self._seed_state()
+    
+    async def _supervise_connection(self):
+        """维持连接：读取任务结束（OBS重启、心跳超时等）后按指数退避加随机抖动重连并重新 Identify"""
+        try:
+            while not self._closing:
+                await asyncio.shield(self._reader_task)
+                if self._closing:
+                    break
+                
+                self._update_state(reconnecting=True)
+                attempt = 0
+                while not self._closing:
+                    delay = min(self.reconnect_max_delay, self.reconnect_delay * (2 ** attempt))
+                    delay *= random.uniform(0.5, 1.0)
+                    attempt += 1
+                    logger.info(f"OBS WebSocket连接断开，{delay:.1f}秒后进行第{attempt}次重连")
+                    await asyncio.sleep(delay)
+                    if self._closing:
+                        break
+                    try:
+                        await self._open_connection(*self._connect_params)
+                        logger.info(f"OBS WebSocket重连成功（第{attempt}次）")
+                        break
+                    except Exception as e:
+                        logger.warning(f"OBS WebSocket重连失败: {e}")
+                self._update_state(reconnecting=False)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._update_state(reconnecting=False)
+            # 不再重连，唤醒仍在排队的请求让它们失败返回
+            if self._connected_event is not None:
+                self._connected_event.set()
+    
+    def _mark_disconnected(self):
+        """标记连接不可用，之后的请求会排队等待重连"""
+        self.is_connected = False
+        if self._connected_event is not None:
+            self._connected_event.clear()
+    
+    def _is_reconnecting(self) -> bool:
+        return bool(self._supervisor_task and not self._supervisor_task.done() and not self._closing)
+    
+    async def _wait_connected(self) -> bool:
+        """连接可用时立即返回True；正在重连时排队等待连接恢复（最长 reconnect_queue_timeout 秒），
+        超时或不再重连返回False。排队时间与单个请求的超时无关，请求在重连后才开始计时
+        """
+        if self.is_connected:
             return True
-        except Exception as e:
-            logger.error(f"连接OBS WebSocket失败: {e}")
-            self.is_connected = False
+        if not self._is_reconnecting():
+            return False
+        
+        waiter = self._connected_event.wait()
+        try:
+            if self._loop is asyncio.get_running_loop():
+                await asyncio.wait_for(waiter, self.reconnect_queue_timeout)
+            else:
+                future = asyncio.run_coroutine_threadsafe(
+                    asyncio.wait_for(waiter, self.reconnect_queue_timeout), self._loop)
+                await asyncio.wrap_future(future)
+        except asyncio.TimeoutError:
             return False
+        return self.is_connected
     
     async def identify(self, password: str = None):
         """发送Identify消息进行身份验证"""
         try:
             # 首先获取Hello消息
             hello_response = await self.websocket.recv()
-            hello_data = json.loads(hello_response)
+            hello_data = self.codec.decode(hello_response)
             
             if hello_data.get('op') != 0:  # Hello消息的op码是0
                 raise Exception(f"期望Hello消息，但收到: {hello_data}")
@@ -84,7 +242,8 @@ class OBSController:
             identify_request = {
                 "op": 1,  # Identify消息的op码是1
                 "d": {
-                    "rpcVersion": 1
+                    "rpcVersion": 1,
+                    "eventSubscriptions": self.event_subscriptions
                 }
             }
             
@@ -105,11 +264,11 @@ class OBSController:
                     identify_request['d']['authentication'] = auth_string
             
             # 发送Identify消息
-            await self.websocket.send(json.dumps(identify_request))
+            await self.websocket.send(self.codec.encode(identify_request))
             
             # 等待Identified响应
             identified_response = await self.websocket.recv()
-            identified_data = json.loads(identified_response)
+            identified_data = self.codec.decode(identified_response)
             
             if identified_data.get('op') == 2:  # Identified消息的op码是2
                 logger.info("OBS WebSocket身份验证成功")
@@ -120,31 +279,271 @@ class OBSController:
             logger.error(f"OBS WebSocket身份验证失败: {e}")
             raise
     
-    async def send_command(self, command: str, data: Dict = None):
-        """发送命令到OBS"""
-        if not self.is_connected or not self.websocket:
+    async def _read_loop(self, websocket):
+        """读取任务：按 requestId 将响应分发给等待中的请求，将事件分发给订阅者"""
+        decode = self.codec.decode
+        try:
+            async for message in websocket:
+                try:
+                    data = decode(message)
+                except Exception:
+                    logger.debug(f"无法解析OBS消息: {message!r:.200}")
+                    continue
+                
+                op = data.get('op')
+                payload = data.get('d') or {}
+                if op in (7, 9):  # RequestResponse / RequestBatchResponse
+                    future = self._pending.pop(payload.get('requestId'), None)
+                    if future is not None:
+                        self._resolve(future, payload)
+                elif op == 5:  # Event
+                    self._dispatch_event(payload.get('eventType'), payload.get('eventData') or {})
+        except websockets.ConnectionClosed as e:
+            logger.warning(f"OBS WebSocket连接已关闭: {e}")
+        except Exception as e:
+            logger.error(f"读取OBS WebSocket消息失败: {e}")
+        finally:
+            if websocket is self.websocket:
+                self._mark_disconnected()
+                self._update_state(connected=False, stream_active=False, output_state=None, record_active=False)
+            # 连接断开，所有等待中的请求立即失败
+            pending, self._pending = self._pending, {}
+            for future in pending.values():
+                self._resolve(future, ConnectionError("OBS WebSocket连接已断开"))
+    
+    @staticmethod
+    def _resolve(future, result):
+        """在 future 所属的事件循环中设置结果或异常"""
+        def apply():
+            if future.done():
+                return
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+        
+        loop = future.get_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if loop is running:
+            apply()
+        else:
+            loop.call_soon_threadsafe(apply)
+    
+    def add_event_handler(self, event_type: Optional[str], handler: Callable):
+        """订阅OBS事件，event_type 为 None 时接收全部事件；回调参数为 (event_type, event_data)，可以是协程函数"""
+        self._event_handlers.setdefault(event_type, []).append(handler)
+    
+    def remove_event_handler(self, event_type: Optional[str], handler: Callable):
+        """取消订阅OBS事件"""
+        handlers = self._event_handlers.get(event_type, [])
+        if handler in handlers:
+            handlers.remove(handler)
+    
+    def add_state_listener(self, listener: Callable):
+        """订阅状态变化，回调参数为 (当前状态副本, 变化的字段集合)，在事件循环线程中调用"""
+        self._state_listeners.append(listener)
+    
+    def remove_state_listener(self, listener: Callable):
+        if listener in self._state_listeners:
+            self._state_listeners.remove(listener)
+    
+    def get_state(self) -> Dict[str, Any]:
+        """读取当前OBS状态（由事件实时维护，不产生请求）"""
+        return dict(self.state)
+    
+    def _update_state(self, **changes):
+        """更新状态，有字段变化时通知监听者"""
+        changed = {key for key, value in changes.items() if self.state.get(key) != value}
+        if not changed:
+            return
+        self.state.update(changes)
+        self.state['updated_at'] = time.time()
+        logger.debug(f"OBS状态变化: { {key: self.state[key] for key in changed} }")
+        snapshot = self.get_state()
+        for listener in list(self._state_listeners):
+            try:
+                listener(snapshot, changed)
+            except Exception as e:
+                logger.error(f"OBS状态监听回调失败: {e}")
+    
+    async def _seed_state(self):
+        """连接建立后读取一次推流状态和推流参数作为初始值，之后由事件维护"""
+        self._update_state(connected=True, exiting=False)
+        self._cache_stream_settings(None)
+        results = await self.send_batch([("GetStreamStatus", None), ("GetStreamServiceSettings", None)], quiet=True)
+        if not results:
+            return
+        status, settings = (results + [{}])[:2]
+        if status.get('requestStatus', {}).get('result', False):
+            active = (status.get('responseData') or {}).get('outputActive', False)
+            self._update_state(stream_active=active,
+                               output_state='OBS_WEBSOCKET_OUTPUT_STARTED' if active else 'OBS_WEBSOCKET_OUTPUT_STOPPED')
+        if settings.get('requestStatus', {}).get('result', False):
+            self._cache_stream_settings(settings.get('responseData'))
+    
+    async def refresh_stream_settings(self):
+        """从OBS重新读取推流参数缓存"""
+        response = await self.send_command("GetStreamServiceSettings")
+        if response and response.get('requestStatus', {}).get('result', False):
+            self._cache_stream_settings(response.get('responseData'))
+        else:
+            self._cache_stream_settings(None)
+        return self.stream_settings
+    
+    def _cache_stream_settings(self, settings):
+        """更新推流参数缓存并记录时间"""
+        self.stream_settings = settings
+        self.stream_settings_time = time.monotonic()
+    
+    async def _on_profile_changed(self, event_type, event_data):
+        # 推流参数保存在配置文件中，切换配置文件后缓存失效
+        logger.info(f"OBS配置文件已切换: {event_data.get('profileName')}，刷新推流参数缓存")
+        self._cache_stream_settings(None)
+        await self.refresh_stream_settings()
+    
+    async def _settings_unchanged(self, data) -> bool:
+        """要写入的推流参数与OBS当前参数一致；缓存过期时先从OBS重新读取（读取失败视为需要写入）"""
+        if time.monotonic() - self.stream_settings_time > self.stream_settings_ttl:
+            await self.refresh_stream_settings()
+        cached = self.stream_settings
+        if not cached or cached.get('streamServiceType') != data['streamServiceType']:
+            return False
+        current = cached.get('streamServiceSettings') or {}
+        wanted = data['streamServiceSettings']
+        return all(current.get(name) == value for name, value in wanted.items())
+    
+    def _on_stream_state_changed(self, event_type, event_data):
+        self._update_state(stream_active=event_data.get('outputActive', False),
+                           output_state=event_data.get('outputState'))
+    
+    def _on_record_state_changed(self, event_type, event_data):
+        self._update_state(record_active=event_data.get('outputActive', False))
+    
+    def _on_exit_started(self, event_type, event_data):
+        logger.info("OBS正在退出")
+        self._update_state(exiting=True)
+    
+    def _dispatch_event(self, event_type, event_data):
+        """将事件分发给订阅者"""
+        handlers = self._event_handlers.get(event_type, []) + self._event_handlers.get(None, [])
+        for handler in handlers:
+            try:
+                result = handler(event_type, event_data)
+                if asyncio.iscoroutine(result):
+                    asyncio.get_running_loop().create_task(result)
+            except Exception as e:
+                logger.error(f"处理OBS事件 {event_type} 失败: {e}")
+    
+    async def _send_message(self, message: Dict):
+        """发送消息；调用方与连接不在同一事件循环时转交给连接所在的循环发送"""
+        text = self.codec.encode(message)
+        if self._loop is None or self._loop is asyncio.get_running_loop():
+            await self.websocket.send(text)
+        else:
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self.websocket.send(text), self._loop))
+    
+    def _next_request_id(self) -> str:
+        return f"rtmp_capture_{next(self._request_ids)}"
+    
+    async def _request(self, op: int, payload: Dict, timeout: Optional[float] = None):
+        """发送带 requestId 的请求并等待对应的响应"""
+        request_id = payload['requestId']
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            try:
+                await self._send_message({"op": op, "d": payload})
+            except websockets.ConnectionClosed:
+                # 请求没有发出去，等待重连后重发一次
+                if self._loop is asyncio.get_running_loop():
+                    self._mark_disconnected()
+                if not await self._wait_connected():
+                    raise ConnectionError("OBS WebSocket连接已断开")
+                self._pending[request_id] = future
+                await self._send_message({"op": op, "d": payload})
+            return await asyncio.wait_for(future, timeout or self.request_timeout)
+        finally:
+            self._pending.pop(request_id, None)
+    
+    async def send_command(self, command: str, data: Dict = None, timeout: Optional[float] = None):
+        """发送命令到OBS，返回响应数据（包含 requestStatus 和 responseData），失败返回None
+        
+        返回的是 RequestResponse 消息的 d 部分，不再是包含 op 和 d 的完整消息，
+        以前读取 result['d'] 的调用方改为直接读取 result['requestStatus'] / result['responseData']。
+        每个请求使用唯一的 requestId，多个命令可以同时进行
+        """
+        if not await self._wait_connected():
             logger.warning("OBS WebSocket未连接")
             return None
         
         try:
-            request = {
-                "op": 6,
-                "d": {
-                    "requestType": command,
-                    "requestId": "rtmp_capture_request",
-                    "requestData": data or {}
-                }
-            }
+            response = await self._request(6, {
+                "requestType": command,
+                "requestId": self._next_request_id(),
+                "requestData": data or {}
+            }, timeout)
             
-            await self.websocket.send(json.dumps(request))
-            response = await self.websocket.recv()
-            response_data = json.loads(response)
-            logger.info(f"OBS命令执行成功: {command}")
-            return response_data
+            status = response.get('requestStatus', {})
+            if status.get('result', False):
+                logger.info(f"OBS命令执行成功: {command}")
+            else:
+                logger.warning(f"OBS命令执行失败: {command}, 代码: {status.get('code')}, 说明: {status.get('comment')}")
+            return response
+        except asyncio.TimeoutError:
+            logger.error(f"OBS命令超时: {command}")
+            return None
         except Exception as e:
             logger.error(f"发送OBS命令失败: {e}")
             return None
     
+    async def send_batch(self, requests, execution_type: int = BATCH_SERIAL_REALTIME,
+                         halt_on_failure: bool = False, timeout: Optional[float] = None, quiet: bool = False):
+        """通过一次 RequestBatch 往返发送多个请求，返回按顺序排列的结果列表，失败返回None
+        
+        requests 中每一项为 (requestType, requestData) 或 {"requestType": ..., "requestData": ...}
+        halt_on_failure 为 True 时，某个请求失败后不再执行后续请求（结果列表会变短）
+        quiet 为 True 时成功不记录日志（用于周期性采样）
+        """
+        if not await self._wait_connected():
+            logger.warning("OBS WebSocket未连接")
+            return None
+        
+        try:
+            batch = []
+            for item in requests:
+                if isinstance(item, dict):
+                    request_type, request_data = item['requestType'], item.get('requestData')
+                else:
+                    request_type, request_data = item
+                entry = {"requestType": request_type}
+                if request_data:
+                    entry["requestData"] = request_data
+                batch.append(entry)
+            
+            response = await self._request(8, {
+                "requestId": self._next_request_id(),
+                "haltOnFailure": halt_on_failure,
+                "executionType": execution_type,
+                "requests": batch
+            }, timeout)
+            
+            results = response.get('results', [])
+            failed = [r.get('requestType') for r in results if not r.get('requestStatus', {}).get('result', False)]
+            if failed or len(results) < len(batch):
+                logger.warning(f"OBS批量请求部分失败: 失败 {failed}, 已执行 {len(results)}/{len(batch)}")
+            elif not quiet:
+                logger.info(f"OBS批量请求执行成功: {[r['requestType'] for r in batch]}")
+            return results
+        except asyncio.TimeoutError:
+            logger.error("OBS批量请求超时")
+            return None
+        except Exception as e:
+            logger.error(f"发送OBS批量请求失败: {e}")
+            return None
+    
     async def start_streaming(self):
         """开始推流"""
         return await self.send_command("StartStream")
@@ -157,6 +556,19 @@ class OBSController:
         """获取推流状态"""
         return await self.send_command("GetStreamStatus")
     
+    def start_telemetry(self, interval: float = 1.0, capacity: int = 3600) -> TelemetrySampler:
+        """开始按固定频率采样推流遥测数据（需在事件循环线程中调用），返回采样器"""
+        if self.telemetry is None or self.telemetry.interval != interval or self.telemetry.capacity != capacity:
+            self.stop_telemetry()
+            self.telemetry = TelemetrySampler(self, interval, capacity)
+        self.telemetry.start()
+        return self.telemetry
+    
+    def stop_telemetry(self):
+        """停止遥测采样，已采集的数据保留"""
+        if self.telemetry:
+            self.telemetry.stop()
+    
     def parse_rtmp_url(self, rtmp_url: str):
         """解析RTMP URL，提取服务器地址和推流码"""
         try:
@@ -181,34 +593,51 @@ class OBSController:
             logger.error(f"解析RTMP URL失败: {e}")
             return rtmp_url, ""
     
-    async def set_stream_settings(self, server: str, key: str):
-        """设置推流参数"""
-        try:
-            # 如果server看起来像完整的RTMP URL，尝试解析
-            if server.startswith('rtmp://') and '/' in server[7:]:
-                parsed_server, parsed_key = self.parse_rtmp_url(server)
-                if parsed_key and not key:  # 如果解析出了推流码且没有单独提供推流码
-                    server = parsed_server
-                    key = parsed_key
-                    logger.info(f"从RTMP URL解析出服务器: {server}, 推流码: {key}")
-            
-            # 确保服务器地址格式正确
-            if not server.startswith('rtmp://'):
-                server = 'rtmp://' + server
-            
-            data = {
-                "streamServiceType": "rtmp_custom",
-                "streamServiceSettings": {
-                    "server": server,
-                    "key": key
-                }
+    def _build_stream_settings(self, server: str, key: str):
+        """规范化服务器地址和推流码，生成 SetStreamServiceSettings 的请求数据"""
+        # 如果server看起来像完整的RTMP URL，尝试解析
+        if server.startswith('rtmp://') and '/' in server[7:]:
+            parsed_server, parsed_key = self.parse_rtmp_url(server)
+            if parsed_key and not key:  # 如果解析出了推流码且没有单独提供推流码
+                server = parsed_server
+                key = parsed_key
+                logger.info(f"从RTMP URL解析出服务器: {server}, 推流码: {key}")
+        
+        # 确保服务器地址格式正确
+        if not server.startswith('rtmp://'):
+            server = 'rtmp://' + server
+        
+        logger.info(f"设置推流参数 - 服务器: {server}, 推流码: {key[:10]}...")
+        return {
+            "streamServiceType": "rtmp_custom",
+            "streamServiceSettings": {
+                "server": server,
+                "key": key
             }
+        }
+    
+    @staticmethod
+    def _skipped_response(request_type):
+        """参数未变化、未实际发送请求时返回的成功响应"""
+        return {
+            "requestType": request_type,
+            "requestStatus": {"result": True, "code": 100, "comment": "推流参数未变化，已跳过"},
+            "skipped": True
+        }
+    
+    async def set_stream_settings(self, server: str, key: str, force: bool = False):
+        """设置推流参数，参数与OBS当前一致时不发送请求（force 为 True 时总是发送）"""
+        try:
+            data = self._build_stream_settings(server, key)
+            if not force and await self._settings_unchanged(data):
+                logger.info("推流参数与OBS当前设置一致，跳过写入")
+                return self._skipped_response("SetStreamServiceSettings")
             
-            logger.info(f"设置推流参数 - 服务器: {server}, 推流码: {key[:10]}...")
             result = await self.send_command("SetStreamServiceSettings", data)
             
             if result and result.get('requestStatus', {}).get('result', False):
                 logger.info("推流参数设置成功")
+                self._cache_stream_settings(data)
             else:
                 logger.warning(f"推流参数设置可能失败: {result}")
             
@@ -217,6 +646,43 @@ class OBSController:
             logger.error(f"设置推流参数失败: {e}")
             return None
     
+    async def apply_and_start(self, server: str, key: str):
+        """设置推流参数并开始推流，一次往返完成（推流参数缓存过期时先多一次只读的读取）
+        
+        按顺序执行 SetStreamServiceSettings、StartStream、GetStreamStatus，任一步失败即停止；
+        推流参数与OBS当前一致时不发送 SetStreamServiceSettings。
+        返回 {'success': bool, 'results': 各请求结果, 'stream_status': 推流状态}，失败返回None
+        """
+        try:
+            data = self._build_stream_settings(server, key)
+            unchanged = await self._settings_unchanged(data)
+            requests = [("StartStream", None), ("GetStreamStatus", None)]
+            if not unchanged:
+                requests.insert(0, ("SetStreamServiceSettings", data))
+            results = await self.send_batch(requests, self.BATCH_SERIAL_REALTIME, halt_on_failure=True)
+            if results is None:
+                return None
+            
+            if unchanged:
+                logger.info("推流参数与OBS当前设置一致，跳过写入")
+                results.insert(0, self._skipped_response("SetStreamServiceSettings"))
+            elif results[0].get('requestStatus', {}).get('result', False):
+                self._cache_stream_settings(data)
+            
+            success = len(results) == 3 and all(r.get('requestStatus', {}).get('result', False) for r in results)
+            if success:
+                logger.info("推流参数已应用并开始推流")
+            else:
+                logger.warning(f"应用推流参数并开始推流失败: {results}")
+            return {
+                'success': success,
+                'results': results,
+                'stream_status': results[2].get('responseData') if success else None
+            }
+        except Exception as e:
+            logger.error(f"应用推流参数并开始推流失败: {e}")
+            return None
+    
     def start_connection_thread(self, host="localhost", port=4455, password=None):
         """在后台线程中启动WebSocket连接"""
         def run_connection():
@@ -237,12 +703,28 @@ class OBSController:
         self.connection_thread = threading.Thread(target=run_connection, daemon=True)
         self.connection_thread.start()
     
+    async def _close(self):
+        """停止自动重连并关闭连接"""
+        if self._supervisor_task and not self._supervisor_task.done():
+            self._supervisor_task.cancel()
+        if self.websocket:
+            await self.websocket.close()
+    
     def disconnect(self):
-        """断开WebSocket连接"""
+        """断开WebSocket连接，不再自动重连；连接所在循环运行中时返回关闭操作的 Future"""
+        self._closing = True
         self.is_connected = False
+        closing = None
         if self.websocket:
-            asyncio.create_task(self.websocket.close())
+            if self._loop and self._loop.is_running():
+                closing = asyncio.run_coroutine_threadsafe(self._close(), self._loop)
+            else:
+                try:
+                    asyncio.get_running_loop().create_task(self.websocket.close())
+                except RuntimeError:
+                    pass
         logger.info("已断开OBS WebSocket连接")
+        return closing
     
     def auto_configure_obs_websocket(self):
         """自动配置OBS WebSocket功能"""
@@ -251,20 +733,19 @@ class OBSController:
             return False
         
         try:
-            # 首先尝试连接默认端口
+            # 首先尝试连接默认端口，端口未监听时不必等待连接尝试
             self.start_connection_thread()
             logger.info("正在尝试连接OBS WebSocket...")
+            if wait_until(port_open(), timeout=2, name="OBS WebSocket端口可连接"):
+                wait_until(lambda: self.is_connected, timeout=self.request_timeout, name="OBS WebSocket连接")
             
             # 如果连接失败，尝试自动启用WebSocket
-            import time
-            time.sleep(2)  # 等待连接尝试
-            
             if not self.is_connected:
                 logger.info("WebSocket连接失败，尝试自动启用OBS WebSocket服务器...")
                 success = self.enable_obs_websocket()
                 if success:
-                    # 重新尝试连接
-                    time.sleep(3)
+                    # 等待 WebSocket 服务器开始监听后重新连接
+                    wait_until(port_open(), timeout=10, name="OBS WebSocket端口可连接")
                     self.start_connection_thread()
                     return True
                 else:
@@ -283,7 +764,6 @@ class OBSController:
             import os
             import json
             import glob
-            from pathlib import Path
             
             # 获取更全面的OBS配置文件路径
             user_home = os.path.expanduser("~")
@@ -475,22 +955,18 @@ class OBSController:
             
             logger.info(f"正在终止OBS进程...")
             
-            # 终止所有OBS相关进程
+            # 一次遍历找到所有OBS相关进程，终止后等待进程真正退出
             import subprocess
             try:
-                # 使用taskkill命令终止OBS进程
-                subprocess.run(['taskkill', '/f', '/im', 'obs64.exe'], 
-                             capture_output=True, check=False)
-                subprocess.run(['taskkill', '/f', '/im', 'obs32.exe'], 
-                             capture_output=True, check=False)
-                subprocess.run(['taskkill', '/f', '/im', 'obs.exe'], 
-                             capture_output=True, check=False)
-                
-                logger.info("OBS进程已终止")
-                
-                # 等待进程完全终止
-                import time
-                time.sleep(2)
+                processes = find_processes(OBS_PROCESS_NAMES)
+                self.process_watcher.forget()
+                self.obs_process = None
+                if processes:
+                    result = terminate_processes(processes, timeout=5, force=True, label="OBS")
+                    if result['alive']:
+                        logger.error(f"OBS进程未能终止: {result['alive']}")
+                        return False
+                    logger.info(f"OBS进程已终止，耗时 {result['elapsed']:.2f} 秒")
                 
                 # 重新启动OBS
                 logger.info(f"正在启动OBS: {obs_exe_path}")
@@ -543,33 +1019,93 @@ class OBSController:
         return None
 
 # 同步包装器，用于在GUI中调用异步方法
+# 每个操作同时提供阻塞版本和返回 concurrent.futures.Future 的 *_async 版本，
+# 后者不占用调用线程，可通过 callback 或 future.add_done_callback 链式处理结果
 class OBSControllerSync:
-    def __init__(self):
-        self.controller = OBSController()
+    def __init__(self, detect_process=True):
+        self.controller = OBSController(detect_process)
         self.loop = None
         self.thread = None
+        self.default_timeout = 5
+        self._loop_ready = threading.Event()
+        self._loop_lock = threading.Lock()
+        self.loop_start_timeout = 5
     
     def start_async_loop(self):
-        """启动异步事件循环"""
+        """启动异步事件循环，返回时循环已经在运行"""
         def run_loop():
-            self.loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(self.loop)
-            self.loop.run_forever()
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            self.loop = loop
+            loop.call_soon(self._loop_ready.set)
+            try:
+                loop.run_forever()
+            finally:
+                loop.close()
         
-        if not self.thread or not self.thread.is_alive():
-            self.thread = threading.Thread(target=run_loop, daemon=True)
-            self.thread.start()
+        with self._loop_lock:
+            if not self.thread or not self.thread.is_alive():
+                self._loop_ready.clear()
+                self.thread = threading.Thread(target=run_loop, daemon=True)
+                self.thread.start()
+        if not self._loop_ready.wait(self.loop_start_timeout):
+            raise RuntimeError(f"事件循环在 {self.loop_start_timeout} 秒内未启动")
     
-    def run_async(self, coro):
-        """在事件循环中运行异步函数"""
-        if not self.loop:
+    def submit(self, coro, callback: Optional[Callable] = None):
+        """在事件循环中运行异步函数，立即返回 Future
+        
+        callback 在事件循环线程中以 (结果, 异常) 调用，GUI中需自行转交到主线程
+        """
+        if not self._loop_ready.is_set() or not self.thread.is_alive():
             self.start_async_loop()
-            # 等待循环启动
-            import time
-            time.sleep(0.1)
         
         future = asyncio.run_coroutine_threadsafe(coro, self.loop)
-        return future.result(timeout=5)
+        if callback:
+            def on_done(done):
+                try:
+                    # 取消的 Future 调用 exception() 会抛出 CancelledError，单独处理
+                    if done.cancelled():
+                        callback(None, asyncio.CancelledError("OBS操作已取消"))
+                        return
+                    error = done.exception()
+                    callback(None if error else done.result(), error)
+                except Exception as e:
+                    logger.error(f"OBS操作回调失败: {e}")
+            future.add_done_callback(on_done)
+        return future
+    
+    def run_async(self, coro, timeout: Optional[float] = None):
+        """在事件循环中运行异步函数并等待结果"""
+        return self.submit(coro).result(timeout=timeout or self.default_timeout)
+    
+    def connect_to_obs_async(self, host="localhost", port=4455, password=None, callback=None):
+        """连接到OBS（非阻塞）"""
+        return self.submit(self.controller.connect_websocket(host, port, password), callback)
+    
+    def start_streaming_async(self, callback=None):
+        """开始推流（非阻塞）"""
+        return self.submit(self.controller.start_streaming(), callback)
+    
+    def stop_streaming_async(self, callback=None):
+        """停止推流（非阻塞）"""
+        return self.submit(self.controller.stop_streaming(), callback)
+    
+    def set_stream_settings_async(self, server, key, callback=None):
+        """设置推流参数（非阻塞）"""
+        return self.submit(self.controller.set_stream_settings(server, key), callback)
+    
+    def apply_and_start_async(self, server, key, callback=None):
+        """设置推流参数并开始推流（非阻塞）"""
+        return self.submit(self.controller.apply_and_start(server, key), callback)
+    
+    def send_batch_async(self, requests, execution_type=OBSController.BATCH_SERIAL_REALTIME,
+                         halt_on_failure=False, callback=None):
+        """批量发送请求（非阻塞）"""
+        return self.submit(self.controller.send_batch(requests, execution_type, halt_on_failure), callback)
+    
+    def get_stream_status_async(self, callback=None):
+        """获取推流状态（非阻塞）"""
+        return self.submit(self.controller.get_stream_status(), callback)
     
     def detect_obs(self):
         """检测OBS进程"""
@@ -607,6 +1143,30 @@ class OBSControllerSync:
             logger.error(f"设置推流参数失败: {e}")
             return None
     
+    def apply_and_start(self, server, key):
+        """设置推流参数并开始推流"""
+        try:
+            return self.run_async(self.controller.apply_and_start(server, key))
+        except Exception as e:
+            logger.error(f"应用推流参数并开始推流失败: {e}")
+            return None
+    
+    def send_batch(self, requests, execution_type=OBSController.BATCH_SERIAL_REALTIME, halt_on_failure=False):
+        """批量发送请求"""
+        try:
+            return self.run_async(self.controller.send_batch(requests, execution_type, halt_on_failure))
+        except Exception as e:
+            logger.error(f"批量请求失败: {e}")
+            return None
+    
+    def get_process_metrics(self):
+        """OBS进程检测的扫描次数、耗时和频率"""
+        return self.controller.process_watcher.get_metrics()
+    
+    def get_stream_settings(self):
+        """读取缓存的OBS推流参数（不产生请求）"""
+        return self.controller.stream_settings
+    
     def get_stream_status(self):
         """获取推流状态"""
         try:
@@ -619,15 +1179,59 @@ class OBSControllerSync:
         """检查是否已连接"""
         return self.controller.is_connected
     
+    def start_telemetry(self, interval=1.0, capacity=3600):
+        """开始推流遥测采样"""
+        async def start():
+            return self.controller.start_telemetry(interval, capacity)
+        try:
+            return self.run_async(start())
+        except Exception as e:
+            logger.error(f"启动遥测采样失败: {e}")
+            return None
+    
+    def stop_telemetry(self):
+        """停止推流遥测采样"""
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.controller.stop_telemetry)
+    
+    def get_telemetry(self, seconds=60):
+        """读取最近 seconds 秒的遥测数据，未启动采样时返回None"""
+        sampler = self.controller.telemetry
+        return sampler.recent(seconds) if sampler else None
+    
+    def get_state(self):
+        """读取事件维护的OBS状态"""
+        return self.controller.get_state()
+    
+    def add_state_listener(self, listener):
+        """订阅OBS状态变化"""
+        self.controller.add_state_listener(listener)
+    
+    def remove_state_listener(self, listener):
+        """取消订阅OBS状态变化"""
+        self.controller.remove_state_listener(listener)
+    
     def auto_configure_obs_websocket(self):
         """自动配置OBS WebSocket"""
         return self.controller.auto_configure_obs_websocket()
     
     def disconnect(self):
-        """断开连接"""
-        self.controller.disconnect()
-        if self.loop:
-            self.loop.call_soon_threadsafe(self.loop.stop)
+        """断开连接并停止事件循环"""
+        closing = self.controller.disconnect()
+        if closing is not None:
+            try:
+                closing.result(timeout=2)
+            except Exception as e:
+                logger.warning(f"关闭OBS WebSocket连接超时: {e}")
+        with self._loop_lock:
+            if self.loop and self.thread:
+                self._loop_ready.clear()
+                self.loop.call_soon_threadsafe(self.loop.stop)
+                # 等待旧线程退出，之后 connect 会重新创建事件循环
+                self.thread.join(timeout=self.loop_start_timeout)
+                if self.thread.is_alive():
+                    logger.warning("事件循环线程未能及时退出")
+            self.thread = self.loop = None
 
 if __name__ == "__main__":
     # 测试代码
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多OBS实例控制器
+一台抓包机为多台推流机服务：在同一个事件循环上同时管理多个OBS WebSocket连接，
+支持按名称/标签定向或广播设置推流参数、开始/停止推流，并按规则把抓到的推流地址分配给对应的OBS
+"""
+
+import re
+import json
+import os
+import asyncio
+import threading
+from loguru import logger
+from typing import Optional, Dict, Any, Callable, List
+from obs_controller import OBSController
+
+
+class OBSInstance:
+    """一个OBS实例的连接配置和控制器"""
+
+    def __init__(self, name, host="localhost", port=4455, password=None, tags=None):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.password = password
+        self.tags = set(tags or [])
+        # 远程推流机上的OBS进程无法在本机检测，不做进程扫描
+        self.controller = OBSController(detect_process=False)
+        self.last_error = None
+
+    def __repr__(self):
+        return f"OBSInstance({self.name!r}, {self.host}:{self.port})"
+
+
+class RoutingRule:
+    """分配规则：推流服务器/推流码匹配时，发送到 targets 指定的实例
+
+    targets 可以是实例名、"tag:标签" 或 "*"（全部实例）
+    """
+
+    def __init__(self, targets, server=None, stream_key=None, start=False):
+        self.targets = targets if isinstance(targets, list) else [targets]
+        self.server = re.compile(server) if server else None
+        self.stream_key = re.compile(stream_key) if stream_key else None
+        self.start = start
+
+    def matches(self, server: str, stream_key: str) -> bool:
+        if self.server and not self.server.search(server or ''):
+            return False
+        if self.stream_key and not self.stream_key.search(stream_key or ''):
+            return False
+        return True
+
+
+class OBSFleet:
+    """在同一个事件循环上管理多个OBS实例，所有方法均为协程"""
+
+    def __init__(self):
+        self.instances: Dict[str, OBSInstance] = {}
+        self.rules: List[RoutingRule] = []
+
+    def add_instance(self, name, host="localhost", port=4455, password=None, tags=None) -> OBSInstance:
+        """添加OBS实例"""
+        if name in self.instances:
+            raise ValueError(f"OBS实例名称重复: {name}")
+        instance = OBSInstance(name, host, port, password, tags)
+        self.instances[name] = instance
+        return instance
+
+    def add_rule(self, targets, server=None, stream_key=None, start=False):
+        """添加分配规则，按添加顺序匹配，第一条匹配的规则生效"""
+        self.rules.append(RoutingRule(targets, server, stream_key, start))
+
+    def load_config(self, config_file="config.json") -> bool:
+        """从配置文件加载实例和规则
+
+        读取 obs_fleet.instances / obs_fleet.rules；没有 obs_fleet 配置时使用 obs 配置作为唯一实例
+        """
+        try:
+            if not os.path.exists(config_file):
+                logger.warning(f"配置文件不存在: {config_file}")
+                return False
+            with open(config_file, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+
+            fleet_config = config.get('obs_fleet')
+            if not fleet_config:
+                obs_config = config.get('obs', {})
+                self.add_instance('default',
+                                  obs_config.get('websocket_host', 'localhost'),
+                                  obs_config.get('websocket_port', 4455),
+                                  obs_config.get('websocket_password'))
+                return True
+
+            for item in fleet_config.get('instances', []):
+                self.add_instance(item['name'], item.get('host', 'localhost'), item.get('port', 4455),
+                                  item.get('password'), item.get('tags'))
+            for item in fleet_config.get('rules', []):
+                self.add_rule(item.get('targets', '*'), item.get('server'), item.get('stream_key'),
+                              item.get('start', False))
+            logger.info(f"已加载 {len(self.instances)} 个OBS实例，{len(self.rules)} 条分配规则")
+            return True
+        except Exception as e:
+            logger.error(f"加载OBS实例配置失败: {e}")
+            return False
+
+    def resolve_targets(self, targets=None) -> List[OBSInstance]:
+        """将目标描述解析为实例列表：None 或 "*" 为全部实例，"tag:xxx" 为带该标签的实例，其余按名称"""
+        if targets is None:
+            return list(self.instances.values())
+        if not isinstance(targets, (list, tuple, set)):
+            targets = [targets]
+
+        resolved = {}
+        for target in targets:
+            if target == '*':
+                resolved.update(self.instances)
+            elif target.startswith('tag:'):
+                tag = target[4:]
+                resolved.update({name: inst for name, inst in self.instances.items() if tag in inst.tags})
+            elif target in self.instances:
+                resolved[target] = self.instances[target]
+            else:
+                logger.warning(f"未知的OBS实例: {target}")
+        return list(resolved.values())
+
+    def match_rule(self, server: str, stream_key: str) -> Optional[RoutingRule]:
+        """返回第一条匹配的分配规则"""
+        for rule in self.rules:
+            if rule.matches(server, stream_key):
+                return rule
+        return None
+
+    async def _each(self, targets, action: Callable) -> Dict[str, Any]:
+        """对目标实例并发执行 action(instance)，返回 {实例名: 结果}，单个实例出错不影响其他实例"""
+        instances = self.resolve_targets(targets)
+        results = await asyncio.gather(*(action(inst) for inst in instances), return_exceptions=True)
+        outcome = {}
+        for inst, result in zip(instances, results):
+            if isinstance(result, BaseException):
+                logger.error(f"OBS实例 {inst.name} 操作失败: {result}")
+                inst.last_error = str(result)
+                result = None
+            elif not result:
+                inst.last_error = "操作失败" if inst.controller.is_connected else "未连接"
+            else:
+                inst.last_error = None
+            outcome[inst.name] = result
+        return outcome
+
+    async def connect_all(self, targets=None) -> Dict[str, bool]:
+        """并发连接目标实例"""
+        return await self._each(targets, lambda inst: inst.controller.connect_websocket(
+            inst.host, inst.port, inst.password))
+
+    async def set_stream_settings(self, server: str, key: str, targets=None) -> Dict[str, Any]:
+        """设置目标实例的推流参数，targets 为 None 时广播到全部实例"""
+        return await self._each(targets, lambda inst: inst.controller.set_stream_settings(server, key))
+
+    async def apply_and_start(self, server: str, key: str, targets=None) -> Dict[str, Any]:
+        """设置目标实例的推流参数并开始推流"""
+        return await self._each(targets, lambda inst: inst.controller.apply_and_start(server, key))
+
+    async def start_streaming(self, targets=None) -> Dict[str, Any]:
+        """目标实例开始推流"""
+        return await self._each(targets, lambda inst: inst.controller.start_streaming())
+
+    async def stop_streaming(self, targets=None) -> Dict[str, Any]:
+        """目标实例停止推流"""
+        return await self._each(targets, lambda inst: inst.controller.stop_streaming())
+
+    async def route(self, server: str, key: str) -> Dict[str, Any]:
+        """按分配规则把抓到的推流地址发送到对应实例，没有匹配的规则时不做任何操作"""
+        rule = self.match_rule(server, key)
+        if rule is None:
+            logger.info(f"推流地址没有匹配的分配规则: {server}")
+            return {}
+        logger.info(f"推流地址 {server} 分配到: {rule.targets}")
+        if rule.start:
+            return await self.apply_and_start(server, key, rule.targets)
+        return await self.set_stream_settings(server, key, rule.targets)
+
+    def health(self) -> Dict[str, Dict[str, Any]]:
+        """各实例的连接和推流状态（由事件维护，不产生请求）"""
+        report = {}
+        for name, inst in self.instances.items():
+            state = inst.controller.get_state()
+            report[name] = {
+                'address': f"{inst.host}:{inst.port}",
+                'connected': inst.controller.is_connected,
+                'reconnecting': state['reconnecting'],
+                'stream_active': state['stream_active'],
+                'exiting': state['exiting'],
+                'updated_at': state['updated_at'],
+                'last_error': inst.last_error,
+            }
+        return report
+
+    async def disconnect_all(self):
+        """断开全部实例"""
+        for inst in self.instances.values():
+            closing = inst.controller.disconnect()
+            if closing is not None:
+                await asyncio.wrap_future(closing)
+
+
+# 同步包装器，在后台线程的事件循环上运行全部实例
+class OBSFleetSync:
+    def __init__(self, config_file=None):
+        self.fleet = OBSFleet()
+        if config_file:
+            self.fleet.load_config(config_file)
+        self.loop = None
+        self.thread = None
+        self.default_timeout = 10
+        self._loop_ready = threading.Event()
+        self._loop_lock = threading.Lock()
+        self.loop_start_timeout = 5
+
+    def start_async_loop(self):
+        """启动异步事件循环，返回时循环已经在运行"""
+        def run_loop():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            self.loop = loop
+            loop.call_soon(self._loop_ready.set)
+            try:
+                loop.run_forever()
+            finally:
+                loop.close()
+
+        with self._loop_lock:
+            if not self.thread or not self.thread.is_alive():
+                self._loop_ready.clear()
+                self.thread = threading.Thread(target=run_loop, daemon=True)
+                self.thread.start()
+        if not self._loop_ready.wait(self.loop_start_timeout):
+            raise RuntimeError(f"事件循环在 {self.loop_start_timeout} 秒内未启动")
+
+    def submit(self, coro, callback: Optional[Callable] = None):
+        """在事件循环中运行协程，立即返回 Future；callback 以 (结果, 异常) 调用"""
+        if not self._loop_ready.is_set() or not self.thread.is_alive():
+            self.start_async_loop()
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        if callback:
+            def on_done(done):
+                try:
+                    if done.cancelled():
+                        callback(None, asyncio.CancelledError("操作已取消"))
+                        return
+                    error = done.exception()
+                    callback(None if error else done.result(), error)
+                except Exception as e:
+                    logger.error(f"OBS实例操作回调失败: {e}")
+            future.add_done_callback(on_done)
+        return future
+
+    def run_async(self, coro, timeout: Optional[float] = None):
+        return self.submit(coro).result(timeout=timeout or self.default_timeout)
+
+    def connect_all(self, targets=None):
+        """连接实例"""
+        try:
+            return self.run_async(self.fleet.connect_all(targets))
+        except Exception as e:
+            logger.error(f"连接OBS实例失败: {e}")
+            return {}
+
+    def set_stream_settings(self, server, key, targets=None):
+        """设置推流参数"""
+        try:
+            return self.run_async(self.fleet.set_stream_settings(server, key, targets))
+        except Exception as e:
+            logger.error(f"设置推流参数失败: {e}")
+            return {}
+
+    def apply_and_start(self, server, key, targets=None):
+        """设置推流参数并开始推流"""
+        try:
+            return self.run_async(self.fleet.apply_and_start(server, key, targets))
+        except Exception as e:
+            logger.error(f"应用推流参数并开始推流失败: {e}")
+            return {}
+
+    def start_streaming(self, targets=None):
+        """开始推流"""
+        try:
+            return self.run_async(self.fleet.start_streaming(targets))
+        except Exception as e:
+            logger.error(f"开始推流失败: {e}")
+            return {}
+
+    def stop_streaming(self, targets=None):
+        """停止推流"""
+        try:
+            return self.run_async(self.fleet.stop_streaming(targets))
+        except Exception as e:
+            logger.error(f"停止推流失败: {e}")
+            return {}
+
+    def route(self, server, key, callback=None):
+        """按分配规则发送推流地址（非阻塞，返回 Future）"""
+        return self.submit(self.fleet.route(server, key), callback)
+
+    def health(self):
+        """各实例状态"""
+        return self.fleet.health()
+
+    def disconnect(self):
+        """断开全部实例并停止事件循环"""
+        if self.loop:
+            try:
+                self.run_async(self.fleet.disconnect_all(), timeout=3)
+            except Exception as e:
+                logger.warning(f"断开OBS实例超时: {e}")
+        with self._loop_lock:
+            if self.loop and self.thread:
+                self._loop_ready.clear()
+                self.loop.call_soon_threadsafe(self.loop.stop)
+                self.thread.join(timeout=self.loop_start_timeout)
+                if self.thread.is_alive():
+                    logger.warning("事件循环线程未能及时退出")
+            self.thread = self.loop = None
+
+
+if __name__ == "__main__":
+    # 测试代码
+    fleet = OBSFleetSync("config.json")
+    print(f"OBS实例: {list(fleet.fleet.instances)}")
+
+    print(f"连接结果: {fleet.connect_all()}")
+    for name, status in fleet.health().items():
+        print(f"  {name}: {status}")
+
+    fleet.disconnect()
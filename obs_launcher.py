@@ -5,12 +5,15 @@ OBS启动器模块
 """
 
 import os
-import subprocess  # 仅用于进程检查
 import json
 import winreg
 import time
-from pathlib import Path
+import threading
 from loguru import logger
+from process_watch import (ProcessWatcher, OBS_PROCESS_NAMES, COMPANION_PROCESS_NAMES,
+                           FOREGROUND_AVAILABLE, find_processes, foreground_process_name,
+                           terminate_processes)
+from wait_conditions import wait_until
 try:
     import pyautogui
     PYAUTOGUI_AVAILABLE = True
@@ -18,21 +21,42 @@ except ImportError:
     PYAUTOGUI_AVAILABLE = False
     logger.warning("PyAutoGUI未安装，自动化功能将不可用")
 
-try:
-    import cv2
-    import numpy as np
-    OPENCV_AVAILABLE = True
-except ImportError:
-    OPENCV_AVAILABLE = False
+from image_matcher import OPENCV_AVAILABLE, TemplateRegistry, TemplateMatcher, FrameGate
+from frame_source import ScreenFrameSource
+
+if not OPENCV_AVAILABLE:
     logger.warning("OpenCV未安装，图像识别功能将不可用")
 
+# 自动开播/下播用到的界面模板图片
+LOG_IMAGE_PATH = os.path.join(os.path.dirname(__file__), "ico", "lOG.png")
+START_LIVE_IMAGE_PATH = os.path.join(os.path.dirname(__file__), "开始直播.png")
+CANCEL_LIVE_IMAGE_PATH = os.path.join(os.path.dirname(__file__), "ico", "取消直播.png")
+TEMPLATE_IMAGES = {
+    LOG_IMAGE_PATH: "lOG图片",
+    START_LIVE_IMAGE_PATH: "开始直播按钮",
+    CANCEL_LIVE_IMAGE_PATH: "取消直播按钮",
+}
+
 class OBSLauncher:
     """OBS启动器类"""
     
-    def __init__(self, config_file="config.json"):
+    def __init__(self, config_file="config.json", frame_source=None):
         self.config_file = config_file
         self.obs_path = None
         self.live_companion_path = None
+        self.obs_watcher = ProcessWatcher(OBS_PROCESS_NAMES, "OBS")
+        self.companion_watcher = ProcessWatcher(COMPANION_PROCESS_NAMES, "直播伴侣")
+        self.input_lock = threading.RLock()  # 键盘鼠标操作互斥
+        self.launch_timeout = 15    # 等待进程启动的最长时间（秒）
+        self.window_timeout = 10    # 等待界面元素出现的最长时间（秒）
+        self.focus_timeout = 5      # 启动后等待新窗口获得焦点的最长时间（秒）
+        self.log_grace = 2          # 开播时先等待 lOG 出现的时间（秒），超过后开始直播按钮出现即可点击
+        self.templates = TemplateRegistry()
+        self.matcher = TemplateMatcher()
+        # 图像识别的截图来源，离线测试时可传入 ImageSequenceSource 回放录制的截图
+        self.frame_source = frame_source or ScreenFrameSource()
+        if OPENCV_AVAILABLE:
+            self.templates.preload(TEMPLATE_IMAGES)
         self.load_config()
     
     def load_config(self):
@@ -264,21 +288,23 @@ class OBSLauncher:
             
             logger.info(f"使用PyAutoGUI启动OBS: {self.obs_path}")
             
-            # 按下Win+R打开运行对话框
-            pyautogui.hotkey('win', 'r')
-            time.sleep(1)
+            # 键盘操作期间持有输入锁，并行的流程步骤不会交错输入
+            with self.input_lock:
+                # 按下Win+R打开运行对话框
+                pyautogui.hotkey('win', 'r')
+                time.sleep(1)
             
-            # 输入完整的OBS路径（用引号包围以处理空格）
-            full_command = f'"{self.obs_path}"'
-            pyautogui.write(full_command)
-            time.sleep(0.5)
+                # 输入完整的OBS路径（用引号包围以处理空格）
+                full_command = f'"{self.obs_path}"'
+                pyautogui.write(full_command)
+                time.sleep(0.5)
             
-            # 按回车执行
-            pyautogui.press('enter')
-            time.sleep(2)  # 减少等待时间
+                # 按回车执行
+                pyautogui.press('enter')
             
-            # 检查OBS是否成功启动
-            if self.is_obs_running():
+                # 等待OBS进程出现且窗口获得焦点后才释放输入锁，避免并行步骤的按键落到新弹出的窗口中
+                started = self._wait_launched(self.is_obs_running, OBS_PROCESS_NAMES, "OBS")
+            if started:
                 logger.info("通过PyAutoGUI成功启动OBS")
                 return True
             else:
@@ -312,55 +338,58 @@ class OBSLauncher:
             search_term = '直播伴侣'
             logger.info(f"尝试搜索: {search_term}")
             
-            # 按下Windows键打开开始菜单
-            pyautogui.press('win')
-            time.sleep(0.8)  # 减少等待时间
+            with self.input_lock:
+                # 按下Windows键打开开始菜单
+                pyautogui.press('win')
+                time.sleep(0.8)  # 减少等待时间
             
-            # 清空搜索框（防止之前有残留内容）
-            pyautogui.hotkey('ctrl', 'a')
-            time.sleep(0.1)
-            pyautogui.press('delete')
-            time.sleep(0.1)
+                # 清空搜索框（防止之前有残留内容）
+                pyautogui.hotkey('ctrl', 'a')
+                time.sleep(0.1)
+                pyautogui.press('delete')
+                time.sleep(0.1)
             
-            # 使用剪贴板方法输入中文（pyautogui.typewrite对中文支持不好）
-            import pyperclip
-            pyperclip.copy(search_term)
-            pyautogui.hotkey('ctrl', 'v')
-            time.sleep(1)  # 减少等待时间
+                # 使用剪贴板方法输入中文（pyautogui.typewrite对中文支持不好）
+                import pyperclip
+                pyperclip.copy(search_term)
+                pyautogui.hotkey('ctrl', 'v')
+                time.sleep(1)  # 减少等待时间
             
-            # 按回车键启动第一个搜索结果
-            pyautogui.press('enter')
-            time.sleep(2)  # 减少等待时间
+                # 按回车键启动第一个搜索结果
+                pyautogui.press('enter')
             
-            # 检查直播伴侣是否成功启动
-            if self.is_live_companion_running():
+                # 等待直播伴侣进程出现
+                started = self._wait_launched(self.is_live_companion_running, COMPANION_PROCESS_NAMES, "直播伴侣")
+            if started:
                 logger.info(f"通过搜索'{search_term}'成功启动直播伴侣")
                 return True
             else:
                 logger.warning(f"通过搜索'{search_term}'启动直播伴侣失败")
                 # 按ESC关闭开始菜单
-                pyautogui.press('esc')
-                time.sleep(0.5)
+                with self.input_lock:
+                    pyautogui.press('esc')
+                    time.sleep(0.5)
             
             # 方法2: 备用方案 - 使用完整路径直接启动直播伴侣
             if self.live_companion_path and os.path.exists(self.live_companion_path):
                 logger.info(f"界面搜索失败，尝试使用完整路径启动: {self.live_companion_path}")
                 
-                # 按下Win+R打开运行对话框
-                pyautogui.hotkey('win', 'r')
-                time.sleep(0.5)  # 减少等待时间
+                with self.input_lock:
+                    # 按下Win+R打开运行对话框
+                    pyautogui.hotkey('win', 'r')
+                    time.sleep(0.5)  # 减少等待时间
                 
-                # 输入完整的直播伴侣路径（用引号包围以处理空格）
-                full_command = f'"{self.live_companion_path}"'
-                pyautogui.write(full_command)
-                time.sleep(0.2)  # 减少等待时间
+                    # 输入完整的直播伴侣路径（用引号包围以处理空格）
+                    full_command = f'"{self.live_companion_path}"'
+                    pyautogui.write(full_command)
+                    time.sleep(0.2)  # 减少等待时间
                 
-                # 按回车执行
-                pyautogui.press('enter')
-                time.sleep(1.5)  # 减少等待时间
+                    # 按回车执行
+                    pyautogui.press('enter')
                 
-                # 检查直播伴侣是否成功启动
-                if self.is_live_companion_running():
+                    # 等待直播伴侣进程出现
+                    started = self._wait_launched(self.is_live_companion_running, COMPANION_PROCESS_NAMES, "直播伴侣")
+                if started:
                     logger.info("通过完整路径成功启动直播伴侣")
                     return True
                 else:
@@ -373,75 +402,53 @@ class OBSLauncher:
             logger.error(f"使用PyAutoGUI启动直播伴侣失败: {e}")
             return False
     
+    def _wait_launched(self, is_running, process_names, label):
+        """等待进程出现，再等待它的窗口成为前台窗口（最多 focus_timeout 秒，无法判断时不等待）
+
+        调用时持有输入锁：新窗口弹出并抢到焦点之前，其他步骤的键盘操作不会开始
+        """
+        if not wait_until(is_running, timeout=self.launch_timeout, name=f"{label}进程启动"):
+            return False
+        if FOREGROUND_AVAILABLE:
+            wanted = {name.lower() for name in process_names}
+            if not wait_until(lambda: (foreground_process_name() or '').lower() in wanted,
+                              timeout=self.focus_timeout, name=f"{label}窗口获得焦点"):
+                logger.warning(f"{label}窗口 {self.focus_timeout} 秒内未成为前台窗口，继续执行")
+        return True
+    
     def is_obs_running(self):
-        """检查OBS是否正在运行"""
+        """检查OBS是否正在运行（已检测到的进程只做存活检查）"""
         try:
-            # 使用tasklist命令检查obs64.exe进程
-            result = subprocess.run(['tasklist', '/FI', 'IMAGENAME eq obs64.exe'], 
-                                  capture_output=True, text=True, shell=True)
-            return 'obs64.exe' in result.stdout
+            return self.obs_watcher.find() is not None
         except Exception as e:
             logger.error(f"检查OBS运行状态失败: {e}")
             return False
     
     def is_live_companion_running(self):
-        """检查直播伴侣是否正在运行"""
+        """检查直播伴侣是否正在运行（一次遍历进程表匹配全部候选进程名）"""
         try:
-            # 检查常见的直播伴侣进程名
-            companion_processes = [
-                '直播伴侣.exe',  # 最常见的直播伴侣进程名
-                'LiveCompanion.exe',
-                'StreamCompanion.exe', 
-                'BilibiliLiveHelper.exe',
-                'DouyinLiveCompanion.exe',
-                'TikTokLiveStudio.exe'
-            ]
-            
-            for process_name in companion_processes:
-                result = subprocess.run(['tasklist', '/FI', f'IMAGENAME eq {process_name}'], 
-                                      capture_output=True, text=True, shell=True)
-                if process_name in result.stdout:
-                    logger.info(f"检测到直播伴侣进程: {process_name}")
-                    return True
-            return False
+            return self.companion_watcher.find() is not None
         except Exception as e:
             logger.error(f"检查直播伴侣运行状态失败: {e}")
             return False
     
-    def terminate_live_companion(self):
-        """终止直播伴侣进程"""
+    def terminate_live_companion(self, timeout=5):
+        """终止直播伴侣进程，等待进程真正退出（超时后强制结束）"""
         try:
-            # 检查常见的直播伴侣进程名
-            companion_processes = [
-                '直播伴侣.exe',  # 最常见的直播伴侣进程名
-                'LiveCompanion.exe',
-                'StreamCompanion.exe', 
-                'BilibiliLiveHelper.exe',
-                'DouyinLiveCompanion.exe',
-                'TikTokLiveStudio.exe'
-            ]
-            
-            terminated_processes = []
-            for process_name in companion_processes:
-                # 先检查进程是否存在
-                result = subprocess.run(['tasklist', '/FI', f'IMAGENAME eq {process_name}'], 
-                                      capture_output=True, text=True, shell=True)
-                if process_name in result.stdout:
-                    # 终止进程
-                    kill_result = subprocess.run(['taskkill', '/F', '/IM', process_name], 
-                                                capture_output=True, text=True, shell=True)
-                    if kill_result.returncode == 0:
-                        logger.info(f"成功终止直播伴侣进程: {process_name}")
-                        terminated_processes.append(process_name)
-                    else:
-                        logger.warning(f"终止进程失败: {process_name}, 错误: {kill_result.stderr}")
-            
-            if terminated_processes:
-                logger.info(f"已终止的直播伴侣进程: {', '.join(terminated_processes)}")
-                return True
-            else:
+            processes = find_processes(COMPANION_PROCESS_NAMES)
+            self.companion_watcher.forget()
+            if not processes:
                 logger.info("没有找到正在运行的直播伴侣进程")
                 return False
+            
+            result = terminate_processes(processes, timeout=timeout, label="直播伴侣")
+            if result['alive']:
+                logger.warning(f"终止进程失败: {', '.join(result['alive'])}")
+            if result['terminated']:
+                logger.info(f"已终止的直播伴侣进程: {', '.join(result['terminated'])}，"
+                            f"耗时 {result['elapsed']:.2f} 秒")
+                return True
+            return False
                 
         except Exception as e:
             logger.error(f"终止直播伴侣进程失败: {e}")
@@ -469,21 +476,22 @@ class OBSLauncher:
             if self.obs_path and os.path.exists(self.obs_path):
                 logger.info(f"使用完整路径启动OBS: {self.obs_path}")
                 
-                # 按下Win+R打开运行对话框
-                pyautogui.hotkey('win', 'r')
-                time.sleep(1)
+                with self.input_lock:
+                    # 按下Win+R打开运行对话框
+                    pyautogui.hotkey('win', 'r')
+                    time.sleep(1)
                 
-                # 输入完整的OBS路径（用引号包围以处理空格）
-                full_command = f'"{self.obs_path}"'
-                pyautogui.write(full_command)
-                time.sleep(0.5)
+                    # 输入完整的OBS路径（用引号包围以处理空格）
+                    full_command = f'"{self.obs_path}"'
+                    pyautogui.write(full_command)
+                    time.sleep(0.5)
                 
-                # 按回车执行
-                pyautogui.press('enter')
-                time.sleep(3)
+                    # 按回车执行
+                    pyautogui.press('enter')
                 
-                # 检查OBS是否成功启动
-                if self.is_obs_running():
+                    # 等待OBS进程出现
+                    started = self._wait_launched(self.is_obs_running, OBS_PROCESS_NAMES, "OBS")
+                if started:
                     logger.info("通过完整路径成功启动OBS")
                     return True
                 else:
@@ -492,40 +500,42 @@ class OBSLauncher:
             # 方法2: 尝试通过开始菜单搜索OBS
             logger.info("尝试通过开始菜单搜索OBS...")
             
-            # 按下Windows键打开开始菜单
-            pyautogui.press('win')
-            time.sleep(1)
+            with self.input_lock:
+                # 按下Windows键打开开始菜单
+                pyautogui.press('win')
+                time.sleep(1)
             
-            # 输入OBS进行搜索
-            pyautogui.write('OBS Studio')
-            time.sleep(2)
+                # 输入OBS进行搜索
+                pyautogui.write('OBS Studio')
+                time.sleep(2)
             
-            # 按回车键启动第一个搜索结果
-            pyautogui.press('enter')
-            time.sleep(2)  # 减少等待时间
+                # 按回车键启动第一个搜索结果
+                pyautogui.press('enter')
             
-            # 检查OBS是否成功启动
-            if self.is_obs_running():
+                # 等待OBS进程出现
+                started = self._wait_launched(self.is_obs_running, OBS_PROCESS_NAMES, "OBS")
+            if started:
                 logger.info("通过开始菜单成功启动OBS")
                 return True
             
             # 方法3: 尝试通过运行对话框使用简单命令
             logger.info("尝试通过运行对话框启动OBS...")
             
-            # 按下Win+R打开运行对话框
-            pyautogui.hotkey('win', 'r')
-            time.sleep(1)
+            with self.input_lock:
+                # 按下Win+R打开运行对话框
+                pyautogui.hotkey('win', 'r')
+                time.sleep(1)
             
-            # 输入OBS命令
-            pyautogui.write('obs64')
-            time.sleep(0.5)
+                # 输入OBS命令
+                pyautogui.write('obs64')
+                time.sleep(0.5)
             
-            # 按回车执行
-            pyautogui.press('enter')
-            time.sleep(2)  # 减少等待时间
+                # 按回车执行
+                pyautogui.press('enter')
             
-            # 检查OBS是否成功启动
-            if self.is_obs_running():
+                # 等待OBS进程出现
+                started = self._wait_launched(self.is_obs_running, OBS_PROCESS_NAMES, "OBS")
+            if started:
                 logger.info("通过运行对话框成功启动OBS")
                 return True
             
@@ -573,55 +583,58 @@ class OBSLauncher:
             search_term = '直播伴侣'
             logger.info(f"尝试搜索: {search_term}")
             
-            # 按下Windows键打开开始菜单
-            pyautogui.press('win')
-            time.sleep(1.5)  # 增加等待时间确保开始菜单完全打开
+            with self.input_lock:
+                # 按下Windows键打开开始菜单
+                pyautogui.press('win')
+                time.sleep(1.5)  # 增加等待时间确保开始菜单完全打开
             
-            # 清空搜索框（防止之前有残留内容）
-            pyautogui.hotkey('ctrl', 'a')
-            time.sleep(0.2)
-            pyautogui.press('delete')
-            time.sleep(0.3)
+                # 清空搜索框（防止之前有残留内容）
+                pyautogui.hotkey('ctrl', 'a')
+                time.sleep(0.2)
+                pyautogui.press('delete')
+                time.sleep(0.3)
             
-            # 使用剪贴板方法输入中文（pyautogui.typewrite对中文支持不好）
-            import pyperclip
-            pyperclip.copy(search_term)
-            pyautogui.hotkey('ctrl', 'v')
-            time.sleep(2)
+                # 使用剪贴板方法输入中文（pyautogui.typewrite对中文支持不好）
+                import pyperclip
+                pyperclip.copy(search_term)
+                pyautogui.hotkey('ctrl', 'v')
+                time.sleep(2)
             
-            # 按回车键启动第一个搜索结果
-            pyautogui.press('enter')
-            time.sleep(4)  # 等待应用启动
+                # 按回车键启动第一个搜索结果
+                pyautogui.press('enter')
             
-            # 检查直播伴侣是否成功启动
-            if self.is_live_companion_running():
+                # 等待直播伴侣进程出现
+                started = self._wait_launched(self.is_live_companion_running, COMPANION_PROCESS_NAMES, "直播伴侣")
+            if started:
                 logger.info(f"通过搜索'{search_term}'成功启动直播伴侣")
                 return True
             else:
                 logger.warning(f"通过搜索'{search_term}'启动直播伴侣失败")
                 # 按ESC关闭开始菜单
-                pyautogui.press('esc')
-                time.sleep(0.5)
+                with self.input_lock:
+                    pyautogui.press('esc')
+                    time.sleep(0.5)
             
             # 方法2: 备用方案 - 使用完整路径直接启动直播伴侣
             if self.live_companion_path and os.path.exists(self.live_companion_path):
                 logger.info(f"界面搜索失败，尝试使用完整路径启动: {self.live_companion_path}")
                 
-                # 按下Win+R打开运行对话框
-                pyautogui.hotkey('win', 'r')
-                time.sleep(1)
+                with self.input_lock:
+                    # 按下Win+R打开运行对话框
+                    pyautogui.hotkey('win', 'r')
+                    time.sleep(1)
                 
-                # 输入完整的直播伴侣路径（用引号包围以处理空格）
-                full_command = f'"{self.live_companion_path}"'
-                pyautogui.write(full_command)
-                time.sleep(0.5)
+                    # 输入完整的直播伴侣路径（用引号包围以处理空格）
+                    full_command = f'"{self.live_companion_path}"'
+                    pyautogui.write(full_command)
+                    time.sleep(0.5)
                 
-                # 按回车执行
-                pyautogui.press('enter')
-                time.sleep(3)
+                    # 按回车执行
+                    pyautogui.press('enter')
                 
-                # 检查直播伴侣是否成功启动
-                if self.is_live_companion_running():
+                    # 等待直播伴侣进程出现
+                    started = self._wait_launched(self.is_live_companion_running, COMPANION_PROCESS_NAMES, "直播伴侣")
+                if started:
                     logger.info("通过完整路径成功启动直播伴侣")
                     return True
                 else:
@@ -646,66 +659,76 @@ class OBSLauncher:
         # 使用PyAutoGUI启动直播伴侣
         return self.launch_live_companion_with_pyautogui()
     
-    def _detect_and_click_image(self, image_path, image_name, threshold=0.8, max_attempts=3):
-        """检测并点击指定图片的辅助方法"""
+    def _load_template(self, image_path, image_name):
+        """从模板缓存获取模板（只在首次使用或文件修改后解码），失败返回None"""
+        return self.templates.get(image_path, image_name)
+    
+    def _locate_image(self, template, threshold=0.8, gate=None):
+        """截取当前屏幕并匹配模板，找到时返回 (中心x, 中心y, 匹配度)，否则返回None
+
+        gate 为 FrameGate 时，画面没有变化的部分不重复匹配（用于等待循环）
+        """
+        screenshot = self.frame_source.grab()
+        
+        # 先在上次出现的位置附近匹配，未命中再全屏多尺度匹配（适应系统显示缩放）
+        found = (gate or self.matcher).match(screenshot, template, threshold)
+        if found is None:
+            return None
+        click_x, click_y = found.center
+        return (click_x, click_y, found.score)
+    
+    def _wait_image_gone(self, image_path, image_name, threshold=0.8, timeout=2):
+        """等待图片从屏幕上消失（点击后界面切换完成）"""
+        template = self._load_template(image_path, image_name)
+        if template is None:
+            return False
+        gate = FrameGate(self.matcher)
+        return bool(wait_until(lambda: self._locate_image(template, threshold, gate) is None,
+                               timeout=timeout, interval=0.1, name=f"{image_name}消失"))
+    
+    def _detect_and_click_image(self, image_path, image_name, threshold=0.8, max_attempts=3, timeout=None):
+        """检测并点击指定图片的辅助方法
+
+        图片出现后立即点击；timeout 为等待图片出现的最长时间，
+        未指定时按 max_attempts 换算，与原来按次数重试的总时长相当
+        """
         logger.info(f"开始检测{image_name}: {image_path}")
         
-        for attempt in range(max_attempts):
-            try:
-                # 截取当前屏幕
-                screenshot = pyautogui.screenshot()
-                screenshot_np = np.array(screenshot)
-                screenshot_cv = cv2.cvtColor(screenshot_np, cv2.COLOR_RGB2BGR)
-                
-                # 读取模板图片
-                try:
-                    with open(image_path, 'rb') as f:
-                        image_data = f.read()
-                    image_array = np.frombuffer(image_data, np.uint8)
-                    template = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
-                    
-                    if template is None:
-                        logger.error(f"无法解码{image_name}: {image_path}")
-                        return False
-                except Exception as read_error:
-                    logger.error(f"读取{image_name}失败: {image_path}, 错误: {read_error}")
-                    return False
-                
-                # 进行模板匹配
-                result = cv2.matchTemplate(screenshot_cv, template, cv2.TM_CCOEFF_NORMED)
-                min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
-                
-                if max_val >= threshold:
-                    # 找到了图片，计算点击位置（图片中心）
-                    template_height, template_width = template.shape[:2]
-                    click_x = max_loc[0] + template_width // 2
-                    click_y = max_loc[1] + template_height // 2
-                    
-                    logger.info(f"检测到{image_name}，匹配度: {max_val:.3f}, 位置: ({click_x}, {click_y})")
-                    
-                    try:
-                        # 移动鼠标并点击
-                        pyautogui.moveTo(click_x, click_y, duration=0.1)
-                        time.sleep(0.1)
-                        pyautogui.click(click_x, click_y, button='left')
-                        logger.info(f"{image_name}点击完成，位置: ({click_x}, {click_y})")
-                        return True
-                        
-                    except Exception as click_error:
-                        logger.error(f"{image_name}点击失败: {click_error}")
-                        return False
-                else:
-                    logger.debug(f"第{attempt + 1}次尝试: 未检测到{image_name}，匹配度: {max_val:.3f} < {threshold}")
-                    
-            except Exception as e:
-                logger.error(f"第{attempt + 1}次{image_name}检测失败: {e}")
-            
-            # 等待0.5秒后重试
-            if attempt < max_attempts - 1:
-                time.sleep(0.5)
+        template = self._load_template(image_path, image_name)
+        if template is None:
+            return False
         
-        logger.warning(f"经过{max_attempts}次尝试，未能检测到{image_name}")
-        return False
+        if timeout is None:
+            timeout = max_attempts * 0.7
+        gate = FrameGate(self.matcher)
+        found = wait_until(lambda: self._locate_image(template, threshold, gate), timeout=timeout,
+                           interval=0.1, max_interval=0.5, name=f"{image_name}出现")
+        if not found:
+            logger.warning(f"经过{found.attempts}次检测（{timeout:.1f} 秒），未能检测到{image_name}")
+            return False
+        
+        click_x, click_y, score = found.value
+        logger.info(f"检测到{image_name}，匹配度: {score:.3f}, 位置: ({click_x}, {click_y})")
+        return self._click_at(click_x, click_y, image_name)
+    
+    def _click_at(self, click_x, click_y, image_name):
+        """移动鼠标到指定位置并点击"""
+        try:
+            with self.input_lock:
+                pyautogui.moveTo(click_x, click_y, duration=0.1)
+                time.sleep(0.1)
+                pyautogui.click(click_x, click_y, button='left')
+            logger.info(f"{image_name}点击完成，位置: ({click_x}, {click_y})")
+            return True
+            
+        except Exception as click_error:
+            logger.error(f"{image_name}点击失败: {click_error}")
+            return False
+    
+    def _detect_images(self, templates, threshold=0.8, gate=None):
+        """截取一次屏幕，同时匹配多个模板，返回 {模板名称: Match 或 None}"""
+        screenshot = self.frame_source.grab()
+        return (gate or self.matcher).match_many(screenshot, templates, threshold)
     
     def start_live_streaming_with_image_detection(self):
         """使用OpenCV图像识别和PyAutoGUI自动启动直播功能"""
@@ -718,24 +741,26 @@ class OBSLauncher:
             return False
         
         try:
+            # 检查开始直播按钮图片
+            if not os.path.exists(START_LIVE_IMAGE_PATH):
+                logger.error(f"找不到开始直播按钮图片: {START_LIVE_IMAGE_PATH}")
+                return False
+            button_template = self._load_template(START_LIVE_IMAGE_PATH, "开始直播按钮")
+            if button_template is None:
+                return False
+            log_template = None
+            if os.path.exists(LOG_IMAGE_PATH):
+                log_template = self._load_template(LOG_IMAGE_PATH, "lOG图片")
+            else:
+                logger.warning(f"找不到 lOG.png 图片: {LOG_IMAGE_PATH}")
+            
             # 确保直播伴侣正在运行
             if not self.is_live_companion_running():
                 logger.info("直播伴侣未运行，尝试启动...")
                 if not self.auto_open_live_companion():
                     logger.error("无法启动直播伴侣")
                     return False
-                
-                # 等待直播伴侣完全启动
-                logger.info("等待直播伴侣完全启动...")
-                time.sleep(3)
-                
-                # 验证直播伴侣是否成功启动
-                if not self.is_live_companion_running():
-                    logger.error("直播伴侣启动失败")
-                    return False
-                
-                logger.info("直播伴侣启动成功，等待3秒后开始点击开始直播按钮")
-                time.sleep(3)  # 用户要求的3秒延迟
+                logger.info("直播伴侣启动成功，等待界面加载...")
             else:
                 logger.info("直播伴侣已在运行，直接进行开始直播操作")
             
@@ -743,34 +768,43 @@ class OBSLauncher:
             pyautogui.FAILSAFE = True
             pyautogui.PAUSE = 0.5
             
-            # 首先检测并点击 lOG.png 图片中的内容
-            log_image_path = os.path.join(os.path.dirname(__file__), "ico", "lOG.png")
-            if os.path.exists(log_image_path):
-                logger.info(f"开始检测 lOG.png 图片: {log_image_path}")
-                if not self._detect_and_click_image(log_image_path, "lOG图片"):
-                    logger.warning("未能检测到或点击 lOG.png 图片，继续执行开始直播操作")
-                else:
-                    logger.info("成功检测并点击了 lOG.png 图片")
-                    time.sleep(1)  # 减少等待时间到1秒
-            else:
-                logger.warning(f"找不到 lOG.png 图片: {log_image_path}")
-            
-            # 获取开始直播按钮图片路径
-            button_image_path = os.path.join(os.path.dirname(__file__), "开始直播.png")
-            if not os.path.exists(button_image_path):
-                logger.error(f"找不到开始直播按钮图片: {button_image_path}")
-                return False
+            # 每次只截一张图，同时检测 lOG 和开始直播按钮：lOG 出现时先点击（只点一次），
+            # 点击后界面会变化，下一轮重新截图；与原流程一致先处理 lOG，lOG 点击后或等待
+            # log_grace 秒仍未出现时，开始直播按钮出现即结束等待
+            state = {'log_clicked': log_template is None}
+            log_deadline = time.monotonic() + self.log_grace
+            # 等待界面加载期间画面大多不变，按帧变化跳过重复匹配
+            gate = FrameGate(self.matcher)
+            
+            def next_click():
+                hits = self._detect_images([log_template, button_template], gate=gate)
+                log_hit = hits.get(log_template.name) if log_template is not None else None
+                if log_hit is not None and not state['log_clicked']:
+                    logger.info(f"检测到lOG图片，匹配度: {log_hit.score:.3f}")
+                    state['log_clicked'] = self._click_at(*log_hit.center, "lOG图片")
+                    return None
+                if not state['log_clicked'] and time.monotonic() < log_deadline:
+                    return None
+                return hits.get(button_template.name)
             
-            # 使用辅助方法检测并点击开始直播按钮
             logger.info("开始检测并点击开始直播按钮...")
-            if self._detect_and_click_image(button_image_path, "开始直播按钮", threshold=0.8, max_attempts=10):
-                logger.info("成功检测并点击开始直播按钮")
-                time.sleep(2)  # 减少等待时间到2秒
-                return True
-            else:
+            found = wait_until(next_click, timeout=self.window_timeout, interval=0.1, max_interval=0.5,
+                               name="开始直播按钮出现")
+            if not state['log_clicked']:
+                logger.warning("未能检测到或点击 lOG.png 图片，继续执行开始直播操作")
+            if not found:
                 logger.error("未能检测到或点击开始直播按钮")
                 return False
             
+            button = found.value
+            logger.info(f"检测到开始直播按钮，匹配度: {button.score:.3f}, 位置: {button.center}")
+            if not self._click_at(*button.center, "开始直播按钮"):
+                return False
+            logger.info("成功检测并点击开始直播按钮")
+            # 按钮消失说明开播请求已提交
+            self._wait_image_gone(START_LIVE_IMAGE_PATH, "开始直播按钮", timeout=3)
+            return True
+            
         except Exception as e:
             logger.error(f"自动启动直播功能失败: {e}")
             return False
@@ -796,16 +830,18 @@ class OBSLauncher:
             pyautogui.PAUSE = 0.5
             
             # 获取取消直播按钮图片路径
-            cancel_button_image_path = os.path.join(os.path.dirname(__file__), "ico", "取消直播.png")
+            cancel_button_image_path = CANCEL_LIVE_IMAGE_PATH
             if not os.path.exists(cancel_button_image_path):
                 logger.error(f"找不到取消直播按钮图片: {cancel_button_image_path}")
                 return False
             
             # 使用辅助方法检测并点击取消直播按钮
             logger.info("开始检测并点击取消直播按钮...")
-            if self._detect_and_click_image(cancel_button_image_path, "取消直播按钮", threshold=0.8, max_attempts=10):
+            if self._detect_and_click_image(cancel_button_image_path, "取消直播按钮", threshold=0.8,
+                                           timeout=self.window_timeout):
                 logger.info("成功检测并点击取消直播按钮")
-                time.sleep(1)  # 等待1秒确保操作完成
+                # 等待按钮消失确保操作完成
+                self._wait_image_gone(cancel_button_image_path, "取消直播按钮", timeout=2)
                 return True
             else:
                 logger.error("未能检测到或点击取消直播按钮")
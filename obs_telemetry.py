@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OBS推流遥测采样
+按固定频率通过一次批量请求读取 GetStreamStatus 和 GetStats，写入固定大小的环形缓冲区，
+并计算码率和丢帧率，用于在不打开OBS的情况下查看编码器压力
+"""
+
+import time
+import asyncio
+from array import array
+from loguru import logger
+from typing import Optional, Dict, Any, List
+
+# 每个采样点保存的字段，全部以 double 存储在预分配的数组中
+FIELDS = (
+    'time',             # 采样时间（time.time()）
+    'active',           # 是否正在推流（1/0）
+    'duration_ms',      # 推流时长
+    'output_bytes',     # 已发送字节数
+    'skipped_frames',   # 输出跳帧数（网络拥塞导致）
+    'total_frames',     # 输出总帧数
+    'congestion',       # 网络拥塞程度 0~1
+    'cpu_usage',        # OBS进程CPU占用（%）
+    'render_time_ms',   # 平均帧渲染时间
+    'render_skipped',   # 渲染跳帧数（渲染延迟导致）
+    'active_fps',       # 当前帧率
+    'bitrate_kbps',     # 派生：与上一个采样点之间的码率
+    'drop_rate',        # 派生：与上一个采样点之间的输出丢帧率
+)
+
+
+class TelemetrySampler:
+    """OBS推流遥测采样器
+
+    每个字段一个预分配的 array('d') 环形缓冲区，采样不产生新的对象分配；
+    采样任务运行在控制器的事件循环上，每个周期只发出一次 RequestBatch
+    """
+
+    def __init__(self, controller, interval: float = 1.0, capacity: int = 3600):
+        self.controller = controller
+        self.interval = interval
+        self.capacity = capacity
+        self.buffers = {field: array('d', bytes(8 * capacity)) for field in FIELDS}
+        self.next_index = 0   # 下一个写入位置
+        self.count = 0        # 已保存的采样点数（不超过 capacity）
+        self.samples_taken = 0
+        self.samples_failed = 0
+        self._task = None
+        self._previous = None  # 上一个采样点的 (时间, 字节数, 跳帧数, 总帧数)，用于计算派生指标
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """在当前事件循环中启动采样任务"""
+        if self.is_running:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info(f"OBS遥测采样已启动，间隔 {self.interval} 秒，保留 {self.capacity} 个采样点")
+
+    def stop(self):
+        """停止采样任务（需在事件循环线程中调用）"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+            logger.info("OBS遥测采样已停止")
+
+    def clear(self):
+        self.next_index = 0
+        self.count = 0
+        self._previous = None
+
+    async def _run(self):
+        """按固定频率采样，采样耗时不会累积到周期中"""
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        try:
+            while True:
+                if self.controller.is_connected:
+                    await self.sample_once()
+                next_tick += self.interval
+                delay = next_tick - loop.time()
+                if delay < 0:
+                    # 采样落后（如重连期间），从当前时间重新对齐，不补采
+                    next_tick = loop.time()
+                    delay = 0
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            pass
+
+    async def sample_once(self) -> bool:
+        """采样一次，成功返回True"""
+        results = await self.controller.send_batch(
+            [("GetStreamStatus", None), ("GetStats", None)],
+            self.controller.BATCH_SERIAL_REALTIME, quiet=True)
+        if not results or len(results) < 2:
+            self.samples_failed += 1
+            return False
+        stream = results[0].get('responseData') or {}
+        stats = results[1].get('responseData') or {}
+        self.record(time.time(), stream, stats)
+        return True
+
+    def record(self, now: float, stream: Dict[str, Any], stats: Dict[str, Any]):
+        """写入一个采样点并计算派生指标"""
+        output_bytes = stream.get('outputBytes', 0)
+        skipped = stream.get('outputSkippedFrames', 0)
+        total = stream.get('outputTotalFrames', 0)
+
+        bitrate = 0.0
+        drop_rate = 0.0
+        if self._previous is not None:
+            prev_time, prev_bytes, prev_skipped, prev_total = self._previous
+            elapsed = now - prev_time
+            # 重新开始推流时计数器归零，不计算跨越归零点的差值
+            if elapsed > 0 and output_bytes >= prev_bytes:
+                bitrate = (output_bytes - prev_bytes) * 8 / 1000 / elapsed
+            frames = total - prev_total
+            if frames > 0 and skipped >= prev_skipped:
+                drop_rate = (skipped - prev_skipped) / frames
+        self._previous = (now, output_bytes, skipped, total)
+
+        i = self.next_index
+        buffers = self.buffers
+        buffers['time'][i] = now
+        buffers['active'][i] = 1.0 if stream.get('outputActive') else 0.0
+        buffers['duration_ms'][i] = stream.get('outputDuration', 0)
+        buffers['output_bytes'][i] = output_bytes
+        buffers['skipped_frames'][i] = skipped
+        buffers['total_frames'][i] = total
+        buffers['congestion'][i] = stream.get('outputCongestion') or 0.0
+        buffers['cpu_usage'][i] = stats.get('cpuUsage', 0.0)
+        buffers['render_time_ms'][i] = stats.get('averageFrameRenderTime', 0.0)
+        buffers['render_skipped'][i] = stats.get('renderSkippedFrames', 0)
+        buffers['active_fps'][i] = stats.get('activeFps', 0.0)
+        buffers['bitrate_kbps'][i] = bitrate
+        buffers['drop_rate'][i] = drop_rate
+
+        # 所有字段写完后再移动写入位置，读取方不会看到写了一半的采样点
+        self.next_index = (i + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+        self.samples_taken += 1
+
+    def _indices(self, seconds: Optional[float] = None) -> List[int]:
+        """按时间顺序返回最近采样点的下标，seconds 为 None 时返回全部"""
+        count, end = self.count, self.next_index
+        start = (end - count) % self.capacity
+        indices = [(start + k) % self.capacity for k in range(count)]
+        if seconds is None or not indices:
+            return indices
+        cutoff = self.buffers['time'][indices[-1]] - seconds
+        times = self.buffers['time']
+        # 时间单调递增，从后往前找到第一个早于截止时间的位置
+        for k in range(len(indices) - 1, -1, -1):
+            if times[indices[k]] < cutoff:
+                return indices[k + 1:]
+        return indices
+
+    def recent(self, seconds: Optional[float] = None, fields=None) -> Dict[str, List[float]]:
+        """返回最近 seconds 秒的采样数据，按字段组织 {字段: [值, ...]}，按时间顺序排列"""
+        indices = self._indices(seconds)
+        fields = fields or FIELDS
+        return {field: [self.buffers[field][i] for i in indices] for field in fields}
+
+    def latest(self) -> Optional[Dict[str, float]]:
+        """最近一个采样点"""
+        if not self.count:
+            return None
+        i = (self.next_index - 1) % self.capacity
+        return {field: self.buffers[field][i] for field in FIELDS}
+
+    def summary(self, seconds: float = 60) -> Dict[str, Any]:
+        """最近 seconds 秒的汇总：平均/最大码率、丢帧率、拥塞、CPU和渲染时间"""
+        data = self.recent(seconds, ('bitrate_kbps', 'drop_rate', 'congestion', 'cpu_usage', 'render_time_ms'))
+        samples = len(data['bitrate_kbps'])
+        if not samples:
+            return {'samples': 0}
+        result = {'samples': samples}
+        for field, values in data.items():
+            result[f'{field}_avg'] = sum(values) / samples
+            result[f'{field}_max'] = max(values)
+        return result
+
+
+if __name__ == "__main__":
+    # 测试代码：连接模拟OBS服务器，推流并采样几秒
+    from mock_obs_server import MockOBSServer
+    from obs_controller import OBSController
+
+    async def demo():
+        server = await MockOBSServer(port=0).start()
+        controller = OBSController(detect_process=False)
+        await controller.connect_websocket("127.0.0.1", server.port)
+        await controller.start_streaming()
+        sampler = controller.start_telemetry(interval=0.5, capacity=10)
+        await asyncio.sleep(3)
+        print(f"最近采样: {sampler.latest()}")
+        print(f"汇总: {sampler.summary(60)}")
+        controller.stop_telemetry()
+        await server.stop()
+
+    asyncio.run(demo())
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进程存活跟踪与进程控制
+找到目标进程后记录 PID 和创建时间，之后只检查这一个进程是否仍然存活（O(1)），
+进程退出后才重新遍历全部进程；按进程名精确匹配，并统计扫描次数和耗时。
+终止进程时等待进程真正退出（带超时），不再依赖 tasklist/taskkill 子进程和固定等待
+"""
+
+import time
+import psutil
+from loguru import logger
+from typing import Optional, Dict, Any, Iterable, List
+
+try:
+    import ctypes
+    from ctypes import wintypes
+    _user32 = ctypes.windll.user32
+    FOREGROUND_AVAILABLE = True
+except (ImportError, AttributeError):
+    FOREGROUND_AVAILABLE = False
+
+# OBS主程序的进程名（不区分大小写精确匹配，避免匹配到名称中包含 obs 的其他进程）
+OBS_PROCESS_NAMES = ('obs64.exe', 'obs32.exe', 'obs.exe', 'obs')
+
+# 常见的直播伴侣进程名
+COMPANION_PROCESS_NAMES = (
+    '直播伴侣.exe',  # 最常见的直播伴侣进程名
+    'LiveCompanion.exe',
+    'StreamCompanion.exe',
+    'BilibiliLiveHelper.exe',
+    'DouyinLiveCompanion.exe',
+    'TikTokLiveStudio.exe',
+)
+
+
+def find_processes(names: Iterable[str]) -> List[psutil.Process]:
+    """一次遍历进程表，返回名称匹配任一候选名的全部进程（跳过僵尸进程）"""
+    wanted = frozenset(name.lower() for name in names)
+    found = []
+    try:
+        for proc in psutil.process_iter(['pid', 'name', 'status']):
+            try:
+                name = proc.info['name']
+                if name and name.lower() in wanted and proc.info['status'] != psutil.STATUS_ZOMBIE:
+                    found.append(proc)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+    except Exception as e:
+        logger.error(f"遍历进程失败: {e}")
+    return found
+
+
+def foreground_process_name() -> Optional[str]:
+    """当前前台窗口所属进程的名称，无法获取时返回None（仅 Windows）"""
+    if not FOREGROUND_AVAILABLE:
+        return None
+    try:
+        hwnd = _user32.GetForegroundWindow()
+        if not hwnd:
+            return None
+        pid = wintypes.DWORD()
+        _user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+        return psutil.Process(pid.value).name()
+    except (psutil.NoSuchProcess, psutil.AccessDenied, OSError):
+        return None
+
+
+def terminate_processes(processes: List[psutil.Process], timeout: float = 5.0,
+                        force: bool = False, label: str = "进程") -> Dict[str, Any]:
+    """终止进程并等待其退出
+
+    先发送 terminate（force 为 True 时直接 kill），超时仍未退出的进程再 kill 一次；
+    返回 {'terminated': [进程名...], 'alive': [进程名...], 'elapsed': 秒}
+    """
+    start_time = time.perf_counter()
+    names = {}
+    for proc in processes:
+        try:
+            names[proc.pid] = proc.name()
+            if force:
+                proc.kill()
+            else:
+                proc.terminate()
+        except psutil.NoSuchProcess:
+            continue
+        except psutil.AccessDenied as e:
+            logger.warning(f"没有权限终止{label}进程 (PID: {proc.pid}): {e}")
+
+    gone, alive = psutil.wait_procs(processes, timeout=timeout)
+    if alive and not force:
+        logger.warning(f"{label}进程 {timeout} 秒内未退出，强制结束: {[p.pid for p in alive]}")
+        for proc in alive:
+            try:
+                proc.kill()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        more_gone, alive = psutil.wait_procs(alive, timeout=timeout)
+        gone = gone + more_gone
+
+    return {
+        'terminated': [names.get(p.pid, str(p.pid)) for p in gone],
+        'alive': [names.get(p.pid, str(p.pid)) for p in alive],
+        'elapsed': time.perf_counter() - start_time,
+    }
+
+
+class ProcessWatcher:
+    """跟踪一个按名称匹配的进程
+
+    find() 先检查已跟踪进程是否存活（psutil 用 PID + 创建时间判断，PID 被复用也能识别），
+    只有进程不存在时才做全量扫描
+    """
+
+    def __init__(self, names: Iterable[str], label: str = "进程", require_exe: bool = False):
+        self.names = frozenset(name.lower() for name in names)
+        self.label = label
+        self.require_exe = require_exe
+        self.process = None  # psutil.Process
+        self.info = None     # {'pid', 'name', 'path', 'create_time'}
+        self._created = time.monotonic()
+        self.metrics = {
+            'scans': 0,             # 全量扫描次数
+            'scan_time': 0.0,       # 全量扫描总耗时（秒）
+            'last_scan_time': 0.0,
+            'processes_scanned': 0,  # 全量扫描累计检查的进程数
+            'checks': 0,            # O(1) 存活检查次数
+            'check_time': 0.0,
+            'hits': 0,              # 存活检查命中（无需扫描）
+            'lost': 0,              # 已跟踪的进程退出次数
+        }
+
+    def matches(self, name: Optional[str]) -> bool:
+        return bool(name) and name.lower() in self.names
+
+    def scan(self) -> Optional[Dict[str, Any]]:
+        """遍历全部进程查找目标进程，找到后开始跟踪
+
+        遍历时只预取 pid 和进程名，路径、创建时间和状态只对名称匹配的进程读取
+        """
+        start_time = time.perf_counter()
+        found = None
+        details = None
+        scanned = 0
+        try:
+            for proc in psutil.process_iter(['pid', 'name']):
+                scanned += 1
+                if not self.matches(proc.info['name']):
+                    continue
+                try:
+                    with proc.oneshot():
+                        if proc.status() == psutil.STATUS_ZOMBIE:
+                            continue
+                        try:
+                            exe = proc.exe()
+                        except psutil.AccessDenied:
+                            exe = None
+                        if self.require_exe and not exe:
+                            continue
+                        details = {'exe': exe, 'create_time': proc.create_time()}
+                    found = proc
+                    break
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    continue
+        except Exception as e:
+            logger.error(f"扫描{self.label}进程失败: {e}")
+        finally:
+            elapsed = time.perf_counter() - start_time
+            self.metrics['scans'] += 1
+            self.metrics['scan_time'] += elapsed
+            self.metrics['last_scan_time'] = elapsed
+            self.metrics['processes_scanned'] += scanned
+
+        if found is None:
+            self.forget()
+            return None
+        self.process = found
+        self.info = {
+            'pid': found.info['pid'],
+            'name': found.info['name'],
+            'path': details['exe'],
+            'create_time': details['create_time'],
+        }
+        logger.info(f"检测到{self.label}进程: {self.info['path'] or self.info['name']} (PID: {self.info['pid']})")
+        return self.info
+
+    def is_alive(self) -> bool:
+        """O(1) 检查已跟踪的进程是否仍在运行"""
+        if self.process is None:
+            return False
+        start_time = time.perf_counter()
+        try:
+            # is_running 会比较创建时间，PID 被其他进程复用时返回 False
+            alive = self.process.is_running() and self.process.status() != psutil.STATUS_ZOMBIE
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            alive = False
+        self.metrics['checks'] += 1
+        self.metrics['check_time'] += time.perf_counter() - start_time
+        return alive
+
+    def find(self) -> Optional[Dict[str, Any]]:
+        """返回目标进程信息：已跟踪且存活时直接返回，否则全量扫描"""
+        if self.process is not None:
+            if self.is_alive():
+                self.metrics['hits'] += 1
+                return self.info
+            logger.info(f"{self.label}进程已退出 (PID: {self.info['pid']})")
+            self.metrics['lost'] += 1
+            self.forget()
+        return self.scan()
+
+    def forget(self):
+        """停止跟踪当前进程"""
+        self.process = None
+        self.info = None
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """扫描和存活检查的次数、耗时和频率"""
+        metrics = dict(self.metrics)
+        minutes = max((time.monotonic() - self._created) / 60, 1e-9)
+        metrics['scans_per_minute'] = metrics['scans'] / minutes
+        metrics['avg_scan_ms'] = metrics['scan_time'] / metrics['scans'] * 1000 if metrics['scans'] else 0.0
+        metrics['avg_check_ms'] = metrics['check_time'] / metrics['checks'] * 1000 if metrics['checks'] else 0.0
+        return metrics
+
+
+if __name__ == "__main__":
+    # 测试代码
+    watcher = ProcessWatcher(OBS_PROCESS_NAMES, "OBS", require_exe=True)
+    for _ in range(5):
+        print(f"OBS进程: {watcher.find()}")
+    print(f"统计: {watcher.get_metrics()}")
+    print(f"直播伴侣进程: {[p.info['name'] for p in find_processes(COMPANION_PROCESS_NAMES)]}")
@@ -8,10 +8,14 @@ RTMP抓包工具
 import os
 import re
 import json
+import time
+import socket
+import struct
+import selectors
 import threading
-from datetime import datetime
+from types import SimpleNamespace
 
-# 使用配置模块强制 Scapy 使用原生套接字
+# 使用配置模块强制 Scapy 使用原生套接字（只设置环境变量，不导入 scapy）
 try:
     from scapy_config import configure_scapy_native_sockets, apply_scapy_config
     configure_scapy_native_sockets()
@@ -20,38 +24,114 @@ except ImportError:
     os.environ['SCAPY_USE_PCAPDNET'] = '0'
     os.environ['SCAPY_USE_NPCAP'] = '0'
     os.environ['SCAPY_USE_WINPCAPY'] = '0'
+    apply_scapy_config = None
 
-# 导入 scapy
-from scapy.all import *
-from scapy.layers.inet import IP, TCP
 from loguru import logger
+from rtmp_records import RTMPURLRecord, StreamRegistry, ip_to_int
 
-# 应用 scapy 配置
-try:
-    apply_scapy_config()
-except (ImportError, NameError):
-    # 备用配置
+# scapy 按需导入：只有启动基于 scapy 的抓包或列出网卡时才加载
+_scapy = None
+_scapy_lock = threading.Lock()
+
+# IPv4 头和 TCP 头中用到的字段
+_IPV4_HEADER = struct.Struct('!BBHHHBBHII')
+_TCP_PORTS = struct.Struct('!HH')
+
+
+def _load_scapy():
+    """导入抓包实际用到的 scapy 组件，只在第一次调用时导入"""
+    global _scapy
+    if _scapy is not None:
+        return _scapy
+    with _scapy_lock:
+        if _scapy is None:
+            start_time = time.perf_counter()
+            from scapy.config import conf
+            from scapy.packet import Raw
+            from scapy.layers.inet import IP, TCP
+            try:
+                from scapy.interfaces import get_if_list
+            except ImportError:
+                # 旧版 scapy 在 arch 中提供 get_if_list
+                from scapy.arch import get_if_list
+            
+            # 应用 scapy 配置
+            if apply_scapy_config:
+                apply_scapy_config()
+            else:
+                conf.use_pcap = False
+                conf.use_dnet = False
+            
+            _scapy = SimpleNamespace(conf=conf, Raw=Raw, IP=IP, TCP=TCP, get_if_list=get_if_list)
+            logger.info(f"已加载 scapy 组件，耗时 {time.perf_counter() - start_time:.2f} 秒")
+    return _scapy
+
+
+def _interface_ipv4(interface):
+    """确定原生套接字要绑定的 IPv4 地址
+
+    interface 为 None 时使用本机主机名对应的地址；可以是 IPv4 地址、系统网卡名称（psutil），
+    或 scapy 列出的网卡名称（已加载 scapy 时）；无法确定时返回 None
+    """
+    if interface is None:
+        return socket.gethostbyname(socket.gethostname())
+    try:
+        socket.inet_aton(interface)
+        return interface
+    except OSError:
+        pass
     try:
-        import scapy.config
-        scapy.config.conf.use_pcap = False
-        scapy.config.conf.use_dnet = False
+        import psutil
+        for address in psutil.net_if_addrs().get(interface, ()):
+            if address.family == socket.AF_INET:
+                return address.address
     except ImportError:
         pass
+    if _scapy is not None:
+        try:
+            from scapy.arch import get_if_addr
+            address = get_if_addr(interface)
+            if address and address != '0.0.0.0':
+                return address
+        except Exception as e:
+            logger.debug(f"通过 scapy 获取网卡地址失败: {e}")
+    return None
+
+
+def _parse_port_filter(filter_expr):
+    """将形如 "tcp port 1935 or tcp port 443" 的过滤器解析为端口集合，无法解析时返回 None"""
+    if not filter_expr:
+        return None
+    clauses = re.split(r'\s+or\s+', filter_expr.strip(), flags=re.IGNORECASE)
+    ports = set()
+    for clause in clauses:
+        match = re.fullmatch(r'(?:tcp\s+)?port\s+(\d+)', clause.strip(), re.IGNORECASE)
+        if not match:
+            return None
+        ports.add(int(match.group(1)))
+    return frozenset(ports)
 
 class RTMPCapture:
     def __init__(self):
         self.is_capturing = False
         self.captured_packets = []
         self.rtmp_urls = set()
-        self.rtmp_streams = []  # 存储RTMP流信息
+        self.rtmp_streams = StreamRegistry()  # 按推流码去重的RTMP流信息
         self.capture_thread = None
         self.processed_packets = set()  # 用于避免重复处理相同的包
         
-        # 强制配置 Scapy 使用原生套接字
-        self._configure_native_sockets()
+        # 抓包循环使用的选择器和唤醒套接字对，重复开始/停止抓包时复用
+        self._selector = None
+        self._wakeup_recv = None
+        self._wakeup_send = None
+        self._native_configured = False
+        self._port_filter = None
         
     def _configure_native_sockets(self):
-        """配置 Scapy 使用原生套接字而不是 Npcap"""
+        """配置 Scapy 使用原生套接字而不是 Npcap（只需配置一次）"""
+        if self._native_configured:
+            return
+        self._native_configured = True
         try:
             import scapy.config
             import scapy.arch
@@ -76,97 +156,101 @@ class RTMPCapture:
             logger.warning(f"配置原生套接字时出现警告: {e}")
             
     def packet_handler(self, packet):
-        """处理捕获的数据包"""
+        """处理 scapy 捕获的数据包"""
         try:
+            IP, TCP, Raw = _scapy.IP, _scapy.TCP, _scapy.Raw
             # 首先检查数据包是否包含必要的层
             if packet.haslayer(IP) and packet.haslayer(TCP) and packet.haslayer(Raw):
-                # 生成包的唯一标识符，避免重复处理
-                packet_id = f"{packet[IP].src}:{packet[TCP].sport}-{packet[IP].dst}:{packet[TCP].dport}-{len(packet[Raw].load)}"
-                
-                if packet_id in self.processed_packets:
-                    return  # 跳过已处理的包
-                
-                self.processed_packets.add(packet_id)
-                
-                # 检查是否为RTMP相关流量，使用更安全的解码方式
+                ip_layer = packet[IP]
+                tcp_layer = packet[TCP]
+                self._process_payload(
+                    int(packet.time * 1_000_000_000),
+                    ip_to_int(ip_layer.src), ip_to_int(ip_layer.dst),
+                    tcp_layer.sport, tcp_layer.dport,
+                    len(packet), packet[Raw].load
+                )
+        except Exception as e:
+            logger.debug(f"处理数据包时出错: {e}")
+    
+    def _process_payload(self, ts_ns, src_addr, dst_addr, src_port, dst_port, packet_size, raw_payload):
+        """分析TCP负载中的RTMP信息，地址为整数形式，时间戳为纳秒"""
+        try:
+            # 生成包的唯一标识符，避免重复处理
+            packet_id = (src_addr, src_port, dst_addr, dst_port, len(raw_payload))
+            
+            if packet_id in self.processed_packets:
+                return  # 跳过已处理的包
+            
+            self.processed_packets.add(packet_id)
+            
+            # 检查是否为RTMP相关流量，使用更安全的解码方式
+            try:
+                # 尝试多种编码方式
+                payload = raw_payload.decode('utf-8', errors='replace')
+            except UnicodeDecodeError:
                 try:
-                    # 尝试多种编码方式
-                    payload = packet[Raw].load.decode('utf-8', errors='replace')
-                except UnicodeDecodeError:
-                    try:
-                        payload = packet[Raw].load.decode('latin-1', errors='replace')
-                    except:
-                        payload = str(packet[Raw].load)
-                
-                # 保留原始payload用于二进制分析
-                raw_payload = packet[Raw].load
-                
-                # 过滤掉非可打印字符，只保留ASCII可打印字符和常见符号
-                payload = ''.join(char for char in payload if ord(char) >= 32 and ord(char) <= 126 or char in '\n\r\t')
-                
-                # 检查RTMP协议命令（同时传递原始和过滤后的数据）
-                self.parse_rtmp_commands(packet, payload, raw_payload)
-                
-                # 查找RTMP URL模式，使用更精确的正则表达式
-                # 避免匹配到tcUrl等参数名称
-                rtmp_patterns = [
-                    r'(?<!tc)(?<!sw)rtmp://[a-zA-Z0-9.-]+(?::[0-9]+)?/[a-zA-Z0-9/_-]+(?=\s|$|["\'>\\;,])',  # 严格的RTMP模式，排除tcUrl
-                    r'(?<!tc)(?<!sw)rtmps://[a-zA-Z0-9.-]+(?::[0-9]+)?/[a-zA-Z0-9/_-]+(?=\s|$|["\'>\\;,])',  # RTMPS模式，排除tcUrl
-                ]
-                
-                for pattern in rtmp_patterns:
-                    matches = re.findall(pattern, payload, re.IGNORECASE)
-                    for match in matches:
-                        # 清理URL，移除可能的尾部字符和非ASCII字符
-                        clean_url = match.strip()
-                        
-                        # 移除URL中的非ASCII字符和特殊字符
-                        clean_url = re.sub(r'[^a-zA-Z0-9:/._-]', '', clean_url)
-                        
-                        # 过滤掉包含参数名称的误匹配（如tcUrl、swfUrl等）
-                        if any(param in clean_url.lower() for param in ['tcurl', 'swfurl', 'pageurl']):
-                            continue
-                        
-                        # 确保URL格式正确
-                        if not clean_url or len(clean_url) < 20:  # 过滤过短的匹配
-                            continue
-                        
-                        # 验证URL格式
-                        if not clean_url.startswith(('rtmp://', 'rtmps://')):
-                            continue
-                        
-                        # 确保URL结构完整且合理
-                        url_parts = clean_url.split('/')
-                        if len(url_parts) < 4:  # rtmp://domain/path
-                            continue
-                        
-                        # 验证域名部分是否合理
-                        domain_part = url_parts[2]
-                        if not re.match(r'^[a-zA-Z0-9.-]+$', domain_part) or len(domain_part) < 5:
-                            continue
+                    payload = raw_payload.decode('latin-1', errors='replace')
+                except:
+                    payload = str(raw_payload)
+            
+            # 过滤掉非可打印字符，只保留ASCII可打印字符和常见符号
+            payload = ''.join(char for char in payload if ord(char) >= 32 and ord(char) <= 126 or char in '\n\r\t')
+            
+            flow = (ts_ns, src_addr, dst_addr, src_port, dst_port, packet_size)
+            
+            # 检查RTMP协议命令（同时传递原始和过滤后的数据）
+            self.parse_rtmp_commands(flow, payload, raw_payload)
+            
+            # 查找RTMP URL模式，使用更精确的正则表达式
+            # 避免匹配到tcUrl等参数名称
+            rtmp_patterns = [
+                r'(?<!tc)(?<!sw)rtmp://[a-zA-Z0-9.-]+(?::[0-9]+)?/[a-zA-Z0-9/_-]+(?=\s|$|["\'>\\;,])',  # 严格的RTMP模式，排除tcUrl
+                r'(?<!tc)(?<!sw)rtmps://[a-zA-Z0-9.-]+(?::[0-9]+)?/[a-zA-Z0-9/_-]+(?=\s|$|["\'>\\;,])',  # RTMPS模式，排除tcUrl
+            ]
+            
+            for pattern in rtmp_patterns:
+                matches = re.findall(pattern, payload, re.IGNORECASE)
+                for match in matches:
+                    # 清理URL，移除可能的尾部字符和非ASCII字符
+                    clean_url = match.strip()
+                    
+                    # 移除URL中的非ASCII字符和特殊字符
+                    clean_url = re.sub(r'[^a-zA-Z0-9:/._-]', '', clean_url)
+                    
+                    # 过滤掉包含参数名称的误匹配（如tcUrl、swfUrl等）
+                    if any(param in clean_url.lower() for param in ['tcurl', 'swfurl', 'pageurl']):
+                        continue
+                    
+                    # 确保URL格式正确
+                    if not clean_url or len(clean_url) < 20:  # 过滤过短的匹配
+                        continue
+                    
+                    # 验证URL格式
+                    if not clean_url.startswith(('rtmp://', 'rtmps://')):
+                        continue
+                    
+                    # 确保URL结构完整且合理
+                    url_parts = clean_url.split('/')
+                    if len(url_parts) < 4:  # rtmp://domain/path
+                        continue
+                    
+                    # 验证域名部分是否合理
+                    domain_part = url_parts[2]
+                    if not re.match(r'^[a-zA-Z0-9.-]+$', domain_part) or len(domain_part) < 5:
+                        continue
+                    
+                    if clean_url not in self.rtmp_urls:
+                        self.rtmp_urls.add(clean_url)
+                        self.captured_packets.append(RTMPURLRecord(*flow, clean_url))
+                        # 安全地记录日志，避免特殊字符问题
+                        safe_url = clean_url.encode('ascii', errors='ignore').decode('ascii')
+                        logger.info(f"发现RTMP流: {safe_url}")
                         
-                        if clean_url not in self.rtmp_urls:
-                            self.rtmp_urls.add(clean_url)
-                            packet_info = {
-                                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                                'src_ip': packet[IP].src,
-                                'dst_ip': packet[IP].dst,
-                                'src_port': packet[TCP].sport,
-                                'dst_port': packet[TCP].dport,
-                                'rtmp_url': clean_url,
-                                'packet_size': len(packet),
-                                'protocol': 'RTMP'
-                            }
-                            self.captured_packets.append(packet_info)
-                            # 安全地记录日志，避免特殊字符问题
-                            safe_url = clean_url.encode('ascii', errors='ignore').decode('ascii')
-                            logger.info(f"发现RTMP流: {safe_url}")
-                            
         except Exception as e:
             logger.debug(f"处理数据包时出错: {e}")
     
-    def parse_rtmp_commands(self, packet, payload, raw_payload=None):
-        """解析RTMP协议命令"""
+    def parse_rtmp_commands(self, flow, payload, raw_payload=None):
+        """解析RTMP协议命令，flow 为 (时间戳, 源地址, 目的地址, 源端口, 目的端口, 包大小)"""
         try:
             # 检查releaseStream命令 - 改进正则表达式以匹配更多格式
             if 'releaseStream' in payload or 'releasestream' in payload.lower() or 'release' in payload.lower():
@@ -241,18 +325,8 @@ class RTMPCapture:
                      logger.debug(f"检测到releaseStream流名称: {stream_name}")
                      # 格式化流名称为stream-xxx格式
                      formatted_stream_name = f"stream-{stream_name}"
-                     stream_info = {
-                         'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                         'src_ip': packet[IP].src,
-                         'dst_ip': packet[IP].dst,
-                         'src_port': packet[TCP].sport,
-                         'dst_port': packet[TCP].dport,
-                         'command': 'releaseStream',
-                         'stream_name': formatted_stream_name,
-                         'packet_size': len(packet)
-                     }
-                     self.rtmp_streams.append(stream_info)
-                     logger.info(f"发现RTMP {formatted_stream_name}")
+                     if self.rtmp_streams.record(flow, 'releaseStream', formatted_stream_name):
+                         logger.info(f"发现RTMP {formatted_stream_name}")
             
             # 检查publish命令
             elif 'publish' in payload or 'Publish' in payload:
@@ -269,18 +343,8 @@ class RTMPCapture:
                         break
                 
                 if stream_name and len(stream_name) > 3:
-                    stream_info = {
-                        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                        'src_ip': packet[IP].src,
-                        'dst_ip': packet[IP].dst,
-                        'src_port': packet[TCP].sport,
-                        'dst_port': packet[TCP].dport,
-                        'command': 'publish',
-                        'stream_name': stream_name,
-                        'packet_size': len(packet)
-                    }
-                    self.rtmp_streams.append(stream_info)
-                    logger.info(f"发现RTMP publish: {stream_name}")
+                    if self.rtmp_streams.record(flow, 'publish', stream_name):
+                        logger.info(f"发现RTMP publish: {stream_name}")
             
             # 检查connect命令 - 跳过，不记录connect命令的信息
             elif 'connect' in payload or 'Connect' in payload:
@@ -290,107 +354,209 @@ class RTMPCapture:
         except Exception as e:
             logger.debug(f"解析RTMP命令时出错: {e}")
     
-    def start_capture(self, interface=None, filter_expr="tcp port 1935 or tcp port 443 or tcp port 80"):
-        """开始抓包"""
+    def start_capture(self, interface=None, filter_expr="tcp port 1935 or tcp port 443 or tcp port 80", backend="auto"):
+        """开始抓包
+        
+        backend: "native" 使用原生套接字（不需要 scapy），"scapy" 使用 scapy 监听套接字，
+        "auto" 在 Windows 上且未指定网卡时优先原生套接字，否则优先 scapy，失败时自动切换
+        """
         if self.is_capturing:
             logger.warning("抓包已在进行中")
             return
+        
+        # 上一次的抓包线程如果还在收尾，等待其释放套接字
+        if self.capture_thread and self.capture_thread.is_alive():
+            self.capture_thread.join(timeout=2)
             
         self.is_capturing = True
         self.captured_packets.clear()
         self.rtmp_urls.clear()
         self.rtmp_streams.clear()  # 清空RTMP流信息
         self.processed_packets.clear()  # 清空已处理包的记录
+        self._port_filter = _parse_port_filter(filter_expr)
         
-        # 再次确保使用原生套接字配置
-        self._configure_native_sockets()
+        self._prepare_wakeup()
         
         logger.info(f"开始抓包，过滤器: {filter_expr}")
-        logger.info("使用原生套接字模式进行抓包")
+        
+        backends = {
+            'native': ("原生套接字", self._capture_with_raw_socket),
+            'scapy': ("scapy", self._capture_with_scapy),
+        }
+        if backend == 'auto':
+            # 原生套接字只能绑定一个 IPv4 地址，指定网卡时优先使用能直接按网卡监听的 scapy
+            order = ['native', 'scapy'] if os.name == 'nt' and interface is None else ['scapy', 'native']
+        else:
+            order = [backend]
         
         def capture_worker():
-            try:
-                # 使用原生套接字进行抓包
-                sniff(
-                    iface=interface,
-                    filter=filter_expr,
-                    prn=self.packet_handler,
-                    stop_filter=lambda x: not self.is_capturing,
-                    store=0,
-                    # 强制使用原生套接字，不使用 pcap
-                    socket=None  # 让 scapy 使用默认的原生套接字
-                )
-            except Exception as e:
-                logger.error(f"抓包过程中出错: {e}")
-                logger.info("尝试使用备用抓包方法...")
+            for index, name in enumerate(order):
+                label, run_backend = backends[name]
                 try:
-                    # 备用方法：直接使用原生套接字
-                    self._capture_with_raw_socket(interface, filter_expr)
-                except Exception as e2:
-                    logger.error(f"备用抓包方法也失败: {e2}")
-                    self.is_capturing = False
+                    logger.info(f"使用{label}模式进行抓包")
+                    run_backend(interface, filter_expr)
+                    return
+                except Exception as e:
+                    if not self.is_capturing:
+                        return
+                    logger.error(f"{label}抓包失败: {e}")
+                    if index < len(order) - 1:
+                        logger.info("尝试使用备用抓包方法...")
+            self.is_capturing = False
         
         self.capture_thread = threading.Thread(target=capture_worker, daemon=True)
         self.capture_thread.start()
     
+    def _prepare_wakeup(self):
+        """准备选择器和唤醒套接字对，首次创建后在每次抓包间复用"""
+        if self._selector is None:
+            self._selector = selectors.DefaultSelector()
+            self._wakeup_recv, self._wakeup_send = socket.socketpair()
+            self._wakeup_recv.setblocking(False)
+            self._wakeup_send.setblocking(False)
+            self._selector.register(self._wakeup_recv, selectors.EVENT_READ, None)
+        else:
+            # 丢弃上一次停止时残留的唤醒信号
+            self._drain_wakeup()
+    
+    def _drain_wakeup(self):
+        """读空唤醒套接字中的数据"""
+        try:
+            while self._wakeup_recv.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+        except OSError as e:
+            logger.debug(f"读取唤醒信号时出错: {e}")
+    
+    def _wakeup(self):
+        """唤醒阻塞在选择器上的抓包线程"""
+        if self._wakeup_send is None:
+            return
+        try:
+            self._wakeup_send.send(b'\0')
+        except (BlockingIOError, InterruptedError):
+            pass  # 缓冲区已满说明已有未处理的唤醒信号
+        except OSError as e:
+            logger.debug(f"发送唤醒信号失败: {e}")
+    
+    def _run_select_loop(self, sock, on_readable):
+        """在选择器上等待套接字可读或唤醒信号，直到抓包停止"""
+        self._selector.register(sock, selectors.EVENT_READ, on_readable)
+        try:
+            while self.is_capturing:
+                for key, _ in self._selector.select():
+                    if key.data is None:
+                        # 收到停止信号
+                        self._drain_wakeup()
+                    elif self.is_capturing:
+                        key.data()
+        finally:
+            self._selector.unregister(sock)
+    
+    def _capture_with_scapy(self, interface, filter_expr):
+        """使用 scapy 监听套接字抓包，由选择器驱动以便及时停止"""
+        scapy = _load_scapy()
+        # 原生套接字配置只在首次执行，之后直接复用
+        self._configure_native_sockets()
+        
+        sniff_socket = scapy.conf.L2listen(iface=interface, filter=filter_expr)
+        try:
+            def on_readable():
+                packet = sniff_socket.recv()
+                if packet is not None:
+                    self.packet_handler(packet)
+            
+            # Windows 上 select 只接受真正的套接字，pcap/npcap 句柄即使有 fileno 也不能注册到选择器
+            if os.name == 'nt' and not isinstance(getattr(sniff_socket, 'ins', sniff_socket), socket.socket):
+                selectable = False
+            else:
+                try:
+                    sniff_socket.fileno()
+                    selectable = True
+                except Exception:
+                    selectable = False
+            
+            if selectable:
+                self._run_select_loop(sniff_socket, on_readable)
+            else:
+                # 不支持 select 的套接字（如 pcap 句柄）退化为短超时轮询
+                while self.is_capturing:
+                    if sniff_socket.select([sniff_socket], 0.05):
+                        on_readable()
+        finally:
+            sniff_socket.close()
+    
     def _capture_with_raw_socket(self, interface, filter_expr):
-        """使用原生套接字的备用抓包方法"""
+        """使用原生套接字抓包，直接解析 IP/TCP 头，不依赖 scapy"""
+        if os.name != 'nt':
+            raise OSError("原生套接字抓包仅支持 Windows")
+        
+        address = _interface_ipv4(interface)
+        if address is None:
+            raise OSError(f"无法确定网卡 {interface} 的 IPv4 地址")
+        
+        # 在 Windows 上使用原生套接字，绑定到所选网卡的地址
+        raw_socket = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_IP)
         try:
-            import socket
-            import struct
+            raw_socket.bind((address, 0))
+            raw_socket.setsockopt(socket.IPPROTO_IP, socket.IP_HDRINCL, 1)
             
-            # 创建原生套接字
-            if os.name == 'nt':  # Windows
-                # 在 Windows 上使用原生套接字
-                raw_socket = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_IP)
-                raw_socket.bind((socket.gethostbyname(socket.gethostname()), 0))
-                raw_socket.setsockopt(socket.IPPROTO_IP, socket.IP_HDRINCL, 1)
-                
-                # 启用混杂模式
-                raw_socket.ioctl(socket.SIO_RCVALL, socket.RCVALL_ON)
-                
-                logger.info("使用 Windows 原生套接字进行抓包")
-                
+            # 启用混杂模式
+            raw_socket.ioctl(socket.SIO_RCVALL, socket.RCVALL_ON)
+            raw_socket.setblocking(False)
+            
+            logger.info(f"使用 Windows 原生套接字进行抓包，绑定地址: {address}")
+            
+            def on_readable():
+                # 一次读空套接字中已到达的所有数据包
                 while self.is_capturing:
                     try:
-                        # 接收数据包
-                        packet_data, addr = raw_socket.recvfrom(65535)
-                        
-                        # 解析 IP 包
-                        if len(packet_data) >= 20:
-                            # 简单的 IP 头解析
-                            ip_header = struct.unpack('!BBHHHBBH4s4s', packet_data[:20])
-                            protocol = ip_header[6]
-                            
-                            # 只处理 TCP 包 (协议号 6)
-                            if protocol == 6 and len(packet_data) >= 40:
-                                # 构造 scapy 包对象进行处理
-                                try:
-                                    scapy_packet = IP(packet_data)
-                                    if scapy_packet.haslayer(TCP) and scapy_packet.haslayer(Raw):
-                                        self.packet_handler(scapy_packet)
-                                except:
-                                    pass  # 忽略解析错误的包
-                                    
-                    except socket.timeout:
-                        continue
-                    except Exception as e:
-                        if self.is_capturing:
-                            logger.error(f"原生套接字接收数据时出错: {e}")
-                        break
-                        
-                # 关闭套接字
-                try:
-                    raw_socket.ioctl(socket.SIO_RCVALL, socket.RCVALL_OFF)
-                    raw_socket.close()
-                except:
-                    pass
-                    
-            else:
-                logger.warning("原生套接字备用方法仅支持 Windows")
-                
-        except Exception as e:
-            logger.error(f"原生套接字抓包失败: {e}")
+                        packet_data = raw_socket.recv(65535)
+                    except (BlockingIOError, InterruptedError):
+                        return
+                    self._handle_raw_packet(packet_data, time.time_ns())
+            
+            try:
+                self._run_select_loop(raw_socket, on_readable)
+            except Exception as e:
+                if self.is_capturing:
+                    logger.error(f"原生套接字接收数据时出错: {e}")
+        finally:
+            # 关闭套接字
+            try:
+                raw_socket.ioctl(socket.SIO_RCVALL, socket.RCVALL_OFF)
+            except OSError:
+                pass
+            raw_socket.close()
+    
+    def _handle_raw_packet(self, packet_data, ts_ns):
+        """解析原生套接字收到的 IPv4 包，提取 TCP 负载"""
+        if len(packet_data) < 40:
+            return
+        
+        version_ihl, _, total_length, _, _, _, protocol, _, src_addr, dst_addr = _IPV4_HEADER.unpack_from(packet_data)
+        
+        # 只处理 IPv4 的 TCP 包 (协议号 6)
+        if protocol != 6 or version_ihl >> 4 != 4:
+            return
+        
+        ip_header_length = (version_ihl & 0x0F) * 4
+        if len(packet_data) < ip_header_length + 20:
+            return
+        
+        src_port, dst_port = _TCP_PORTS.unpack_from(packet_data, ip_header_length)
+        port_filter = self._port_filter
+        if port_filter is not None and src_port not in port_filter and dst_port not in port_filter:
+            return
+        
+        payload_start = ip_header_length + (packet_data[ip_header_length + 12] >> 4) * 4
+        packet_end = min(total_length, len(packet_data)) if total_length else len(packet_data)
+        if payload_start >= packet_end:
+            return  # 没有负载的包（如纯ACK）
+        
+        self._process_payload(ts_ns, src_addr, dst_addr, src_port, dst_port,
+                              packet_end, packet_data[payload_start:packet_end])
             
     def stop_capture(self):
         """停止抓包"""
@@ -399,25 +565,46 @@ class RTMPCapture:
             return
             
         self.is_capturing = False
+        self._wakeup()
         logger.info("停止抓包")
         
         if self.capture_thread and self.capture_thread.is_alive():
             self.capture_thread.join(timeout=2)
+            if self.capture_thread.is_alive():
+                logger.warning("抓包线程未能在2秒内退出")
+    
+    def close(self):
+        """停止抓包并释放复用的选择器和唤醒套接字"""
+        if self.is_capturing:
+            self.stop_capture()
+        if self._selector is not None:
+            self._selector.close()
+            self._wakeup_recv.close()
+            self._wakeup_send.close()
+            self._selector = None
+            self._wakeup_recv = None
+            self._wakeup_send = None
     
     def get_captured_data(self):
-        """获取捕获的数据"""
+        """获取捕获的数据（packets / rtmp_streams 为记录对象，导出时再格式化）"""
         return {
             'packets': self.captured_packets.copy(),
             'rtmp_urls': list(self.rtmp_urls),
-            'rtmp_streams': self.rtmp_streams.copy(),
+            'rtmp_streams': list(self.rtmp_streams),
+            'latest_stream': self.rtmp_streams.latest('releaseStream'),
+            'streams_version': self.rtmp_streams.version,
             'total_packets': len(self.captured_packets),
             'unique_urls': len(self.rtmp_urls),
-            'total_streams': len(self.rtmp_streams)
+            'total_streams': len(self.rtmp_streams),
+            'stream_hits': self.rtmp_streams.total_hits
         }
     
     def export_to_json(self, filename):
         """导出数据到JSON文件"""
         data = self.get_captured_data()
+        data['packets'] = [record.to_dict() for record in data['packets']]
+        data['rtmp_streams'] = [record.to_dict() for record in data['rtmp_streams']]
+        data['latest_stream'] = data['latest_stream'].to_dict() if data['latest_stream'] else None
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
         logger.info(f"数据已导出到: {filename}")
@@ -425,7 +612,7 @@ class RTMPCapture:
     def get_interfaces(self):
         """获取可用的网络接口"""
         try:
-            interfaces = get_if_list()
+            interfaces = _load_scapy().get_if_list()
             return interfaces
         except Exception as e:
             logger.error(f"获取网络接口失败: {e}")
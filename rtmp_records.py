@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RTMP抓包记录类型
+使用 __slots__ 紧凑存储，时间戳为整数纳秒，地址为整数，格式化推迟到导出和显示时
+"""
+
+import socket
+import struct
+import time
+
+_IPV4 = struct.Struct('!I')
+
+
+def ip_to_int(ip: str) -> int:
+    """将点分十进制IPv4地址转换为整数"""
+    return _IPV4.unpack(socket.inet_aton(ip))[0]
+
+
+def int_to_ip(value: int) -> str:
+    """将整数转换为点分十进制IPv4地址"""
+    return socket.inet_ntoa(_IPV4.pack(value))
+
+
+def format_timestamp(ts_ns: int) -> str:
+    """将纳秒时间戳格式化为本地时间字符串"""
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts_ns / 1_000_000_000))
+
+
+class CaptureRecord:
+    """抓包记录基类：捕获时间和TCP流四元组"""
+
+    __slots__ = ('ts_ns', 'src_addr', 'dst_addr', 'src_port', 'dst_port', 'packet_size')
+
+    def __init__(self, ts_ns, src_addr, dst_addr, src_port, dst_port, packet_size):
+        self.ts_ns = ts_ns
+        self.src_addr = src_addr
+        self.dst_addr = dst_addr
+        self.src_port = src_port
+        self.dst_port = dst_port
+        self.packet_size = packet_size
+
+    @property
+    def timestamp(self) -> str:
+        return format_timestamp(self.ts_ns)
+
+    @property
+    def src_ip(self) -> str:
+        return int_to_ip(self.src_addr)
+
+    @property
+    def dst_ip(self) -> str:
+        return int_to_ip(self.dst_addr)
+
+    def _base_dict(self):
+        return {
+            'timestamp': self.timestamp,
+            'src_ip': self.src_ip,
+            'dst_ip': self.dst_ip,
+            'src_port': self.src_port,
+            'dst_port': self.dst_port,
+        }
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class RTMPURLRecord(CaptureRecord):
+    """发现的RTMP推流地址"""
+
+    __slots__ = ('rtmp_url',)
+
+    def __init__(self, ts_ns, src_addr, dst_addr, src_port, dst_port, packet_size, rtmp_url):
+        super().__init__(ts_ns, src_addr, dst_addr, src_port, dst_port, packet_size)
+        self.rtmp_url = rtmp_url
+
+    def to_dict(self):
+        """转换为导出用的字典"""
+        info = self._base_dict()
+        info['rtmp_url'] = self.rtmp_url
+        info['packet_size'] = self.packet_size
+        info['protocol'] = 'RTMP'
+        return info
+
+
+class RTMPStreamRecord(CaptureRecord):
+    """发现的RTMP流命令（releaseStream / publish）
+
+    ts_ns 为首次发现时间，last_ns 和 count 记录同一推流码的最近一次出现和出现次数，
+    四元组为最近一次出现时的TCP流
+    """
+
+    __slots__ = ('command', 'stream_name', 'last_ns', 'count')
+
+    def __init__(self, ts_ns, src_addr, dst_addr, src_port, dst_port, packet_size, command, stream_name):
+        super().__init__(ts_ns, src_addr, dst_addr, src_port, dst_port, packet_size)
+        self.command = command
+        self.stream_name = stream_name
+        self.last_ns = ts_ns
+        self.count = 1
+
+    @property
+    def last_seen(self) -> str:
+        return format_timestamp(self.last_ns)
+
+    def to_dict(self):
+        """转换为导出用的字典"""
+        info = self._base_dict()
+        info['command'] = self.command
+        info['stream_name'] = self.stream_name
+        info['packet_size'] = self.packet_size
+        info['last_seen'] = self.last_seen
+        info['count'] = self.count
+        return info
+
+
+class StreamRegistry:
+    """按推流码去重的流注册表
+
+    同一推流码重复出现（如重连）只更新最近出现时间、次数和来源TCP流，
+    结果集大小与不同推流码的数量成正比。更新和查询最新记录均为 O(1)。
+    """
+
+    def __init__(self):
+        self._streams = {}  # 推流码 -> RTMPStreamRecord，按首次发现顺序
+        self._latest = {}   # 命令 -> 最近出现的记录
+        self.version = 0    # 任何记录新增或更新时递增，便于界面判断是否需要刷新
+        self.total_hits = 0
+
+    def record(self, flow, command, stream_name):
+        """记录一次流命令，flow 为 (时间戳, 源地址, 目的地址, 源端口, 目的端口, 包大小)
+        返回 True 表示首次发现该推流码"""
+        self.total_hits += 1
+        self.version += 1
+        entry = self._streams.get(stream_name)
+        if entry is None:
+            entry = RTMPStreamRecord(*flow, command, stream_name)
+            self._streams[stream_name] = entry
+            is_new = True
+        else:
+            (entry.last_ns, entry.src_addr, entry.dst_addr,
+             entry.src_port, entry.dst_port, entry.packet_size) = flow
+            entry.count += 1
+            is_new = False
+        self._latest[command] = entry
+        self._latest[None] = entry
+        return is_new
+
+    def latest(self, command=None):
+        """获取最近出现的记录，可按命令过滤"""
+        return self._latest.get(command)
+
+    def get(self, stream_name):
+        return self._streams.get(stream_name)
+
+    def clear(self):
+        self._streams.clear()
+        self._latest.clear()
+        self.total_hits = 0
+        self.version += 1
+
+    def __len__(self):
+        return len(self._streams)
+
+    def __iter__(self):
+        return iter(list(self._streams.values()))
+
+    def __contains__(self, stream_name):
+        return stream_name in self._streams
@@ -1,13 +1,20 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-速度测试脚本 - 测试优化后的程序启动和响应速度
+速度测试脚本 - 启动性能分析
+统计各模块导入耗时（-X importtime）、各组件构造耗时和首帧可交互时间，
+结果保存到历史文件中，用于与上一次运行对比发现性能回退
 """
 
+import os
+import re
+import sys
+import json
 import time
 import logging
-import os
-from obs_launcher import OBSLauncher
+import argparse
+import subprocess
+from datetime import datetime
 
 # 配置日志
 logging.basicConfig(
@@ -17,107 +24,298 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def test_startup_speed():
-    """测试程序启动速度"""
-    logger.info("开始测试程序启动速度...")
-    
-    start_time = time.time()
-    
-    try:
-        # 创建OBSLauncher实例
-        launcher = OBSLauncher()
-        
-        init_time = time.time() - start_time
-        logger.info(f"✓ OBSLauncher初始化完成，耗时: {init_time:.2f}秒")
-        
-        # 测试图像检测速度
-        detection_start = time.time()
-        
-        # 测试lOG.png检测
-        log_image_path = "E:\\抓包\\ico\\lOG.png"
-        log_result = launcher._detect_and_click_image(log_image_path, "lOG图像", max_retries=1)
-        
-        detection_time = time.time() - detection_start
-        logger.info(f"✓ 图像检测测试完成，耗时: {detection_time:.2f}秒")
-        
-        total_time = time.time() - start_time
-        logger.info(f"✓ 总体测试完成，总耗时: {total_time:.2f}秒")
-        
-        # 性能评估
-        if total_time < 3:
-            logger.info("🚀 性能优秀：启动速度非常快")
-        elif total_time < 5:
-            logger.info("✅ 性能良好：启动速度较快")
-        elif total_time < 8:
-            logger.info("⚠️ 性能一般：启动速度中等")
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_HISTORY_FILE = os.path.join(PROJECT_DIR, "logs", "startup_profile.json")
+
+# 启动链路上需要关注的模块
+WATCHED_MODULES = [
+    'gui_interface', 'rtmp_capture', 'obs_controller', 'obs_launcher',
+    'scapy', 'websockets', 'psutil', 'cv2', 'numpy', 'pyautogui', 'loguru', 'tkinter',
+]
+
+IMPORTTIME_PATTERN = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def _run_child(mode, extra_args=None, timeout=120):
+    """在新的解释器进程中运行子测试，返回 (stdout, stderr, 总耗时)"""
+    command = [sys.executable, os.path.abspath(__file__), '--child', mode]
+    command.extend(extra_args or [])
+    return _run_command(command, mode, timeout)
+
+
+def _run_command(command, mode, timeout=120):
+    start_time = time.perf_counter()
+    result = subprocess.run(command, capture_output=True, text=True, cwd=PROJECT_DIR, timeout=timeout)
+    elapsed = time.perf_counter() - start_time
+    if result.returncode != 0:
+        raise RuntimeError(f"子进程 {mode} 失败: {result.stderr.strip()[-500:]}")
+    return result.stdout, result.stderr, elapsed
+
+
+def _child_output(stdout):
+    """读取子进程最后一行输出的JSON结果"""
+    for line in reversed(stdout.strip().splitlines()):
+        if line.startswith('{'):
+            return json.loads(line)
+    raise RuntimeError("子进程没有输出结果")
+
+
+def parse_importtime(stderr):
+    """解析 -X importtime 输出，返回 {模块名: {'self': 秒, 'cumulative': 秒}}"""
+    modules = {}
+    for line in stderr.splitlines():
+        match = IMPORTTIME_PATTERN.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, _, name = match.groups()
+        # 同一模块只会真正导入一次，保留第一次出现的记录
+        modules.setdefault(name, {
+            'self': int(self_us) / 1_000_000,
+            'cumulative': int(cumulative_us) / 1_000_000,
+        })
+    return modules
+
+
+def profile_imports(target='gui_interface', top=15):
+    """统计导入 target 时各模块的导入耗时"""
+    # 直接用 -c 执行，避免把本脚本自身的导入计入统计
+    code = (
+        "import time, json; _t = time.perf_counter(); "
+        f"import {target}; "
+        "print(json.dumps({'import_time': time.perf_counter() - _t}))"
+    )
+    stdout, stderr, _ = _run_command([sys.executable, '-X', 'importtime', '-c', code], 'imports')
+    modules = parse_importtime(stderr)
+    total = _child_output(stdout)['import_time']
+
+    watched = {name: modules[name]['cumulative'] for name in WATCHED_MODULES if name in modules}
+    slowest = sorted(modules.items(), key=lambda item: item[1]['self'], reverse=True)[:top]
+
+    logger.info(f"导入 {target} 总耗时: {total:.3f}秒，共导入 {len(modules)} 个模块")
+    for name, cost in sorted(watched.items(), key=lambda item: item[1], reverse=True):
+        logger.info(f"  {name:<16} 累计 {cost * 1000:8.1f} ms")
+    logger.info(f"自身耗时最高的 {top} 个模块:")
+    for name, cost in slowest:
+        logger.info(f"  {name:<40} 自身 {cost['self'] * 1000:7.1f} ms / 累计 {cost['cumulative'] * 1000:7.1f} ms")
+
+    return {
+        'total': total,
+        'modules': watched,
+        'slowest_self': {name: cost['self'] for name, cost in slowest},
+    }
+
+
+def profile_constructors():
+    """统计各组件构造函数耗时（模块已导入的前提下）"""
+    stdout, _, _ = _run_child('constructors')
+    costs = _child_output(stdout)
+    for name, cost in costs.items():
+        if cost is None:
+            logger.warning(f"  {name:<20} 构造失败")
         else:
-            logger.info("❌ 性能较差：启动速度较慢")
-            
-        return total_time
-        
+            logger.info(f"  {name:<20} 构造耗时 {cost * 1000:8.1f} ms")
+    return costs
+
+
+def profile_first_frame():
+    """统计从启动解释器到GUI首帧可交互的时间"""
+    stdout, _, wall_time = _run_child('first-frame')
+    result = _child_output(stdout)
+    result['process_wall'] = wall_time
+    logger.info(f"  进程内首帧耗时 {result['first_frame'] * 1000:8.1f} ms "
+                f"(导入 {result['import'] * 1000:.1f} ms, 构造界面 {result['construct'] * 1000:.1f} ms)")
+    logger.info(f"  含解释器启动和退出的总耗时 {wall_time * 1000:8.1f} ms")
+    return result
+
+
+def profile_capture_import():
+    """对比抓包模块导入耗时：一次性导入 scapy.all（优化前）与按需导入（优化后）"""
+    results = {}
+    for mode, label in [('eager', "优化前（from scapy.all import *）"), ('lazy', "优化后（按需导入 scapy）")]:
+        try:
+            stdout, _, _ = _run_child('capture-import', ['--scapy-mode', mode])
+            results[mode] = _child_output(stdout)['import_time']
+            logger.info(f"  {label} 导入并创建RTMPCapture: {results[mode] * 1000:8.1f} ms")
+        except Exception as e:
+            logger.warning(f"  {label} 测试失败: {e}")
+    if results.get('eager') and results.get('lazy'):
+        logger.info(f"  启动节省 {(results['eager'] - results['lazy']) * 1000:.1f} ms")
+    return results
+
+
+def _flatten(results, prefix=''):
+    """将嵌套结果展开为 {'a.b': 数值}，便于与历史记录逐项对比"""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + '.'))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def load_history(history_file):
+    if not os.path.exists(history_file):
+        return []
+    try:
+        with open(history_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
     except Exception as e:
-        logger.error(f"测试过程中出现错误: {str(e)}")
-        return None
+        logger.warning(f"读取历史记录失败: {e}")
+        return []
+
+
+def save_history(history_file, history, keep=50):
+    os.makedirs(os.path.dirname(history_file), exist_ok=True)
+    with open(history_file, 'w', encoding='utf-8') as f:
+        json.dump(history[-keep:], f, ensure_ascii=False, indent=2)
+    logger.info(f"结果已保存到: {history_file}")
+
 
-def test_response_speed():
-    """测试响应速度"""
-    logger.info("开始测试响应速度...")
-    
+def compare_with_previous(current, previous, threshold=0.2, min_delta=0.01):
+    """与上一次结果对比，返回回退项列表 [(指标, 上次, 本次)]"""
+    regressions = []
+    before = _flatten(previous['results'])
+    for name, value in _flatten(current).items():
+        old = before.get(name)
+        if old is None or old <= 0:
+            continue
+        if value > old * (1 + threshold) and value - old >= min_delta:
+            regressions.append((name, old, value))
+    return regressions
+
+
+def run_profile(args):
+    """依次执行各项测试，某一项失败时记录错误信息并继续执行后面的测试"""
+    results = {}
+    errors = {}
+
+    logger.info("=" * 50)
+    logger.info("模块导入耗时")
     try:
-        launcher = OBSLauncher()
-        
-        # 测试多次快速操作
-        operations = [
-            ("检查OBS路径", lambda: launcher.obs_path),
-            ("检查直播伴侣路径", lambda: launcher.live_companion_path),
-            ("获取工作目录", lambda: os.getcwd())
-        ]
-        
-        total_response_time = 0
-        
-        for operation_name, operation_func in operations:
-            start_time = time.time()
-            result = operation_func()
-            response_time = time.time() - start_time
-            total_response_time += response_time
-            logger.info(f"✓ {operation_name}响应时间: {response_time:.3f}秒")
-        
-        avg_response_time = total_response_time / len(operations)
-        logger.info(f"✓ 平均响应时间: {avg_response_time:.3f}秒")
-        
-        if avg_response_time < 0.01:
-            logger.info("🚀 响应速度优秀")
-        elif avg_response_time < 0.05:
-            logger.info("✅ 响应速度良好")
-        else:
-            logger.info("⚠️ 响应速度需要优化")
-            
-        return avg_response_time
-        
+        results['imports'] = profile_imports(args.target)
     except Exception as e:
-        logger.error(f"响应速度测试中出现错误: {str(e)}")
-        return None
+        logger.warning(f"导入 {args.target} 失败: {e}")
+        errors['imports'] = str(e)
 
-if __name__ == "__main__":
     logger.info("=" * 50)
-    logger.info("RTMP抓包工具 - 速度优化测试")
+    logger.info("抓包模块导入对比")
+    results['capture_import'] = profile_capture_import()
+
     logger.info("=" * 50)
-    
-    # 测试启动速度
-    startup_time = test_startup_speed()
-    
-    print("\n" + "-" * 30)
-    
-    # 测试响应速度
-    response_time = test_response_speed()
-    
-    print("\n" + "=" * 50)
-    logger.info("测试总结:")
-    if startup_time:
-        logger.info(f"启动时间: {startup_time:.2f}秒")
-    if response_time:
-        logger.info(f"平均响应时间: {response_time:.3f}秒")
-    
-    logger.info("速度优化测试完成！")
-    print("\n按回车键退出...")
-    input()
\ No newline at end of file
+    logger.info("组件构造耗时")
+    try:
+        results['constructors'] = profile_constructors()
+    except Exception as e:
+        logger.warning(f"组件构造测试失败: {e}")
+        errors['constructors'] = str(e)
+
+    if not args.no_gui:
+        logger.info("=" * 50)
+        logger.info("首帧可交互时间")
+        try:
+            results['first_frame'] = profile_first_frame()
+        except Exception as e:
+            logger.warning(f"首帧测试失败（可能没有图形环境）: {e}")
+            errors['first_frame'] = str(e)
+
+    if errors:
+        results['errors'] = errors
+
+    history = load_history(args.history)
+    if history:
+        previous = history[-1]
+        regressions = compare_with_previous(results, previous, args.threshold)
+        logger.info("=" * 50)
+        if regressions:
+            logger.warning(f"与 {previous['time']} 的结果相比发现 {len(regressions)} 项性能回退:")
+            for name, old, new in regressions:
+                logger.warning(f"  {name}: {old * 1000:.1f} ms -> {new * 1000:.1f} ms")
+        else:
+            logger.info(f"与 {previous['time']} 的结果相比没有性能回退")
+
+    if not args.no_save:
+        history.append({'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'results': results})
+        save_history(args.history, history)
+
+    return results
+
+
+# ---------------- 子进程测试 ----------------
+
+def child_capture_import(scapy_mode):
+    start_time = time.perf_counter()
+    if scapy_mode == 'eager':
+        import scapy_config
+        scapy_config.configure_scapy_native_sockets()
+        from scapy.all import conf  # noqa: F401  等价于优化前的 from scapy.all import *
+    import rtmp_capture
+    rtmp_capture.RTMPCapture()
+    print(json.dumps({'import_time': time.perf_counter() - start_time}))
+
+
+def child_constructors():
+    costs = {}
+    for name, module_name in [('RTMPCapture', 'rtmp_capture'),
+                              ('OBSControllerSync', 'obs_controller'),
+                              ('OBSLauncher', 'obs_launcher')]:
+        try:
+            # 先完成导入，只统计构造函数本身
+            factory = getattr(__import__(module_name), name)
+            start_time = time.perf_counter()
+            factory()
+            costs[name] = time.perf_counter() - start_time
+        except Exception as e:
+            print(f"{name} 构造失败: {e}", file=sys.stderr)
+            costs[name] = None
+    print(json.dumps(costs))
+
+
+def child_first_frame():
+    start_time = time.perf_counter()
+    import tkinter as tk
+    from gui_interface import RTMPCaptureGUI
+    imported = time.perf_counter()
+
+    root = tk.Tk()
+    RTMPCaptureGUI(root)
+    constructed = time.perf_counter()
+
+    def on_idle():
+        # 空闲回调执行时窗口已完成首次绘制，可以响应用户操作
+        frame_time = time.perf_counter()
+        print(json.dumps({
+            'import': imported - start_time,
+            'construct': constructed - imported,
+            'first_frame': frame_time - start_time,
+        }), flush=True)
+        root.destroy()
+
+    root.after_idle(on_idle)
+    root.mainloop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动性能分析")
+    parser.add_argument('--target', default='gui_interface', help="导入耗时分析的目标模块")
+    parser.add_argument('--history', default=DEFAULT_HISTORY_FILE, help="历史结果文件")
+    parser.add_argument('--threshold', type=float, default=0.2, help="判定为回退的相对增幅")
+    parser.add_argument('--no-gui', action='store_true', help="跳过首帧测试")
+    parser.add_argument('--no-save', action='store_true', help="不保存本次结果")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--scapy-mode', default='lazy', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child == 'capture-import':
+        child_capture_import(args.scapy_mode)
+    elif args.child == 'constructors':
+        child_constructors()
+    elif args.child == 'first-frame':
+        child_first_frame()
+    else:
+        run_profile(args)
+
+
+if __name__ == "__main__":
+    main()
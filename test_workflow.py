@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试自动化流程引擎
+用模拟桌面驱动执行开播/下播流程，检查步骤顺序、并行、跳过、重试、超时和耗时轨迹
+"""
+
+import os
+import sys
+import time
+import threading
+
+import pytest
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from workflow import (Workflow, build_go_live_workflow, build_go_offline_workflow,
+                      SUCCESS, FAILED, TIMEOUT, SKIPPED, BLOCKED)
+from mock_desktop import FakeDesktopDriver
+
+
+def finished_at(result, name):
+    step = result[name]
+    return step.started + step.elapsed
+
+
+def test_dependencies_run_in_order():
+    """依赖的步骤结束后才开始执行"""
+    order = []
+    workflow = Workflow("顺序")
+    workflow.add_step("a", lambda ctx: order.append("a") or time.sleep(0.05) or True)
+    workflow.add_step("b", lambda ctx: order.append("b") or ctx["a"], requires=["a"])
+    workflow.add_step("c", lambda ctx: order.append("c") or True, requires=["b"])
+    result = workflow.run()
+
+    assert result.ok
+    assert order == ["a", "b", "c"]
+    assert result["b"].started >= finished_at(result, "a")
+    assert [item['name'] for item in result.trace()] == ["a", "b", "c"]
+
+
+def test_independent_steps_run_in_parallel():
+    """没有依赖关系的步骤同时执行"""
+    workflow = Workflow("并行")
+    workflow.add_step("left", lambda ctx: time.sleep(0.3) or True)
+    workflow.add_step("right", lambda ctx: time.sleep(0.3) or True)
+    workflow.add_step("join", lambda ctx: True, requires=["left", "right"])
+    result = workflow.run()
+
+    assert result.ok
+    assert result.elapsed < 0.5
+    assert abs(result["left"].started - result["right"].started) < 0.1
+
+
+def test_precondition_skips_step_and_dependents_continue():
+    workflow = Workflow("跳过")
+    workflow.add_step("skip_me", lambda ctx: pytest.fail("不应执行"), precondition=lambda ctx: False)
+    workflow.add_step("after", lambda ctx: True, requires=["skip_me"])
+    result = workflow.run()
+
+    assert result.ok
+    assert result["skip_me"].status == SKIPPED
+    assert result["skip_me"].attempts == 0
+    assert result["after"].status == SUCCESS
+
+
+def test_failed_dependency_blocks_step_unless_optional():
+    workflow = Workflow("阻塞")
+    workflow.add_step("broken", lambda ctx: False)
+    workflow.add_step("blocked", lambda ctx: True, requires=["broken"])
+    workflow.add_step("optional_broken", lambda ctx: 1 / 0, optional=True)
+    workflow.add_step("runs", lambda ctx: True, requires=["optional_broken"])
+    result = workflow.run()
+
+    assert not result.ok
+    assert result["broken"].status == FAILED
+    assert result["blocked"].status == BLOCKED
+    assert result["optional_broken"].status == FAILED
+    assert "division by zero" in result["optional_broken"].error
+    assert result["runs"].status == SUCCESS
+
+
+def test_failed_step_is_retried():
+    calls = []
+    workflow = Workflow("重试")
+    workflow.add_step("flaky", lambda ctx: calls.append(1) or len(calls) > 1, retries=2, retry_delay=0.01)
+    result = workflow.run()
+
+    assert result.ok
+    assert result["flaky"].attempts == 2
+    assert len(calls) == 2
+
+
+def test_timed_out_step_is_not_retried():
+    """超时的动作仍在后台运行，不能再启动第二次"""
+    calls = []
+    release = threading.Event()
+
+    def stuck(ctx):
+        calls.append(threading.current_thread().name)
+        release.wait(2)
+        return True
+
+    workflow = Workflow("超时")
+    workflow.add_step("stuck", stuck, timeout=0.2, retries=2, retry_delay=0.01)
+    workflow.add_step("after", lambda ctx: True, requires=["stuck"])
+    result = workflow.run()
+    time.sleep(0.1)
+    release.set()
+
+    assert not result.ok
+    assert result["stuck"].status == TIMEOUT
+    assert result["stuck"].attempts == 1
+    assert len(calls) == 1
+    assert result["after"].status == BLOCKED
+    assert result.elapsed < 1
+
+
+def test_invalid_steps_are_rejected():
+    workflow = Workflow("定义")
+    workflow.add_step("a", lambda ctx: True)
+    with pytest.raises(ValueError):
+        workflow.add_step("a", lambda ctx: True)
+    with pytest.raises(ValueError):
+        workflow.add_step("b", lambda ctx: True, requires=["missing"])
+
+
+def test_go_live_trace():
+    desktop = FakeDesktopDriver(obs_start_delay=0.3, companion_start_delay=0.3, stream_key_delay=0.1)
+    result = build_go_live_workflow(desktop, desktop.capture, companion_linger=0.4).run()
+
+    assert result.ok
+    statuses = {item['name']: item['status'] for item in result.trace()}
+    assert statuses == {
+        "capture_ready": SUCCESS,
+        "open_obs": SUCCESS,
+        "open_companion": SUCCESS,
+        "obs_websocket": SKIPPED,
+        "start_live": SUCCESS,
+        "stream_key": SUCCESS,
+        "companion_linger": SUCCESS,
+        "close_companion": SUCCESS,
+    }
+    # OBS和直播伴侣并行启动
+    assert result["open_obs"].started < finished_at(result, "open_companion")
+    assert result["open_companion"].started < finished_at(result, "open_obs")
+    assert result["start_live"].started >= finished_at(result, "open_companion")
+    # 推流码很快捕获，但直播伴侣仍在开播后等待 companion_linger 秒才退出
+    assert finished_at(result, "stream_key") < result["close_companion"].started
+    assert result["close_companion"].started - finished_at(result, "start_live") >= 0.4
+    assert desktop.capture.rtmp_streams == ["stream-key"]
+    assert desktop.live
+    assert not desktop.is_live_companion_running()
+
+
+def test_go_live_keyboard_sequences_do_not_interleave():
+    """键盘操作不交错，启动的程序获得焦点之前不开始下一段键盘操作"""
+    desktop = FakeDesktopDriver(obs_start_delay=0.2, companion_start_delay=0.2, typing_time=0.1)
+    build_go_live_workflow(desktop, desktop.capture, companion_linger=0).run()
+
+    actions = [action for _, action in desktop.input_log]
+    index = 0
+    while index < len(actions):
+        name = actions[index].rsplit(":", 1)[0]
+        assert actions[index] == f"{name}:开始"
+        assert actions[index + 1] == f"{name}:结束"
+        index += 2
+        if name.startswith("启动"):
+            assert actions[index] == f"{name[2:]}窗口获得焦点"
+            index += 1
+    assert {"启动OBS:开始", "启动直播伴侣:开始"} <= set(actions)
+
+
+def test_go_live_blocks_when_companion_fails_to_start():
+    desktop = FakeDesktopDriver(companion_start_delay=5)
+    desktop.launch_timeout = 0.3
+    result = build_go_live_workflow(desktop, desktop.capture, companion_linger=0).run()
+
+    assert not result.ok
+    assert result["open_companion"].status == FAILED
+    assert result["start_live"].status == BLOCKED
+    assert result["close_companion"].status == BLOCKED
+    assert not desktop.live
+
+
+def test_go_offline_retries_cancel_click():
+    desktop = FakeDesktopDriver(companion_start_delay=0.1, fail_clicks=1)
+    result = build_go_offline_workflow(desktop).run()
+
+    assert result.ok
+    assert [item['name'] for item in result.trace()] == ["open_companion", "cancel_live"]
+    assert result["cancel_live"].attempts == 2
+    assert not desktop.live
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
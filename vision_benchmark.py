@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+界面模板匹配性能测试
+生成不同分辨率、不同显示缩放的合成屏幕截图（界面色块和文字 + 按比例缩放后的按钮模板），
+对比原单尺度彩色匹配、单尺度灰度匹配和由粗到精多尺度匹配的每次耗时和命中情况；
+并模拟等待界面加载的检测循环（画面只有加载动画在变化，最后按钮出现），对比帧变化门控前后的耗时。
+指定 --corpus 时改为在录制的真实截图语料上测试，语料目录结构：
+
+    manifest.json       {"templates": {"开始直播按钮": "templates/开始直播.png", ...},
+                         "frames": [{"image": "frames/0001.png", "template": "开始直播按钮",
+                                     "expected": [中心x, 中心y] 或 null（画面中没有该按钮）,
+                                     "note": "直播伴侣 1080p 125% 缩放"}, ...]}
+    templates/          模板图片
+    frames/             截图（通过 ImageSequenceSource 回放）
+
+路径相对于 manifest.json 所在目录。--export-corpus 按同样结构导出一份合成语料，用于检查流程。
+结果保存到历史文件并与上一次对比
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from datetime import datetime
+
+import cv2
+import numpy as np
+from loguru import logger as loguru_logger
+from image_matcher import TemplateRegistry, TemplateMatcher, FramePyramid, FrameGate
+from frame_source import ImageSequenceSource
+from speed_test import PROJECT_DIR, load_history, save_history, compare_with_previous
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_FILE = os.path.join(PROJECT_DIR, "logs", "vision_benchmark.json")
+DEFAULT_TEMPLATE = os.path.join(PROJECT_DIR, "开始直播.png")
+CORPUS_MANIFEST = "manifest.json"
+
+RESOLUTIONS = {
+    '1080p': (1920, 1080),
+    '1440p': (2560, 1440),
+    '4k': (3840, 2160),
+}
+DPI_LEVELS = (1.0, 1.25, 1.5)
+
+# 命中位置与实际位置的最大允许偏差（像素）
+POSITION_TOLERANCE = 6
+
+
+def synthetic_screen(width, height, template_bgr, scale, rng):
+    """生成合成截图（RGB），返回 (截图, 模板中心的实际位置)"""
+    screen = np.empty((height, width, 3), np.uint8)
+    # 纵向渐变背景
+    screen[:] = np.linspace(40, 90, height, dtype=np.uint8)[:, None, None]
+    # 随机界面色块和文字，模拟窗口、按钮和列表
+    for _ in range(60):
+        x, y = int(rng.integers(0, width - 40)), int(rng.integers(0, height - 20))
+        w, h = int(rng.integers(40, 400)), int(rng.integers(20, 200))
+        color = tuple(int(c) for c in rng.integers(0, 255, 3))
+        cv2.rectangle(screen, (x, y), (x + w, y + h), color, -1)
+    for _ in range(80):
+        x, y = int(rng.integers(0, width - 200)), int(rng.integers(20, height))
+        color = tuple(int(c) for c in rng.integers(150, 255, 3))
+        cv2.putText(screen, f"item {int(rng.integers(0, 10000))}", (x, y), cv2.FONT_HERSHEY_SIMPLEX,
+                    0.6 * scale, color, 1, cv2.LINE_AA)
+
+    template = cv2.cvtColor(template_bgr, cv2.COLOR_BGR2RGB)
+    if scale != 1.0:
+        size = (int(round(template.shape[1] * scale)), int(round(template.shape[0] * scale)))
+        template = cv2.resize(template, size, interpolation=cv2.INTER_LINEAR)
+    th, tw = template.shape[:2]
+    left, top = int(rng.integers(0, width - tw)), int(rng.integers(0, height - th))
+    screen[top:top + th, left:left + tw] = template
+    return screen, (left + tw // 2, top + th // 2)
+
+
+def legacy_match(screen_rgb, template_bgr, threshold):
+    """原实现：每帧转换为 BGR，单尺度彩色匹配"""
+    screen_bgr = cv2.cvtColor(screen_rgb, cv2.COLOR_RGB2BGR)
+    result = cv2.matchTemplate(screen_bgr, template_bgr, cv2.TM_CCOEFF_NORMED)
+    _, max_val, _, max_loc = cv2.minMaxLoc(result)
+    if max_val < threshold:
+        return None
+    th, tw = template_bgr.shape[:2]
+    return (max_loc[0] + tw // 2, max_loc[1] + th // 2)
+
+
+def matcher_configs():
+    """被测的匹配配置：名称 -> 匹配函数 (截图, BenchTemplate, 阈值) -> 中心位置或None"""
+    gray_single = TemplateMatcher(scales=(1.0,), coarse_scale=1.0, remember=False, log_every=0)
+    coarse_to_fine = TemplateMatcher(remember=False, log_every=0)
+
+    def run(matcher):
+        def match(screen, template, threshold):
+            found = matcher.match(FramePyramid(screen), template.cached, threshold)
+            return found.center if found else None
+        return match
+
+    return {
+        'legacy_bgr': lambda screen, template, threshold: legacy_match(screen, template.bgr, threshold),
+        'gray_single': run(gray_single),
+        'coarse_to_fine': run(coarse_to_fine),
+    }
+
+
+class BenchTemplate:
+    """被测模板：缓存模板 + 原始 BGR 图（供原实现使用）"""
+
+    def __init__(self, path, name="开始直播按钮"):
+        self.cached = TemplateRegistry().get(path, name)
+        if self.cached is None:
+            raise RuntimeError(f"无法加载模板: {path}")
+        self.bgr = cv2.imdecode(np.fromfile(path, np.uint8), cv2.IMREAD_COLOR)
+        self.height, self.width = self.bgr.shape[:2]
+
+
+def bench_wait_loop(template, resolution, frames, rng, threshold):
+    """模拟等待循环：前面的帧只有加载动画变化，最后几帧按钮出现；返回每帧平均耗时和结果是否正确"""
+    width, height = RESOLUTIONS[resolution]
+    screen, expected = synthetic_screen(width, height, template.bgr, 1.0, rng)
+    # 去掉按钮得到加载中的画面
+    th, tw = template.height, template.width
+    left, top = expected[0] - tw // 2, expected[1] - th // 2
+    loading = screen.copy()
+    loading[top:top + th, left:left + tw] = loading[max(0, top - th):max(0, top - th) + th, left:left + tw]
+    sequence = []
+    for index in range(frames):
+        frame = (screen if index >= frames - 3 else loading).copy()
+        # 加载动画：左上角的小方块每帧变化
+        frame[40:72, 40:72] = (index * 37) % 255
+        sequence.append(frame)
+
+    results = {}
+    for name, matcher in (('plain', TemplateMatcher(remember=False, log_every=0)),
+                          ('gated', FrameGate(TemplateMatcher(remember=False, log_every=0)))):
+        start_time = time.perf_counter()
+        found = [matcher.match(frame, template.cached, threshold) for frame in sequence]
+        elapsed = time.perf_counter() - start_time
+        correct = found[-1] is not None and found[0] is None
+        results[name] = {'per_frame': elapsed / frames, 'misses': 0 if correct else 1}
+        logger.info(f"  {name:<16} {elapsed / frames * 1000:8.1f} ms/帧   结果{'正确' if correct else '错误'}")
+    return results
+
+
+def load_corpus(directory):
+    """读取截图语料，返回 ({模板名称: BenchTemplate}, [(截图路径, 模板名称, 期望中心或None)])"""
+    with open(os.path.join(directory, CORPUS_MANIFEST), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    templates = {name: BenchTemplate(os.path.join(directory, path), name)
+                 for name, path in manifest['templates'].items()}
+    frames = [(os.path.join(directory, item['image']), item['template'], item.get('expected'))
+              for item in manifest['frames']]
+    return templates, frames
+
+
+def bench_corpus(directory, threshold):
+    """在截图语料上测试每种匹配配置的耗时和准确率（漏检和误检都计为 misses）"""
+    templates, frames = load_corpus(directory)
+    source = ImageSequenceSource([path for path, _, _ in frames])
+    # 先解码全部截图，计时只包含匹配
+    images = [source.grab() for _ in frames]
+    logger.info(f"语料: {directory}，{len(frames)} 张截图，{len(templates)} 个模板")
+
+    results = {}
+    for name, match in matcher_configs().items():
+        elapsed = 0.0
+        misses = 0
+        for image, (path, template_name, expected) in zip(images, frames):
+            start_time = time.perf_counter()
+            found = match(image, templates[template_name], threshold)
+            elapsed += time.perf_counter() - start_time
+            if expected is None:
+                misses += found is not None
+            elif found is None or max(abs(found[0] - expected[0]), abs(found[1] - expected[1])) > POSITION_TOLERANCE:
+                misses += 1
+        results[name] = {'per_match': elapsed / len(frames), 'misses': misses}
+        logger.info(f"  {name:<16} {elapsed / len(frames) * 1000:8.1f} ms/次   "
+                    f"正确 {len(frames) - misses}/{len(frames)}")
+    return results
+
+
+def export_corpus(directory, template, resolution, screens, rng):
+    """按语料目录结构导出合成截图（每种缩放 screens 张带按钮的截图和一张没有按钮的截图）"""
+    os.makedirs(os.path.join(directory, "frames"), exist_ok=True)
+    os.makedirs(os.path.join(directory, "templates"), exist_ok=True)
+    template_file = os.path.join("templates", os.path.basename(template.cached.path))
+    cv2.imencode(os.path.splitext(template_file)[1], template.bgr)[1].tofile(os.path.join(directory, template_file))
+
+    width, height = RESOLUTIONS[resolution]
+    items = []
+    for scale in DPI_LEVELS:
+        for index in range(screens + 1):
+            screen, expected = synthetic_screen(width, height, template.bgr, scale, rng)
+            if index == screens:
+                # 用另一张背景覆盖按钮位置，得到没有按钮的截图
+                screen = synthetic_screen(width, height, template.bgr[:1, :1], scale, rng)[0]
+                expected = None
+            image = os.path.join("frames", f"{len(items) + 1:04d}.png")
+            cv2.imencode('.png', cv2.cvtColor(screen, cv2.COLOR_RGB2BGR))[1].tofile(os.path.join(directory, image))
+            items.append({'image': image.replace(os.sep, '/'), 'template': template.cached.name,
+                          'expected': list(expected) if expected else None,
+                          'note': f"合成 {resolution} {int(scale * 100)}% 缩放"})
+
+    manifest = {'templates': {template.cached.name: template_file.replace(os.sep, '/')}, 'frames': items}
+    with open(os.path.join(directory, CORPUS_MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    logger.info(f"已导出 {len(items)} 张合成截图到: {directory}")
+
+
+def run_benchmark(args):
+    template = BenchTemplate(args.template)
+    configs = matcher_configs()
+    rng = np.random.default_rng(args.seed)
+    resolutions = [name.strip() for name in args.resolutions.split(',')]
+
+    if args.export_corpus:
+        export_corpus(args.export_corpus, template, resolutions[0], args.screens, rng)
+        return {}
+    if args.corpus:
+        # 语料结果单独保存，避免与合成截图的结果混在一起对比
+        results = {'corpus': bench_corpus(args.corpus, args.threshold)}
+        return finish(results, args)
+
+    results = {name: {} for name in configs}
+    logger.info(f"模板: {args.template} ({template.width}x{template.height})，"
+                f"每种分辨率和缩放生成 {args.screens} 张截图")
+    for resolution in resolutions:
+        width, height = RESOLUTIONS[resolution]
+        screens = [synthetic_screen(width, height, template.bgr, scale, rng) + (scale,)
+                   for scale in DPI_LEVELS for _ in range(args.screens)]
+        logger.info("=" * 50)
+        logger.info(f"{resolution} ({width}x{height})")
+        for name, match in configs.items():
+            elapsed = 0.0
+            misses = {scale: 0 for scale in DPI_LEVELS}
+            for screen, expected, scale in screens:
+                start_time = time.perf_counter()
+                found = match(screen, template, args.threshold)
+                elapsed += time.perf_counter() - start_time
+                if found is None or max(abs(found[0] - expected[0]), abs(found[1] - expected[1])) > POSITION_TOLERANCE:
+                    misses[scale] += 1
+            per_match = elapsed / len(screens)
+            results[name][resolution] = {'per_match': per_match, 'misses': sum(misses.values())}
+            detail = "  ".join(f"{int(scale * 100)}%:{args.screens - count}/{args.screens}"
+                               for scale, count in misses.items())
+            logger.info(f"  {name:<16} {per_match * 1000:8.1f} ms/次   命中 {detail}")
+
+    logger.info("=" * 50)
+    logger.info(f"等待循环（{args.wait_frames} 帧，{resolutions[0]}）")
+    results['wait_loop'] = bench_wait_loop(template, resolutions[0], args.wait_frames, rng, args.threshold)
+    return finish(results, args)
+
+
+def finish(results, args):
+    """与历史结果对比并保存"""
+    history = load_history(args.history)
+    if history:
+        previous = history[-1]
+        regressions = compare_with_previous(results, previous, args.threshold_regression, min_delta=0.001)
+        logger.info("=" * 50)
+        if regressions:
+            logger.warning(f"与 {previous['time']} 的结果相比发现 {len(regressions)} 项性能回退:")
+            for name, old, new in regressions:
+                if name.endswith('.misses'):
+                    logger.warning(f"  {name}: {old:.0f} -> {new:.0f}")
+                else:
+                    logger.warning(f"  {name}: {old * 1000:.1f} ms -> {new * 1000:.1f} ms")
+        else:
+            logger.info(f"与 {previous['time']} 的结果相比没有性能回退")
+
+    if not args.no_save:
+        history.append({'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'results': results})
+        save_history(args.history, history)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="界面模板匹配性能测试")
+    parser.add_argument('--template', default=DEFAULT_TEMPLATE, help="模板图片")
+    parser.add_argument('--resolutions', default='1080p,1440p,4k', help=f"测试的分辨率，可选 {','.join(RESOLUTIONS)}")
+    parser.add_argument('--screens', type=int, default=5, help="每种分辨率和缩放生成的截图数")
+    parser.add_argument('--wait-frames', type=int, default=30, help="等待循环测试的帧数")
+    parser.add_argument('--threshold', type=float, default=0.8, help="匹配阈值")
+    parser.add_argument('--seed', type=int, default=1, help="合成截图的随机种子")
+    parser.add_argument('--corpus', help="截图语料目录（包含 manifest.json），指定时只测试语料")
+    parser.add_argument('--export-corpus', help="按语料目录结构导出合成截图到该目录")
+    parser.add_argument('--history', default=DEFAULT_HISTORY_FILE, help="历史结果文件")
+    parser.add_argument('--threshold-regression', type=float, default=0.2, help="判定为回退的相对增幅")
+    parser.add_argument('--no-save', action='store_true', help="不保存本次结果")
+    args = parser.parse_args()
+
+    # 匹配未命中时的调试日志会影响测量，测试期间只保留警告以上的日志
+    loguru_logger.remove()
+    loguru_logger.add(sys.stderr, level="WARNING")
+    run_benchmark(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+条件等待
+自动化流程中的每一步等待某个条件成立（进程已启动、界面元素可见、WebSocket端口可连接、
+推流已开始），条件成立立即继续，而不是固定 sleep；轮询间隔从短到长自适应增加，
+超过截止时间返回失败。每次等待的耗时和轮询次数都会记录下来
+"""
+
+import time
+import socket
+import threading
+from collections import deque
+from loguru import logger
+from typing import Callable, Any, Optional, Dict, List
+
+
+class WaitResult:
+    """一次等待的结果，可直接用于 if 判断"""
+
+    __slots__ = ('name', 'ok', 'value', 'elapsed', 'attempts', 'timeout')
+
+    def __init__(self, name: str, ok: bool, value: Any, elapsed: float, attempts: int, timeout: float):
+        self.name = name
+        self.ok = ok
+        self.value = value        # 条件函数最后一次返回的值（如模板匹配位置）
+        self.elapsed = elapsed
+        self.attempts = attempts
+        self.timeout = timeout
+
+    def __bool__(self):
+        return self.ok
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'ok': self.ok,
+            'elapsed': self.elapsed,
+            'attempts': self.attempts,
+            'timeout': self.timeout,
+        }
+
+    def __repr__(self):
+        status = "成功" if self.ok else "超时"
+        return f"WaitResult({self.name}: {status}, {self.elapsed:.3f}s, {self.attempts}次)"
+
+
+class WaitRecorder:
+    """记录最近的等待结果，按步骤名称汇总耗时"""
+
+    def __init__(self, capacity: int = 500):
+        self.records = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def record(self, result: WaitResult):
+        with self._lock:
+            self.records.append(result)
+
+    def get_records(self, name: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            records = list(self.records)
+        return [r.to_dict() for r in records if name is None or r.name == name]
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """每个步骤的次数、超时次数、平均/最大耗时"""
+        steps = {}
+        for record in self.get_records():
+            step = steps.setdefault(record['name'], {'count': 0, 'timeouts': 0, 'total': 0.0, 'max': 0.0})
+            step['count'] += 1
+            step['timeouts'] += 0 if record['ok'] else 1
+            step['total'] += record['elapsed']
+            step['max'] = max(step['max'], record['elapsed'])
+        for step in steps.values():
+            step['avg'] = step.pop('total') / step['count']
+        return steps
+
+    def clear(self):
+        with self._lock:
+            self.records.clear()
+
+
+# 全局等待记录，自动化流程中的等待默认写入这里
+wait_timings = WaitRecorder()
+
+
+def wait_until(condition: Callable[[], Any], timeout: float = 10.0, interval: float = 0.05,
+               max_interval: float = 0.5, backoff: float = 1.5, name: str = "条件",
+               recorder: Optional[WaitRecorder] = wait_timings) -> WaitResult:
+    """轮询 condition 直到返回真值或超时
+
+    第一次检查立即进行；之后轮询间隔从 interval 开始按 backoff 倍数增加到 max_interval，
+    刚启动的目标通常很快就绪，长时间未就绪时减少轮询开销。condition 抛出异常视为未成立
+    """
+    start_time = time.monotonic()
+    deadline = start_time + timeout
+    attempts = 0
+    value = None
+    while True:
+        attempts += 1
+        try:
+            value = condition()
+        except Exception as e:
+            logger.debug(f"等待{name}时检查失败: {e}")
+            value = None
+        if value:
+            ok = True
+            break
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            ok = False
+            break
+        time.sleep(min(interval, remaining))
+        interval = min(interval * backoff, max_interval)
+
+    result = WaitResult(name, ok, value, time.monotonic() - start_time, attempts, timeout)
+    if recorder is not None:
+        recorder.record(result)
+    if ok:
+        logger.debug(f"{name}已就绪，等待 {result.elapsed:.2f} 秒（检查 {attempts} 次）")
+    else:
+        logger.warning(f"等待{name}超时（{timeout} 秒，检查 {attempts} 次）")
+    return result
+
+
+def port_open(host: str = "localhost", port: int = 4455, connect_timeout: float = 0.2) -> Callable[[], bool]:
+    """条件：TCP端口可以连接（如 OBS WebSocket 服务器已开始监听）"""
+    def check():
+        try:
+            with socket.create_connection((host, port), timeout=connect_timeout):
+                return True
+        except OSError:
+            return False
+    return check
+
+
+def stream_active(controller) -> Callable[[], bool]:
+    """条件：OBS推流输出已激活（读取控制器由事件维护的状态，不发请求）"""
+    return lambda: controller.get_state()['stream_active']
+
+
+if __name__ == "__main__":
+    # 测试代码
+    ready_at = time.monotonic() + 0.3
+    print(wait_until(lambda: time.monotonic() >= ready_at, timeout=2, name="模拟就绪"))
+    print(wait_until(lambda: False, timeout=0.5, name="永不成立"))
+    print(wait_until(port_open("127.0.0.1", 1), timeout=0.3, name="端口"))
+    print(f"汇总: {wait_timings.summary()}")
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自动化流程引擎
+把开播/下播这类操作序列描述成步骤图：每个步骤声明依赖、前置条件、超时和重试次数，
+依赖都满足的步骤并行执行（如启动OBS的同时启动直播伴侣），执行完成后输出每个步骤的耗时轨迹
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from loguru import logger
+from typing import Callable, Any, Optional, Dict, List, Iterable
+
+# 步骤状态
+SUCCESS = "success"    # 执行成功
+FAILED = "failed"      # 动作返回假值或抛出异常（重试后仍失败）
+TIMEOUT = "timeout"    # 超过步骤超时时间
+SKIPPED = "skipped"    # 前置条件不成立，不需要执行（视为已满足，后续步骤继续）
+BLOCKED = "blocked"    # 依赖的步骤失败，未执行
+
+
+class Step:
+    """流程中的一个步骤
+
+    action(context) 返回真值表示成功；precondition(context) 返回假值时跳过该步骤；
+    optional 为 True 时该步骤失败不影响依赖它的步骤和整个流程的结果。
+    retries 只对失败（FAILED）生效：超时的动作仍在后台线程中运行，重试会让两次桌面操作同时进行
+    """
+
+    def __init__(self, name: str, action: Callable[[Dict[str, Any]], Any], requires: Iterable[str] = (),
+                 precondition: Optional[Callable[[Dict[str, Any]], Any]] = None, timeout: Optional[float] = None,
+                 retries: int = 0, retry_delay: float = 0.5, optional: bool = False, description: str = ""):
+        self.name = name
+        self.action = action
+        self.requires = tuple(requires)
+        self.precondition = precondition
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.optional = optional
+        self.description = description or name
+
+
+class StepResult:
+    """步骤执行结果"""
+
+    __slots__ = ('name', 'status', 'value', 'attempts', 'started', 'elapsed', 'error')
+
+    def __init__(self, name: str, status: str, value: Any = None, attempts: int = 0,
+                 started: float = 0.0, elapsed: float = 0.0, error: Optional[str] = None):
+        self.name = name
+        self.status = status
+        self.value = value
+        self.attempts = attempts
+        self.started = started    # 相对流程开始的时间（秒）
+        self.elapsed = elapsed
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.status in (SUCCESS, SKIPPED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'status': self.status,
+            'attempts': self.attempts,
+            'started': self.started,
+            'elapsed': self.elapsed,
+            'error': self.error,
+        }
+
+
+class WorkflowResult:
+    """流程执行结果和耗时轨迹"""
+
+    def __init__(self, name: str, results: Dict[str, StepResult], elapsed: float, ok: bool):
+        self.name = name
+        self.results = results
+        self.elapsed = elapsed
+        self.ok = ok
+
+    def __bool__(self):
+        return self.ok
+
+    def __getitem__(self, step_name: str) -> StepResult:
+        return self.results[step_name]
+
+    def trace(self) -> List[Dict[str, Any]]:
+        """按开始时间排序的步骤轨迹"""
+        return [r.to_dict() for r in sorted(self.results.values(), key=lambda r: r.started)]
+
+    def format_trace(self) -> str:
+        lines = [f"流程 {self.name}: {'成功' if self.ok else '失败'}，总耗时 {self.elapsed:.2f} 秒"]
+        for item in self.trace():
+            line = (f"  {item['name']:<24} {item['status']:<8} 开始 +{item['started']:.2f}s "
+                    f"耗时 {item['elapsed']:.2f}s 尝试 {item['attempts']} 次")
+            if item['error']:
+                line += f"  ({item['error']})"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+class Workflow:
+    """步骤图：依赖满足的步骤在线程池中并行执行"""
+
+    def __init__(self, name: str, max_workers: int = 4):
+        self.name = name
+        self.max_workers = max_workers
+        self.steps: Dict[str, Step] = {}
+
+    def add_step(self, name: str, action: Callable[[Dict[str, Any]], Any], **options) -> Step:
+        """添加步骤，options 同 Step 的参数；依赖的步骤必须先添加"""
+        if name in self.steps:
+            raise ValueError(f"步骤重复: {name}")
+        step = Step(name, action, **options)
+        for required in step.requires:
+            if required not in self.steps:
+                raise ValueError(f"步骤 {name} 依赖未定义的步骤: {required}")
+        self.steps[name] = step
+        return step
+
+    def run(self, context: Optional[Dict[str, Any]] = None) -> WorkflowResult:
+        """执行流程，步骤的返回值以步骤名为键写入 context"""
+        context = context if context is not None else {}
+        start_time = time.monotonic()
+        results: Dict[str, StepResult] = {}
+        pending = dict(self.steps)
+        running = {}
+
+        logger.info(f"开始执行流程: {self.name}")
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"workflow-{self.name}") as executor:
+            while pending or running:
+                # 提交所有依赖已完成的步骤；依赖失败的步骤直接标记为 blocked
+                for name, step in list(pending.items()):
+                    if any(required not in results for required in step.requires):
+                        continue
+                    del pending[name]
+                    failed = [r for r in step.requires
+                              if not results[r].ok and not self.steps[r].optional]
+                    if failed:
+                        results[name] = StepResult(name, BLOCKED, started=time.monotonic() - start_time,
+                                                   error=f"依赖失败: {', '.join(failed)}")
+                        logger.warning(f"[{self.name}] 跳过步骤 {step.description}，依赖失败: {', '.join(failed)}")
+                        continue
+                    running[executor.submit(self._run_step, step, context, start_time)] = name
+
+                if not running:
+                    # 剩余步骤都被阻塞，下一轮循环会把它们标记为 blocked
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    results[name] = future.result()
+
+        elapsed = time.monotonic() - start_time
+        ok = all(r.ok or self.steps[name].optional for name, r in results.items())
+        result = WorkflowResult(self.name, results, elapsed, ok)
+        logger.info(result.format_trace())
+        return result
+
+    def _run_step(self, step: Step, context: Dict[str, Any], origin: float) -> StepResult:
+        """执行单个步骤：检查前置条件，按超时和重试次数调用动作"""
+        started = time.monotonic()
+        offset = started - origin
+
+        if step.precondition is not None:
+            try:
+                if not step.precondition(context):
+                    logger.info(f"[{self.name}] 前置条件不成立，跳过步骤: {step.description}")
+                    return StepResult(step.name, SKIPPED, started=offset)
+            except Exception as e:
+                return StepResult(step.name, FAILED, started=offset, elapsed=time.monotonic() - started,
+                                  error=f"前置条件检查失败: {e}")
+
+        logger.info(f"[{self.name}] 执行步骤: {step.description}")
+        status, value, error = FAILED, None, None
+        attempts = 0
+        for attempt in range(step.retries + 1):
+            attempts += 1
+            status, value, error = self._attempt(step, context)
+            if status in (SUCCESS, TIMEOUT):
+                break
+            if attempt < step.retries:
+                logger.info(f"[{self.name}] 步骤 {step.description} 第{attempt + 1}次失败，"
+                            f"{step.retry_delay} 秒后重试")
+                time.sleep(step.retry_delay)
+
+        elapsed = time.monotonic() - started
+        if status == SUCCESS:
+            context[step.name] = value
+        else:
+            log = logger.info if step.optional else logger.warning
+            log(f"[{self.name}] 步骤 {step.description} {status}: {error or '返回失败'}")
+        return StepResult(step.name, status, value, attempts, offset, elapsed, error)
+
+    @staticmethod
+    def _attempt(step: Step, context: Dict[str, Any]):
+        """调用一次动作，返回 (状态, 返回值, 错误信息)
+
+        设置了超时的动作在单独的线程中执行，超时后不再等待（线程无法强制终止，会在后台结束）
+        """
+        if step.timeout is None:
+            try:
+                value = step.action(context)
+                return (SUCCESS if value else FAILED), value, None
+            except Exception as e:
+                return FAILED, None, str(e)
+
+        outcome = {}
+
+        def target():
+            try:
+                outcome['value'] = step.action(context)
+            except Exception as e:
+                outcome['error'] = str(e)
+
+        worker = threading.Thread(target=target, daemon=True, name=f"step-{step.name}")
+        worker.start()
+        worker.join(step.timeout)
+        if worker.is_alive():
+            return TIMEOUT, None, f"超过 {step.timeout} 秒"
+        if 'error' in outcome:
+            return FAILED, None, outcome['error']
+        value = outcome.get('value')
+        return (SUCCESS if value else FAILED), value, None
+
+
+def build_go_live_workflow(launcher, capture=None, websocket_ready=None, companion_linger=7) -> Workflow:
+    """开播流程：OBS和直播伴侣并行启动，直播伴侣开播后等待 companion_linger 秒再退出直播伴侣
+
+    launcher 需要提供 OBSLauncher 的 auto_open_obs / auto_open_live_companion /
+    start_live_streaming_with_image_detection / terminate_live_companion；
+    capture 为 RTMPCapture（可选），websocket_ready 为等待OBS WebSocket可连接的函数（可选）。
+    推流码捕获与等待同时进行，只记录在轨迹中，不会提前退出直播伴侣
+    """
+    from wait_conditions import wait_until
+
+    workflow = Workflow("开播")
+    workflow.add_step("capture_ready", lambda ctx: wait_until(
+        lambda: capture.is_capturing and capture.capture_thread.is_alive(), timeout=2, name="抓包启动"),
+        precondition=lambda ctx: capture is not None, optional=True, description="等待抓包启动")
+    workflow.add_step("open_obs", lambda ctx: launcher.auto_open_obs(), requires=["capture_ready"],
+                      timeout=60, optional=True, description="打开OBS")
+    workflow.add_step("open_companion", lambda ctx: launcher.auto_open_live_companion(),
+                      requires=["capture_ready"], timeout=60, description="打开直播伴侣")
+    workflow.add_step("obs_websocket", lambda ctx: websocket_ready(), requires=["open_obs"],
+                      precondition=lambda ctx: websocket_ready is not None and ctx.get("open_obs"),
+                      optional=True, description="等待OBS WebSocket可连接")
+    workflow.add_step("start_live", lambda ctx: launcher.start_live_streaming_with_image_detection(),
+                      requires=["open_companion"], timeout=60, retries=1, retry_delay=1,
+                      description="点击开始直播")
+    workflow.add_step("stream_key", lambda ctx: wait_until(
+        lambda: len(capture.rtmp_streams) > 0, timeout=7, interval=0.2, name="推流码捕获"),
+        requires=["start_live"], precondition=lambda ctx: capture is not None, optional=True,
+        description="等待捕获推流码")
+    workflow.add_step("companion_linger", lambda ctx: time.sleep(companion_linger) or True,
+                      requires=["start_live"], description=f"开播后等待{companion_linger}秒")
+    workflow.add_step("close_companion", lambda ctx: launcher.terminate_live_companion(),
+                      requires=["stream_key", "companion_linger"], timeout=15, optional=True,
+                      description="退出直播伴侣")
+    return workflow
+
+
+def build_go_offline_workflow(launcher) -> Workflow:
+    """下播流程：OBS停止推流后重新打开直播伴侣并点击取消直播"""
+    workflow = Workflow("下播")
+    workflow.add_step("open_companion", lambda ctx: launcher.auto_open_live_companion(),
+                      timeout=60, description="打开直播伴侣")
+    workflow.add_step("cancel_live", lambda ctx: launcher.click_cancel_streaming_button(),
+                      requires=["open_companion"], timeout=30, retries=1, retry_delay=1,
+                      description="点击取消直播")
+    return workflow
+
+
+if __name__ == "__main__":
+    # 测试代码：用模拟桌面驱动执行开播和下播流程
+    from mock_desktop import FakeDesktopDriver
+
+    desktop = FakeDesktopDriver(obs_start_delay=0.4, companion_start_delay=0.6, stream_key_delay=0.3)
+    result = build_go_live_workflow(desktop, desktop.capture, companion_linger=0.5).run()
+    print(result.format_trace())
+
+    desktop = FakeDesktopDriver(companion_start_delay=0.3, fail_clicks=1)
+    print(build_go_offline_workflow(desktop).run().format_trace())